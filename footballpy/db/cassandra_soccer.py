@@ -3,16 +3,37 @@
 cassandra:  Module providing interface to talk to a local Apache Cassandra instance. 
             At the moment experimental, doesn't do much usefull. Don't use it for
             anything crucial!!!
+
+            The position data is written with BulkInserter: the rows are
+            grouped into unlogged batches of a single partition (game_id)
+            which are executed asynchronously with a bounded number of
+            requests in flight. Batches failing with a transient error are
+            retried. insert_match loads the position data of a whole match.
 @author: rein
 @license: MIT
 @version 0.1
 """
-from cassandra.cluster import Cluster
+import collections
+import threading
+import time
+import cassandra
+from cassandra.cluster import Cluster, NoHostAvailable
+from cassandra.protocol import OverloadedErrorMessage
+from cassandra.query import BatchStatement, BatchType
 import numpy as np
+from footballpy import instrumentation
 
 __TEST_KEYSPACE__ = 'soccer_test'
-__cluster__ = Cluster()
-__session__ = __cluster__.connect(__TEST_KEYSPACE__)
+__cluster__ = None
+__session__ = None
+
+__MAX_IN_FLIGHT__ = 64
+# rows per batch, keeps the batches below the default batch size warn threshold
+__BATCH_SIZE__ = 50
+__MAX_RETRIES__ = 3
+__RETRY_DELAY__ = 0.1
+__TRANSIENT_ERRORS__ = (cassandra.Timeout, cassandra.Unavailable,
+        cassandra.OperationTimedOut, NoHostAvailable, OverloadedErrorMessage)
 
 __pi_query__ = """
     INSERT INTO position_data (
@@ -27,6 +48,29 @@ __pi_query__ = """
 """
 __position_insertion_prepared__ = None
 
+def connect(contact_points = None, keyspace = __TEST_KEYSPACE__):
+    """ Connects to the cluster, the local node by default.
+        Args:
+            contact_points: list of node addresses { default: None = local }
+            keyspace: keyspace of the session.
+        Returns:
+            The session.
+    """
+    global __cluster__, __session__
+    if contact_points is None:
+        __cluster__ = Cluster()
+    else:
+        __cluster__ = Cluster(contact_points)
+    __session__ = __cluster__.connect(keyspace)
+    return __session__
+
+def get_session():
+    """ Returns the session, connects to the local node on first use.
+    """
+    if __session__ is None:
+        connect()
+    return __session__
+
 def init():
     """ Drops the test table in test keyspace and creates a
         new one.
@@ -46,18 +90,203 @@ def init():
             PRIMARY KEY ((game_id), half, team_id, player_id, frame)
         );
         """
-    __session__.execute(query1)
-    __session__.execute(query2)
+    session = get_session()
+    session.execute(query1)
+    session.execute(query2)
     global __position_insertion_prepared__
-    __position_insertion_prepared__ = __session__.prepare(__pi_query__)
+    __position_insertion_prepared__ = session.prepare(__pi_query__)
+
+def get_insert_statement(session):
+    """ Returns the prepared insert statement for the session.
+    """
+    if session is __session__ and __position_insertion_prepared__ is not None:
+        return __position_insertion_prepared__
+    return session.prepare(__pi_query__)
+
+def player_rows(game_id, half, team_id, player_id, xy):
+    """ Converts the positions of a player into insert parameters.
+        Args:
+            game_id: id of the game.
+            half: 1 or 2.
+            team_id: id of the team.
+            player_id: id of the player.
+            xy: numpy array with the columns [frame, x, y].
+        Returns:
+            A generator of parameter tuples, see __pi_query__.
+    """
+    frames = xy[:,0].astype(int).tolist()
+    xs = xy[:,1].astype(float).tolist()
+    ys = xy[:,2].astype(float).tolist()
+    for frame, x, y in zip(frames, xs, ys):
+        yield (game_id, half, team_id, player_id, frame, x, y)
+
+def batch_rows(rows, batch_size = __BATCH_SIZE__):
+    """ Groups rows into batches of a single partition.
+        A batch is completed when it holds batch_size rows or the
+        partition key (game_id) changes.
+        Args:
+            rows: iterable of parameter tuples, see __pi_query__.
+            batch_size: maximum number of rows per batch.
+        Returns:
+            A generator of lists of rows.
+    """
+    batch = []
+    for row in rows:
+        if batch and (len(batch) == batch_size or batch[0][0] != row[0]):
+            yield batch
+            batch = []
+        batch.append(row)
+    if batch:
+        yield batch
+
+class BulkInserter(object):
+    """ Executes batches of rows asynchronously.
 
-def insert_player(game_id, half, team_id, player_id, xy):
+        At most max_in_flight requests are pending, submitting further
+        batches blocks until a request completes. Batches failing with one
+        of __TRANSIENT_ERRORS__ are resubmitted up to max_retries times
+        with an exponential delay, other errors are raised by insert or
+        join.
+    """
+
+    def __init__(self, session, statement, max_in_flight = __MAX_IN_FLIGHT__,
+            batch_size = __BATCH_SIZE__, max_retries = __MAX_RETRIES__,
+            retry_delay = __RETRY_DELAY__):
+        """ Constructor method.
+            Args:
+                session: cassandra session.
+                statement: prepared insert statement.
+                max_in_flight: maximum number of pending requests.
+                batch_size: maximum number of rows per batch.
+                max_retries: number of retries of a failed batch.
+                retry_delay: delay in seconds before the first retry, doubled
+                             for every further retry.
+            Returns:
+                Nothing
+        """
+        self.session = session
+        self.statement = statement
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.rows = 0
+        self.batches = 0
+        self.retries = 0
+        self._in_flight = 0
+        self._retries = collections.deque()
+        self._error = None
+        self._cond = threading.Condition()
+
+    def insert(self, rows):
+        """ Submits rows, see player_rows.
+            Returns immediately after the last batch is submitted, see join.
+        """
+        for batch in batch_rows(rows, self.batch_size):
+            self._retry()
+            self.submit(batch)
+
+    def submit(self, batch, attempt = 0):
+        """ Executes a batch asynchronously, blocks while max_in_flight
+            requests are pending.
+        """
+        with self._cond:
+            while self._in_flight >= self.max_in_flight:
+                self._cond.wait()
+            self._raise_error()
+            self._in_flight += 1
+        if len(batch) == 1:
+            future = self.session.execute_async(self.statement, batch[0])
+        else:
+            statement = BatchStatement(batch_type=BatchType.UNLOGGED)
+            for row in batch:
+                statement.add(self.statement, row)
+            future = self.session.execute_async(statement)
+        future.add_callbacks(self._on_success, self._on_error,
+                callback_args=(batch,), errback_args=(batch, attempt))
+
+    def join(self):
+        """ Waits until all submitted batches are written.
+        """
+        while True:
+            with self._cond:
+                while self._in_flight and not self._retries:
+                    self._cond.wait()
+                done = not self._in_flight and not self._retries
+            if done:
+                break
+            self._retry()
+        self._raise_error()
+
+    def _retry(self):
+        while self._retries:
+            batch, attempt = self._retries.popleft()
+            time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            self.retries += 1
+            self.submit(batch, attempt)
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _on_success(self, result, batch):
+        with self._cond:
+            self._in_flight -= 1
+            self.rows += len(batch)
+            self.batches += 1
+            self._cond.notify_all()
+
+    def _on_error(self, error, batch, attempt):
+        with self._cond:
+            self._in_flight -= 1
+            if attempt < self.max_retries and isinstance(error, __TRANSIENT_ERRORS__):
+                self._retries.append((batch, attempt + 1))
+            elif self._error is None:
+                self._error = error
+            self._cond.notify_all()
+
+def insert_player(game_id, half, team_id, player_id, xy, session = None):
     """Puts all the data from one player into the table.
     """
-    print('Inserting player with %d rows' % xy.shape[0])
-    for row in xy:
-        __session__.execute(__position_insertion_prepared__, 
-            (game_id, half, team_id, player_id, int(row[0]), row[1], row[2]))
+    session = session or get_session()
+    inserter = BulkInserter(session, get_insert_statement(session))
+    with instrumentation.timed('cassandra_soccer.insert_player',
+            player_id=player_id, frames=xy.shape[0]) as metrics:
+        inserter.insert(player_rows(game_id, half, team_id, player_id, xy))
+        inserter.join()
+        metrics['rows'] = inserter.rows
+        metrics['batches'] = inserter.batches
+        metrics['retries'] = inserter.retries
+
+def insert_match(match, position_data, session = None, **kwargs):
+    """ Puts the position data of a whole match into the table.
+        Args:
+            match: match information with the keys 'match_id', 'home' and
+                   'guest' (team ids), see dfl.read_match_information.
+            position_data: position_data[role]['1st'|'2nd'] holds a list of
+                           (player_id, xy, position) tuples with the
+                           columns [frame, x, y] in xy.
+            session: cassandra session { default: None = get_session() }
+            kwargs: see BulkInserter.
+        Returns:
+            The number of inserted rows.
+    """
+    session = session or get_session()
+    inserter = BulkInserter(session, get_insert_statement(session), **kwargs)
+    game_id = str(match['match_id'])
+    with instrumentation.timed('cassandra_soccer.insert_match',
+            game_id=game_id) as metrics:
+        for role in ['home', 'guest']:
+            team_id = str(match.get(role, role))
+            for half, section in [(1, '1st'), (2, '2nd')]:
+                for player in position_data[role][section]:
+                    inserter.insert(player_rows(game_id, half, team_id,
+                        str(player[0]), player[1]))
+        inserter.join()
+        metrics['rows'] = inserter.rows
+        metrics['batches'] = inserter.batches
+        metrics['retries'] = inserter.retries
+    return inserter.rows
 
 def get_player_position_data(game_id, half, team_id, player_id):
     """ Experimental function to retrieve position data for one player.
@@ -72,7 +301,7 @@ def get_player_position_data(game_id, half, team_id, player_id):
         AND team_id = %s
         AND player_id = %s;
     """
-    res = __session__.execute(query, (game_id, half, team_id, player_id))
+    res = get_session().execute(query, (game_id, half, team_id, player_id))
     # as the size of the array is not known in advance
     # storing the individual rows into a list which
     # is subsequently cast into a numpy array.
@@ -84,7 +313,11 @@ def get_player_position_data(game_id, half, team_id, player_id):
 def close():
     """ Closes the cluster connection.
     """
-    __cluster__.shutdown()
+    global __cluster__, __session__
+    if __cluster__ is not None:
+        __cluster__.shutdown()
+    __cluster__ = None
+    __session__ = None
 
 
 
@@ -2,28 +2,417 @@
 """
 Created on Sat Jun 20 00:09:12 2015
 
+SOCCER: Writes and reads the processed position data of the positionen-*
+files.
+
+For every team and the ball one file per half is written. The frames
+are decimated to a lower sampling rate, either by subsampling or by
+averaging blocks of frames. Three file formats are available:
+    'text': the legacy text format, formatted vectorized.
+    'savetxt': the legacy text format written with numpy.savetxt, the
+               reference implementation of 'text'.
+    'binary': a small header followed by the raw little endian data,
+              see read_binary_file.
+Further formats are plugged in by passing a callable(data, fname)
+instead of a format name.
+
+read_data_from_file reads the files of a match back into the structure
+of dfl_processor.run, read_directory reads all matches of a directory
+in a process pool.
+
 @author: rein
 @license: MIT
 @version: 0.1
 """
+import struct
 import numpy as np
+from footballpy import instrumentation
+
+__BINARY_MAGIC__ = b'SOCB'
+__BINARY_VERSION__ = 1
+# magic, version, dtype string, number of rows, number of columns
+__BINARY_HEADER__ = struct.Struct('<4sH4sQQ')
+# largest absolute value which is rounded in integer arithmetic (int32 cents)
+__FAST_LIMIT__ = 2e7
+__TIE_TOLERANCE__ = 1e-6
+
+
+def decimate(data, step = 25, method = 'subsample'):
+    """Reduces the sampling rate of the frames.
+
+    Args:
+        data: numpy array with a frame per row.
+        step: number of frames which are combined into one.
+        method: 'subsample' takes the first frame of each block of step
+                frames, 'mean' averages the frames of a block ignoring
+                missing (NaN) values.
+    Returns:
+        A numpy array with ceil(frames / step) rows.
+    """
+    if step == 1:
+        return data
+    if method == 'subsample':
+        return data[::step]
+    if method != 'mean':
+        raise ValueError('Unknown decimation method: %s' % method)
+    no_frames = data.shape[0]
+    no_blocks = -(-no_frames // step)
+    padded = np.full((no_blocks * step,) + data.shape[1:], np.nan)
+    padded[:no_frames] = data
+    blocks = padded.reshape((no_blocks, step) + data.shape[1:])
+    valid = ~np.isnan(blocks)
+    counts = valid.sum(axis=1)
+    sums = np.where(valid, blocks, 0.0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        res = sums / counts
+    return res.astype(np.result_type(data.dtype, np.float32))
+
+
+def format_rows(data):
+    """Formats a matrix like numpy.savetxt with fmt='%5.2f'.
+
+    The fields are separated by two spaces and every row is terminated
+    by '  \\r\\n'. The values are rounded in integer arithmetic, values
+    close to a rounding tie, very large and non finite values are
+    formatted by Python, hence the output is identical to numpy.savetxt.
+
+    Args:
+        data: two dimensional numpy array.
+    Returns:
+        The formatted rows as bytes.
+    """
+    values = np.asarray(data, dtype=np.float64)
+    no_rows, no_cols = values.shape
+    if values.size == 0:
+        return b''
+    shape = (no_rows, no_cols)
+    negative = np.signbit(values)
+    scaled = np.abs(values) * 100.0
+    fast = scaled < 100.0 * __FAST_LIMIT__
+    scaled[~fast] = 0.0
+    cents = np.floor(scaled + 0.5).astype(np.int32)
+    # values close to a rounding tie, large and non finite values are
+    # formatted by Python
+    scaled -= np.floor(scaled)
+    fast &= np.abs(scaled - 0.5) >= __TIE_TOLERANCE__
+    texts = {}
+    for row, col in zip(*np.nonzero(~fast)):
+        text = '%5.2f' % values[row, col]
+        if abs(values[row, col]) < __FAST_LIMIT__:
+            integer, fraction = text.strip().lstrip('-').split('.')
+            cents[row, col] = int(integer) * 100 + int(fraction)
+        else:
+            texts[(row, col)] = text
+    integer = cents // 100
+    no_digits = np.ones(shape, dtype=np.int16)
+    bound = 10
+    while bound <= __FAST_LIMIT__:
+        more = integer >= bound
+        if not more.any():
+            break
+        no_digits += more
+        bound *= 10
+    widths = np.maximum(no_digits + negative + 3, 5).astype(np.int16)
+    for key, text in texts.items():
+        widths[key] = len(text)
+    # every field is right aligned in a slot of the largest width followed
+    # by two spaces, every row is terminated by '\r\n'. The padding of
+    # the slots is dropped at the end.
+    width = int(widths.max())
+    slots = np.full((no_rows, no_cols * (width + 2) + 2), ord(' '), dtype=np.uint8)
+    fields = slots[:,:-2].reshape((no_rows, no_cols, width + 2))
+    quotient = cents // 10
+    fields[:,:,width-1] = cents - 10 * quotient + ord('0')
+    cents = quotient // 10
+    fields[:,:,width-2] = quotient - 10 * cents + ord('0')
+    fields[:,:,width-3] = ord('.')
+    for k in range(int((no_digits + negative).max())):
+        quotient = integer // 10
+        np.copyto(fields[:,:,width-4-k], integer - 10 * quotient + ord('0'),
+                where=no_digits > k, casting='unsafe')
+        np.copyto(fields[:,:,width-4-k], ord('-'),
+                where=negative & (no_digits == k), casting='unsafe')
+        integer = quotient
+    for (row, col), text in texts.items():
+        fields[row, col, :width] = np.frombuffer(text.encode('ascii').rjust(width),
+                dtype=np.uint8)
+    slots[:,-2] = ord('\r')
+    slots[:,-1] = ord('\n')
+    keep = np.ones(slots.shape, dtype=bool)
+    keep[:,:-2].reshape((no_rows, no_cols, width + 2))[:,:,:width] = (
+            np.arange(width) >= (width - widths)[:,:,None])
+    return slots[keep].tobytes()
+
+
+def write_text_file(data, fname):
+    """Writes a matrix in the legacy text format.
+
+    The file starts with the number of rows and columns followed by
+    the rows formatted by format_rows.
+
+    Args:
+        data: two dimensional numpy array.
+        fname: output filepath.
+    Returns:
+        The filepath.
+    """
+    num_frames, num_players = data.shape
+    with open(fname, 'wb') as f:
+        f.write(b'%d\r\n%d\r\n' % (num_frames, num_players))
+        f.write(format_rows(data))
+    return fname
+
+
+def write_savetxt_file(data, fname):
+    """Writes a matrix in the legacy text format using numpy.savetxt."""
+    num_frames, num_players = data.shape
+    with open(fname, 'wb') as f:
+        f.write(b'%d\r\n%d\r\n' % (num_frames, num_players))
+        np.savetxt(f,data,fmt='%5.2f',delimiter='  ',newline='  \r\n')
+    return fname
+
 
-def write_data_to_file(data, matchname = ''):
+def write_binary_file(data, fname):
+    """Writes a matrix with a small header followed by the raw data.
+
+    Args:
+        data: two dimensional numpy array.
+        fname: output filepath, '.bin' is appended.
+    Returns:
+        The filepath.
     """
+    fname = fname + '.bin'
+    data = np.ascontiguousarray(data)
+    data = data.astype(data.dtype.newbyteorder('<'), copy=False)
+    header = __BINARY_HEADER__.pack(__BINARY_MAGIC__, __BINARY_VERSION__,
+            data.dtype.str.encode('ascii').ljust(4), data.shape[0], data.shape[1])
+    with open(fname, 'wb') as f:
+        f.write(header)
+        f.write(data.tobytes())
+    return fname
+
+
+def read_binary_file(fname, mmap = True):
+    """Reads a file written by write_binary_file.
+
     Args:
+        fname: filepath of the binary file.
+        mmap: memory map the data instead of reading it.
+    Returns:
+        A numpy array with the data.
+    """
+    with open(fname, 'rb') as f:
+        header = f.read(__BINARY_HEADER__.size)
+    magic, version, dtype, no_rows, no_cols = __BINARY_HEADER__.unpack(header)
+    if magic != __BINARY_MAGIC__ or version != __BINARY_VERSION__:
+        raise ValueError('Not a SOCCER binary file: %s' % fname)
+    dtype = np.dtype(dtype.strip().decode('ascii'))
+    if mmap and no_rows * no_cols > 0:
+        return np.memmap(fname, dtype=dtype, mode='r',
+                offset=__BINARY_HEADER__.size, shape=(no_rows, no_cols))
+    with open(fname, 'rb') as f:
+        f.seek(__BINARY_HEADER__.size)
+        data = np.fromfile(f, dtype=dtype, count=no_rows * no_cols)
+    return data.reshape((no_rows, no_cols))
+
+
+__writers__ = {
+        'text': write_text_file,
+        'savetxt': write_savetxt_file,
+        'binary': write_binary_file
+        }
 
+
+def write_data_to_file(data, matchname = '', step = 25, method = 'subsample',
+        fmt = 'text', workers = None):
+    """Writes the processed data into the positionen-* files.
+
+    Args:
+        data: dictionary with the keys 'home', 'guest' and 'ball' holding
+              a matrix per half, see dfl_processor.run.
+        matchname: prefix of the file names.
+        step: decimation factor { default: 25 }
+        method: decimation method, 'subsample' or 'mean', see decimate.
+        fmt: file format, 'text', 'savetxt', 'binary' or a
+             callable(data, fname) returning the written filepath.
+        workers: number of threads writing the files concurrently
+                 { default: None = one per file }, 1 writes serially.
     Returns:
+        The list of written filepaths.
     """
+    writer = fmt if callable(fmt) else __writers__[fmt]
     if matchname:
         matchname = matchname + '-'
+    jobs = []
     for ptype in ['home','guest','ball']:
         for ht in [0,1]:
-            tmp_data = data[ptype][ht][::25,:]
-            num_frames,num_players = tmp_data.shape
             outname = matchname + 'positionen-%s-HT%d' % (ptype,ht+1)
-            with open(outname, 'wb') as f:
-                f.write(b'%d\r\n%d\r\n' % (num_frames,num_players))
-                np.savetxt(f,tmp_data,fmt='%5.2f',delimiter='  ',newline='  \r\n')
+            jobs.append((data[ptype][ht], outname))
+
+    def write(job):
+        tmp_data, outname = job
+        return writer(decimate(tmp_data, step, method), outname)
+
+    if workers == 1:
+        return [write(job) for job in jobs]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers or len(jobs)) as executor:
+        return list(executor.map(write, jobs))
+
+def parse_rows(buf, no_cols, dtype = np.float64):
+    """Parses rows written by format_rows.
+
+    Every field consists of an optional sign, the integer digits, a dot
+    and two decimals, hence the fields are located by their dots and
+    the digits are converted vectorized. Buffers containing other
+    fields, e.g. nan, inf or values with more than 15 digits, are parsed
+    by numpy.
+
+    Args:
+        buf: bytes with the formatted rows.
+        no_cols: number of columns.
+        dtype: numpy dtype of the result { default: float64 }
+    Returns:
+        A numpy array with no_cols columns.
+    """
+    # the padding delimits the first and the last field
+    chars = np.frombuffer(b' ' + buf + b'  ', dtype=np.uint8)
+    blank = chars <= ord(' ')
+    no_fields = int(np.count_nonzero(~blank[:-1] & blank[1:]))
+    dots = np.flatnonzero(chars == ord('.'))
+    digits = chars - np.uint8(ord('0'))
+    if (len(dots) == no_fields and no_fields % no_cols == 0 and
+            np.all(digits[dots+1] < 10) and np.all(digits[dots+2] < 10) and
+            np.all(blank[dots+3])):
+        cents = digits[dots+1] * np.int64(10) + digits[dots+2]
+        negative = np.zeros(no_fields, dtype=bool)
+        active = np.ones(no_fields, dtype=bool)
+        factor = 100
+        for pos in range(1, 16):
+            digit = digits[dots-pos]
+            negative |= active & (digit == (ord('-') - ord('0')) & 0xff)
+            active &= digit < 10
+            if not active.any():
+                break
+            cents += np.where(active, digit, 0) * np.int64(factor)
+            factor *= 10
+        if not active.any():
+            values = cents / 100.0
+            np.negative(values, out=values, where=negative)
+            return values.reshape((-1, no_cols)).astype(dtype, copy=False)
+    values = np.array(buf.split(), dtype=np.float64)
+    return values.reshape((-1, no_cols)).astype(dtype, copy=False)
+
+
+def read_text_file(fname, dtype = np.float64):
+    """Reads a matrix written by write_text_file or write_savetxt_file.
+
+    Args:
+        fname: filepath of the positionen-* file.
+        dtype: numpy dtype of the result { default: float64 }
+    Returns:
+        A numpy array with the frames in the rows.
+    """
+    with open(fname, 'rb') as f:
+        no_rows = int(f.readline())
+        no_cols = int(f.readline())
+        buf = f.read()
+    data = parse_rows(buf, no_cols, dtype) if no_rows else np.zeros((0, no_cols), dtype)
+    if data.shape != (no_rows, no_cols):
+        raise ValueError('Expected %d x %d values in %s, found %d x %d' %
+                ((no_rows, no_cols, fname) + data.shape))
+    return data
+
+
+def read_position_file(fname, dtype = np.float64):
+    """Reads a positionen-* file, binary files are detected by '.bin'.
+
+    Args:
+        fname: filepath of the positionen-* file.
+        dtype: numpy dtype of the result { default: float64 }
+    Returns:
+        A numpy array with the frames in the rows.
+    """
+    if fname.endswith('.bin'):
+        return read_binary_file(fname, mmap=False).astype(dtype, copy=False)
+    return read_text_file(fname, dtype)
+
+
+def read_data_from_file(matchname = '', directory = '', dtype = np.float64):
+    """Reads the positionen-* files of a match.
+
+    The counterpart of write_data_to_file, binary files are used if
+    present.
+
+    Args:
+        matchname: prefix of the file names.
+        directory: directory of the files { default: current directory }
+        dtype: numpy dtype of the matrices { default: float64 }
+    Returns:
+        A dictionary with the keys 'home', 'guest' and 'ball' holding a
+        matrix per half, see dfl_processor.run.
+    """
+    import os
+    if matchname:
+        matchname = matchname + '-'
+    result = {'home':[0]*2, 'guest':[0]*2, 'ball':[0]*2}
+    with instrumentation.timed('SOCCER.read_match', match=matchname) as metrics:
+        for ptype in ['home','guest','ball']:
+            for ht in [0,1]:
+                fname = os.path.join(directory,
+                        matchname + 'positionen-%s-HT%d' % (ptype,ht+1))
+                if os.path.exists(fname + '.bin'):
+                    fname = fname + '.bin'
+                result[ptype][ht] = read_position_file(fname, dtype)
+        metrics['frames'] = result['home'][0].shape[0] + result['home'][1].shape[0]
+    return result
+
+
+def find_matches(directory):
+    """Finds the match names of the positionen-* files in a directory.
+
+    Args:
+        directory: directory containing the positionen-* files.
+    Returns:
+        A sorted list of match names, '' for files without prefix.
+    """
+    import glob
+    import os
+    matches = set()
+    for fname in glob.glob(os.path.join(directory, '*positionen-home-HT1*')):
+        name = os.path.basename(fname)
+        if name.endswith('positionen-home-HT1') or name.endswith('positionen-home-HT1.bin'):
+            matches.add(name[:name.index('positionen-home-HT1')].rstrip('-'))
+    return sorted(matches)
+
+
+def read_directory(directory, matches = None, processes = None, dtype = np.float64):
+    """Reads the positionen-* files of all matches in a directory.
+
+    The matches are read in a process pool.
+
+    Args:
+        directory: directory containing the positionen-* files.
+        matches: list of match names { default: None = find_matches }
+        processes: number of worker processes { default: None =
+                   number of CPUs }, 1 reads in this process.
+        dtype: numpy dtype of the matrices { default: float64 }
+    Returns:
+        A dictionary match name -> data, see read_data_from_file.
+    """
+    if matches is None:
+        matches = find_matches(directory)
+    matches = list(matches)
+    with instrumentation.timed('SOCCER.read_directory', matches=len(matches)):
+        if processes == 1 or len(matches) < 2:
+            results = [read_data_from_file(m, directory, dtype) for m in matches]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                results = list(executor.map(read_data_from_file, matches,
+                    [directory] * len(matches), [dtype] * len(matches)))
+    return dict(zip(matches, results))
+
 
 if __name__ == '__main__':
     write_data_to_file(data_transformed)
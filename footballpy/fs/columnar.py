@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+columnar: Columnar export and reload of tracking data frames.
+
+The data frames of dfl.get_df_from_files and impire.get_df_from_files
+(see papi.pos_data_to_df) are written as Parquet or Arrow IPC files.
+Coordinates are stored as float32, 'half', 'possession' and
+'game_state' as int8 and the frame index as int64 column 'frame'.
+Frames without ball data (NaN possession and game_state) are stored as
+nulls of the int8 columns and reloaded as pandas nullable Int8. The
+player ids are stored once as a dictionary in the file metadata which
+maps every player onto its coordinate columns, hence single players can
+be loaded without reading the other columns.
+
+Parquet files (.parquet) are compressed and suited for archives. Arrow
+IPC files (.arrow, .feather) are written uncompressed and are memory
+mapped on reload, i.e. the projected columns are not copied.
+
+Requires pyarrow.
+
+Example:
+    write_tracking_frame(pos_df, 'match.parquet')
+    df = read_tracking_frame('match.parquet', columns = ['ball_x', 'ball_y'],
+                             players = ['DFL-OBJ-0000XT', 'DFL-OBJ-0001BR'])
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import json
+import numpy as np
+import pandas as pd
+
+__METADATA_KEY__ = b'footballpy.tracking'
+__FORMAT_VERSION__ = 1
+__INT_COLUMNS__ = ('half', 'possession', 'game_state')
+__AXES__ = ('x', 'y')
+__BALL_COLUMNS__ = {
+        'ball_x': ('ball', 'x'),
+        'ball_y': ('ball', 'y'),
+        'possession': ('ball', 'possession'),
+        'game_state': ('ball', 'game_state')
+        }
+
+
+def file_format(fname):
+    """Determines the file format from the file extension.
+
+    Args:
+        fname: filepath ending with .parquet, .arrow or .feather.
+    Returns:
+        'parquet' or 'arrow'.
+    """
+    ext = str(fname).rsplit('.', 1)[-1].lower()
+    if ext in ('parquet', 'pq'):
+        return 'parquet'
+    if ext in ('arrow', 'feather', 'ipc'):
+        return 'arrow'
+    raise ValueError('Unknown tracking file format: %s' % fname)
+
+
+def flatten_columns(df):
+    """Flattens (player, axis) column tuples into the pid_axis names.
+
+    Args:
+        df: tracking data frame with flat or MultiIndex columns.
+    Returns:
+        A tuple with the list of flat column names and the list of player
+        ids in column order.
+    """
+    names = []
+    players = []
+    for col in df.columns:
+        if isinstance(col, tuple):
+            pid, axis = col
+            if pid == 'ball':
+                name = [k for k, v in __BALL_COLUMNS__.items() if v == col][0]
+            elif axis == '':
+                name = pid
+            else:
+                name = '%s_%s' % (pid, axis)
+        else:
+            name = str(col)
+            pid, _, axis = name.rpartition('_')
+        if axis in __AXES__ and pid != 'ball' and pid not in players:
+            players.append(pid)
+        names.append(name)
+    return names, players
+
+
+def tracking_table(df):
+    """Converts a tracking data frame into an Arrow table.
+
+    Args:
+        df: tracking data frame, see papi.pos_data_to_df.
+    Returns:
+        A pyarrow Table with the frame index as first column 'frame'.
+    """
+    import pyarrow as pa
+
+    names, players = flatten_columns(df)
+    arrays = [pa.array(np.asarray(df.index, dtype=np.int64))]
+    fields = ['frame']
+    for name, (_, col) in zip(names, df.items()):
+        values = col.to_numpy()
+        if name in __INT_COLUMNS__ and values.dtype.kind in 'iubf':
+            missing = np.isnan(values) if values.dtype.kind == 'f' else None
+            if missing is not None:
+                values = np.where(missing, 0, values)
+            arrays.append(pa.array(values.astype(np.int8), mask=missing,
+                type=pa.int8()))
+        else:
+            if values.dtype.kind == 'f':
+                values = values.astype(np.float32, copy=False)
+            arrays.append(pa.array(values))
+        fields.append(name)
+    metadata = {
+            'version': __FORMAT_VERSION__,
+            'players': players,
+            'multi_index': isinstance(df.columns, pd.MultiIndex)
+            }
+    return pa.Table.from_arrays(arrays, names=fields,
+            metadata={__METADATA_KEY__: json.dumps(metadata)})
+
+
+def write_tracking_frame(df, fname, compression = 'zstd', row_group_size = 2**16):
+    """Writes a tracking data frame into a columnar file.
+
+    Args:
+        df: tracking data frame, see papi.pos_data_to_df.
+        fname: filepath, the extension selects Parquet (.parquet) or
+               Arrow IPC (.arrow, .feather).
+        compression: Parquet compression codec { default: zstd }, Arrow
+               files are always written uncompressed.
+        row_group_size: rows per Parquet row group.
+    Returns:
+        Nothing
+    """
+    table = tracking_table(df)
+    if file_format(fname) == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, fname, compression=compression,
+                row_group_size=row_group_size)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, fname, compression='uncompressed')
+
+
+def read_tracking_metadata(fname):
+    """Reads the footballpy metadata of a tracking file.
+
+    Args:
+        fname: filepath of the tracking file.
+    Returns:
+        A dictionary with the keys 'players', 'multi_index' and 'columns'.
+    """
+    schema = read_schema(fname)
+    metadata = json.loads(schema.metadata[__METADATA_KEY__])
+    metadata['columns'] = [name for name in schema.names if name != 'frame']
+    return metadata
+
+
+def read_schema(fname):
+    """Reads the Arrow schema of a tracking file."""
+    if file_format(fname) == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(fname)
+    import pyarrow as pa
+    with pa.memory_map(str(fname), 'r') as source:
+        return pa.ipc.open_file(source).schema
+
+
+def read_tracking_frame(fname, columns = None, players = None, memory_map = True):
+    """Reads a tracking data frame from a columnar file.
+
+    Only the requested columns are read. Arrow IPC files are memory
+    mapped.
+
+    Args:
+        fname: filepath of the tracking file.
+        columns: list of column names, e.g. ['ball_x', 'ball_y'].
+        players: list of player ids whose coordinate columns are added.
+            If columns and players are both None all columns are read.
+        memory_map: memory map the file.
+    Returns:
+        The tracking data frame with the frame index. Multi indexed
+        frames are restored as such. Integer columns with missing values
+        are pandas nullable Int8 columns.
+    """
+    metadata = read_tracking_metadata(fname)
+    selected = None
+    if columns is not None or players is not None:
+        selected = list(columns or [])
+        for pid in players or []:
+            if pid not in metadata['players']:
+                raise KeyError('Unknown player %s in %s' % (pid, fname))
+            selected += ['%s_%s' % (pid, axis) for axis in __AXES__]
+        for name in selected:
+            if name not in metadata['columns']:
+                raise KeyError('Unknown column %s in %s' % (name, fname))
+        selected = ['frame'] + selected
+    if file_format(fname) == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(fname, columns=selected, memory_map=memory_map)
+    else:
+        import pyarrow.feather as feather
+        table = feather.read_table(fname, columns=selected, memory_map=memory_map)
+    df = table.to_pandas()
+    import pyarrow as pa
+    for name in __INT_COLUMNS__:
+        if name in table.column_names and table.column(name).null_count:
+            df[name] = table.column(name).to_pandas(
+                    types_mapper={pa.int8(): pd.Int8Dtype()}.get).array
+    df = df.set_index('frame')
+    df.index.name = None
+    if metadata['multi_index']:
+        df.columns = pd.MultiIndex.from_tuples([split_column(name, metadata['players'])
+            for name in df.columns])
+    return df
+
+
+def split_column(name, players):
+    """Splits a flat column name into the (player, axis) tuple."""
+    pid, _, axis = name.rpartition('_')
+    if pid in players:
+        return (pid, axis)
+    return __BALL_COLUMNS__.get(name, (name, ''))
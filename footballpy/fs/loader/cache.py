@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+cache: Persistent on disk cache for parsed match data.
+
+The results of the loader functions are pickled into a cache directory.
+Each entry is keyed by the content hash of the source files, the name
+and version of the loader and the remaining call arguments. A changed
+source file therefore results in a new key and the stale entry is
+eventually removed by the size bounded least recently used eviction.
+
+The cache is disabled by default. It is switched on either by calling
+enable() or by setting the environment variable FOOTBALLPY_CACHE_DIR.
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+import numpy as np
+
+__ENV_CACHE_DIR__ = 'FOOTBALLPY_CACHE_DIR'
+__DEFAULT_MAX_BYTES__ = 4 * 1024**3
+__ENTRY_SUFFIX__ = '.pkl'
+__cache__ = None
+
+
+class MatchCache:
+    """A size bounded on disk cache for parsed match data.
+
+    Attributes:
+        cache_dir: directory holding the cache entries.
+        max_bytes: maximum total size of the entries in bytes.
+    """
+
+    def __init__(self, cache_dir = None, max_bytes = __DEFAULT_MAX_BYTES__):
+        """Constructor method.
+
+        Args:
+            cache_dir: cache directory { default: ~/.cache/footballpy }
+            max_bytes: maximum cache size in bytes { default: 4 GB }
+        Returns:
+            Nothing
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'footballpy')
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hash_dir = os.path.join(cache_dir, 'hashes')
+        os.makedirs(self.hash_dir, exist_ok=True)
+
+    def file_digest(self, fname):
+        """Calculates the content hash of a source file.
+
+        Hashing a large position file takes a noticeable amount of time.
+        Therefore, the digest is memoized on disk in one file per source
+        path together with the size and modification time of the file.
+        A changed file overwrites its memo file.
+
+        Args:
+            fname: path to the source file.
+        Returns:
+            The hex digest of the file content.
+        """
+        fname = os.path.abspath(fname)
+        stat = os.stat(fname)
+        stamp = '%d:%d:' % (stat.st_size, stat.st_mtime_ns)
+        memo_file = os.path.join(self.hash_dir,
+                hashlib.sha1(fname.encode('utf-8')).hexdigest())
+        try:
+            with open(memo_file, 'r') as fid:
+                memo = fid.read()
+            if memo.startswith(stamp):
+                return memo[len(stamp):]
+        except (IOError, OSError):
+            pass
+        digest = hashlib.sha1()
+        with open(fname, 'rb') as fid:
+            for chunk in iter(lambda: fid.read(2**20), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        self._write_atomic(memo_file, (stamp + digest).encode('ascii'))
+        return digest
+
+    def key(self, name, version, files, params):
+        """Builds the cache key for a loader call.
+
+        Args:
+            name: name of the loader function.
+            version: version of the loader.
+            files: list with the paths of the source files.
+            params: sorted list of (name, value) tuples of further arguments.
+        Returns:
+            A hex string identifying the entry.
+        """
+        key = hashlib.sha1()
+        key.update(('%s:%s' % (name, version)).encode('utf-8'))
+        for fname in files:
+            key.update(self.file_digest(fname).encode('ascii'))
+        update_key(key, params)
+        return key.hexdigest()
+
+    def entry_path(self, key):
+        """Returns the path of the entry file for key."""
+        return os.path.join(self.cache_dir, key + __ENTRY_SUFFIX__)
+
+    def get(self, key):
+        """Looks up an entry.
+
+        Args:
+            key: cache key.
+        Returns:
+            A tuple with a found flag and the cached value.
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as fid:
+                value = pickle.load(fid)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+        # mark entry as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return True, value
+
+    def put(self, key, value):
+        """Stores an entry and evicts old entries if necessary.
+
+        Args:
+            key: cache key.
+            value: any picklable object.
+        Returns:
+            Nothing
+        """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._write_atomic(self.entry_path(key), data)
+        self.evict()
+
+    def entries(self):
+        """Returns the entries as (mtime, size, path) tuples, oldest first."""
+        res = []
+        for fname in os.listdir(self.cache_dir):
+            if not fname.endswith(__ENTRY_SUFFIX__):
+                continue
+            path = os.path.join(self.cache_dir, fname)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            res.append((stat.st_mtime, stat.st_size, path))
+        return sorted(res)
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits max_bytes."""
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Removes all entries and memoized file hashes."""
+        for mtime, size, path in self.entries():
+            os.remove(path)
+        for fname in os.listdir(self.hash_dir):
+            os.remove(os.path.join(self.hash_dir, fname))
+
+    def _write_atomic(self, path, data):
+        """Writes data to path such that readers never see partial files."""
+        fid, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fid, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def update_key(key, value):
+    """Feeds a canonical encoding of an argument value into a hash.
+
+    Equal values give the same encoding independent of the hash seed:
+    sets and dictionaries are encoded in sorted order, numpy arrays by
+    dtype, shape and content. Other types raise a TypeError instead of
+    being guessed from their repr.
+
+    Args:
+        key: hashlib object.
+        value: None, bool, int, float, str, bytes, numpy scalar or array,
+               or a list, tuple, set or dict of these.
+    Returns:
+        Nothing
+    """
+    if isinstance(value, (np.ndarray, np.generic)):
+        arr = np.ascontiguousarray(value)
+        if arr.dtype.hasobject:
+            raise TypeError('Object arrays can not be used as cache key')
+        key.update(('ndarray:%s:%s:' % (arr.dtype.str, arr.shape)).encode('ascii'))
+        key.update(arr.tobytes())
+    elif value is None or isinstance(value, (bool, int, float)):
+        key.update(('%s:%r;' % (type(value).__name__, value)).encode('utf-8'))
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        key.update(b'str:%d:' % len(data) + data)
+    elif isinstance(value, bytes):
+        key.update(b'bytes:%d:' % len(value) + value)
+    elif isinstance(value, (list, tuple)):
+        key.update(('%s:%d:' % (type(value).__name__, len(value))).encode('ascii'))
+        for item in value:
+            update_key(key, item)
+    elif isinstance(value, (set, frozenset)):
+        key.update(('set:%d:' % len(value)).encode('ascii'))
+        for item in sorted(_encode(item) for item in value):
+            key.update(item)
+    elif isinstance(value, dict):
+        key.update(('dict:%d:' % len(value)).encode('ascii'))
+        for item in sorted(_encode(item) for item in value.items()):
+            key.update(item)
+    else:
+        raise TypeError('Unsupported cache key argument of type %s' %
+                type(value).__name__)
+
+
+def _encode(value):
+    """Returns the digest of the canonical encoding of value."""
+    key = hashlib.sha1()
+    update_key(key, value)
+    return key.digest()
+
+
+def enable(cache_dir = None, max_bytes = __DEFAULT_MAX_BYTES__):
+    """Enables the cache for all decorated loaders.
+
+    Args:
+        cache_dir: cache directory, see MatchCache.
+        max_bytes: maximum cache size in bytes.
+    Returns:
+        The MatchCache instance.
+    """
+    global __cache__
+    __cache__ = MatchCache(cache_dir, max_bytes)
+    return __cache__
+
+
+def disable():
+    """Disables the cache."""
+    global __cache__
+    __cache__ = None
+
+
+def get_cache():
+    """Returns the active MatchCache or None."""
+    if __cache__ is None and os.environ.get(__ENV_CACHE_DIR__):
+        enable(os.environ[__ENV_CACHE_DIR__])
+    return __cache__
+
+
+def cached(version, files, ignore = ()):
+    """Decorator which caches the results of a loader function.
+
+    Args:
+        version: loader version, has to be increased whenever the output
+                 of the loader changes.
+        files: names of the arguments holding paths to source files.
+        ignore: names of the arguments which do not influence the result.
+    Returns:
+        The decorator. The decorated loader carries the attributes
+        cache_version and cache_key(match_cache, args, kwargs, version).
+    """
+    def decorator(loader):
+        signature = inspect.signature(loader)
+        name = loader.__module__ + '.' + loader.__name__
+
+        def call_key(match_cache, args, kwargs, version = version):
+            """Builds the cache key of a call, see MatchCache.key."""
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            # flatten **kwargs into the argument list
+            for param in signature.parameters.values():
+                if param.kind == param.VAR_KEYWORD:
+                    arguments.update(arguments.pop(param.name))
+            source_files = [arguments.pop(f) for f in files]
+            params = sorted((k, v) for k, v in arguments.items()
+                    if k not in ignore)
+            return match_cache.key(name, version, source_files, params)
+
+        @functools.wraps(loader)
+        def wrapper(*args, **kwargs):
+            match_cache = get_cache()
+            if match_cache is None:
+                return loader(*args, **kwargs)
+            key = call_key(match_cache, args, kwargs)
+            found, value = match_cache.get(key)
+            if not found:
+                value = loader(*args, **kwargs)
+                match_cache.put(key, value)
+            return value
+        wrapper.cache_version = version
+        wrapper.cache_key = call_key
+        return wrapper
+    return decorator
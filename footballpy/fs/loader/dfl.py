@@ -13,9 +13,18 @@ dfl: Module which provides parsing function for Soccer
 from __future__ import print_function
 from xml.sax import make_parser, ContentHandler
 from xml.sax.handler import feature_external_ges
+from xml.parsers import expat
+import os
+import re
+import copy
+from collections import OrderedDict
+from itertools import compress
 import datetime as dt
 import dateutil.parser as dup
 import numpy as np
+from footballpy import instrumentation
+from footballpy.fs.loader import cache
+from footballpy.fs.loader.growable_array import GrowableArray
 
 class MatchInformationParser(ContentHandler):
     """A XML parser for DFL match information files.
@@ -33,11 +42,17 @@ class MatchInformationParser(ContentHandler):
         self.teams = {'home': [], 'guest': [] }
         self.match = {'stadium': {'length': 0, 'width': 0 },
                       'home':'', 'guest':''}
+        # raw attributes of the General, Environment, Team, and Player tags
+        self.general = {}
+        self.environment = {}
+        self.team_attrs = {}
+        self.player_attrs = {'home': [], 'guest': []}
 
     def startElement(self,name,attrs):
         """Gets called for every starting tag."""
 
         if name == "Environment":
+            self.environment = dict(attrs.items())
             self.match['stadium']['length'] = float(attrs['PitchX'])
             self.match['stadium']['width'] = float(attrs['PitchY'])
 
@@ -49,6 +64,8 @@ class MatchInformationParser(ContentHandler):
                 color = attrs['PlayerMainColorOfShirt']
             else:
                 color = attrs['PlayerShirtMainColor']
+            if role in ('home', 'guest'):
+                self.team_attrs[role] = dict(attrs.items())
             if role == "home":
                 self.inHomeTeam = True
                 self.match['home'] = teamID
@@ -71,10 +88,13 @@ class MatchInformationParser(ContentHandler):
                     "trikot":trikot,"position":position}
             if self.inHomeTeam:
                 self.teams['home'].append(player)
+                self.player_attrs['home'].append(dict(attrs.items()))
             else:
                 self.teams['guest'].append(player)
+                self.player_attrs['guest'].append(dict(attrs.items()))
 
         elif name == 'General':
+            self.general = dict(attrs.items())
             # get game name
             game_name_index = ('MatchTitle' if 'MatchTitle' in
                     attrs.keys() else 'GameTitle')
@@ -113,11 +133,70 @@ class MatchInformationParser(ContentHandler):
     
     def run(self,fname):
         """Runs the parse on fname."""
-        parser = make_parser()
-        parser.setContentHandler(self)
-        parser.parse(fname)
-        print('finished parsing match information')
+        with instrumentation.timed('dfl.match_information',
+                bytes=instrumentation.file_size(fname)):
+            parser = make_parser()
+            parser.setContentHandler(self)
+            parser.parse(fname)
+
+
+__MATCH_INFORMATION_CACHE_SIZE__ = 1024
+__match_information__ = OrderedDict()
 
+def read_match_information(match_info_file):
+    """Parses a MatchInformation file once and memoizes the result.
+
+        The result is kept in memory keyed by the absolute path of the
+        file and is reparsed when the modification time or the size of
+        the file changes. The memo holds the most recently used
+        __MATCH_INFORMATION_CACHE_SIZE__ files. The returned structure is
+        shared, use load_match_information, get_match_info, or
+        get_team_info to obtain copies.
+
+        Args:
+            match_info_file: full path to the MatchInformation file.
+        Returns:
+            A dictionary with the 'match' and 'teams' dictionaries of the
+            MatchInformationParser and the raw attributes of the
+            'general', 'environment', 'team_attrs', and 'player_attrs'.
+    """
+    fname = os.path.abspath(match_info_file)
+    stat = os.stat(fname)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    entry = __match_information__.get(fname)
+    if entry is not None and entry[0] == stamp:
+        __match_information__.move_to_end(fname)
+        return entry[1]
+    mip = MatchInformationParser()
+    mip.run(fname)
+    teams, match = mip.getTeamInformation()
+    info = {'match': match, 'teams': teams, 'general': mip.general,
+            'environment': mip.environment, 'team_attrs': mip.team_attrs,
+            'player_attrs': mip.player_attrs}
+    __match_information__[fname] = (stamp, info)
+    __match_information__.move_to_end(fname)
+    while len(__match_information__) > __MATCH_INFORMATION_CACHE_SIZE__:
+        __match_information__.popitem(last=False)
+    return info
+
+def clear_match_information():
+    """Empties the MatchInformation memo."""
+    __match_information__.clear()
+
+def load_match_information(match_info_file):
+    """Loads match, team, and stadium information in a single pass.
+
+        Args:
+            match_info_file: full path to the MatchInformation file.
+        Returns:
+            A tuple with the match information dictionary, the teams
+            dictionary, and the stadium dictionary with length and width,
+            see MatchInformationParser.
+    """
+    info = read_match_information(match_info_file)
+    match = copy.deepcopy(info['match'])
+    teams = copy.deepcopy(info['teams'])
+    return match, teams, dict(match['stadium'])
 
 def convertTime(tstring):
     """Converts time stamps into datetimes.
@@ -133,6 +212,80 @@ def convertTime(tstring):
     return dup.parse(tstring) 
 
 
+def convert_time_array(tstrings, return_offsets = False):
+    """Converts time stamps into a datetime64 array.
+
+        Decodes the fixed format DFL time stamps
+        (YYYY-MM-DDThh:mm:ss.fff+hh:mm) in one vectorized step without
+        creating datetime objects. The UTC offset is subtracted such that
+        the returned times are in UTC.
+
+        Args:
+            tstrings: sequence of timestamp strings (str or bytes)
+                      all sharing the same format.
+            return_offsets: additionally return the UTC offsets.
+        Returns:
+            A numpy array of type datetime64[ns]. With return_offsets a
+            tuple with the array and an int array with the UTC offsets in
+            minutes (None for time stamps ending with 'Z' or without
+            offset).
+    """
+    tstrings = np.asarray(tstrings)
+    if tstrings.size == 0:
+        times = np.array([], dtype='datetime64[ns]')
+        return (times, None) if return_offsets else times
+    if tstrings.dtype.kind == 'U':
+        tstrings = tstrings.astype('S')
+    width = tstrings.dtype.itemsize
+    chars = tstrings.view('u1').reshape((tstrings.size, width))
+    if chars[0,width-6] in b'+-':
+        local_width = width - 6
+    elif chars[0,width-1] == ord('Z'):
+        local_width = width - 1
+    else:
+        local_width = width
+    times = tstrings.astype('S%d' % local_width).astype('datetime64[ns]')
+    offset = None
+    if local_width == width - 6:
+        digits = chars[:,local_width+1:].astype('int64') - ord('0')
+        offset = (digits[:,0]*10 + digits[:,1])*60 + digits[:,3]*10 + digits[:,4]
+        offset[chars[:,local_width] == ord('-')] *= -1
+        times -= offset.astype('timedelta64[m]')
+    if return_offsets:
+        return times, offset
+    return times
+
+
+def convert_time_objects(tstrings):
+    """Converts time stamps into timezone aware datetime objects.
+
+        Gives the same result as convertTime for every time stamp, but
+        decodes the time stamps vectorized with convert_time_array and
+        only creates the datetime objects at the end.
+
+        Args:
+            tstrings: sequence of timestamp strings (str or bytes)
+                      all sharing the same format.
+        Returns:
+            A list of datetime objects.
+    """
+    import dateutil.tz
+
+    times, offsets = convert_time_array(tstrings, return_offsets=True)
+    if len(times) == 0:
+        return []
+    if offsets is None:
+        tzinfo = dateutil.tz.tzutc() if np.asarray(tstrings)[0][-1:] in ('Z', b'Z') else None
+        return [t.replace(tzinfo=tzinfo) for t in
+                times.astype('datetime64[us]').tolist()]
+    local = (times + offsets.astype('timedelta64[m]')).astype('datetime64[us]').tolist()
+    tzinfos = dict((offset, dateutil.tz.tzoffset(None, offset * 60))
+            for offset in np.unique(offsets).tolist())
+    return [t.replace(tzinfo=tzinfos[offset])
+            for t, offset in zip(local, offsets.tolist())]
+
+
+
 class Substitution:
     """
     A simple wrapper object for substitution events.
@@ -191,15 +344,49 @@ class MatchEventParser(ContentHandler):
             self.playing_time[section][1] = convertTime(self.eventTime)
     
     def run(self,fname):
-        parser = make_parser()
-        parser.setContentHandler(self)
-        parser.parse(fname)
-        print('finished parsing event data')
+        with instrumentation.timed('dfl.match_events',
+                bytes=instrumentation.file_size(fname)) as metrics:
+            parser = make_parser()
+            parser.setContentHandler(self)
+            parser.parse(fname)
+            metrics['substitutions'] = len(self.subs)
     
     def getEventInformation(self):
         return self.playing_time, self.subs
 
 
+def iter_match_events(match_event_file):
+    """Generator which streams all events of a DFL event file.
+
+        The file is read incrementally with iterparse and every Event
+        element is cleared as soon as it is processed, hence the memory
+        usage does not depend on the size of the file.
+
+        Args:
+            match_event_file: full path to match event file.
+        Returns:
+            Yields (event_attrs, event_type, type_attrs, children) tuples
+            with the attribute dictionary of the Event element, the tag
+            and the attributes of the event type element, and a list of
+            (tag, attributes) tuples of the elements below the type element.
+    """
+    from lxml import etree
+
+    for _, event in etree.iterparse(match_event_file, events=('end',),
+            tag='Event'):
+        event_attrs = dict(event.attrib)
+        for element in event:
+            if not isinstance(element.tag, str):
+                continue
+            children = [(child.tag, dict(child.attrib)) for child in element.iter()
+                    if child is not element and isinstance(child.tag, str)]
+            yield event_attrs, element.tag, dict(element.attrib), children
+        # free the processed events
+        event.clear()
+        while event.getprevious() is not None:
+            del event.getparent()[0]
+
+
 def get_match_events(match_event_file):
     """Function to parse dfl match events.
 
@@ -208,32 +395,122 @@ def get_match_events(match_event_file):
         Returns:
             a dictionary with event entries.
     """
-    from lxml import etree
-
     def prepend_name_to_itemlist(name, item_lst):
         """Prepends a name to items"""
         return [(name + item[0], item[1]) for item in item_lst]
     
-    def process_goal_shot(shot):
+    def process_goal_shot(event_attrs, shot_attrs, children):
         """Small formatter for goal shots:
             Args:
             Returns:
         """
-        event_entries = shot.xpath('./ancestor::Event')[0].items()
-        shot_entries = shot.items()
-        result_entries = prepend_name_to_itemlist('Result:', shot.getchildren()[0].items())
-        result_type = [('ResultType', shot.getchildren()[0].tag)]
-        shot_dict = dict(event_entries + shot_entries + result_entries + result_type)
+        result_tag, result_attrs = children[0]
+        result_entries = prepend_name_to_itemlist('Result:', result_attrs.items())
+        result_type = [('ResultType', result_tag)]
+        shot_dict = dict(list(event_attrs.items()) + list(shot_attrs.items()) +
+                result_entries + result_type)
         shot_dict['EventTime'] = dup.parse(shot_dict['EventTime'])
         return shot_dict
 
     result = dict()
-
-    root = etree.parse(match_event_file).getroot()
-    result['goal_shots'] = [process_goal_shot(shot) for shot in root.xpath('//ShotAtGoal')]
+    result['goal_shots'] = [process_goal_shot(event_attrs, type_attrs, children)
+            for event_attrs, event_type, type_attrs, children in
+            iter_match_events(match_event_file) if event_type == 'ShotAtGoal']
     return result
 
 
+__event_team_attributes__ = ('Team', 'WinnerTeam', 'TeamFouler', 'FoulerTeam')
+__event_player_attributes__ = ('Player', 'Winner', 'Fouler', 'PlayerIn')
+
+def convert_event_times(tstrings):
+    """Converts event time stamps of possibly differing formats.
+
+        Event files mix time stamps with and without fractional seconds.
+        The time stamps are grouped by their length and every group is
+        decoded with convert_time_array.
+
+        Args:
+            tstrings: sequence of timestamp strings.
+        Returns:
+            A numpy array of type datetime64[ns] in UTC.
+    """
+    tstrings = np.asarray(tstrings, dtype='S')
+    times = np.empty(tstrings.size, dtype='datetime64[ns]')
+    lengths = np.char.str_len(tstrings)
+    for length in np.unique(lengths):
+        idx = lengths == length
+        times[idx] = convert_time_array(tstrings[idx].astype('S%d' % length))
+    return times
+
+
+def get_match_event_table(match_event_file, event_types = None):
+    """Reads all events of a DFL event file into a columnar table.
+
+        The file is parsed in a single streaming pass, see iter_match_events.
+
+        Args:
+            match_event_file: full path to match event file.
+            event_types: event type tags to keep, e.g. ['ShotAtGoal', 'Play'],
+                         None keeps all events.
+        Returns:
+            A pandas dataframe with one row per event in file order and the
+            columns
+                event_id: EventId
+                event_time: datetime64[ns] time stamp in UTC
+                event_type: tag of the event, categorical
+                event_subtype: tag of the first element below the event
+                               type, e.g. the result of a shot, categorical
+                team: id of the (acting) team
+                player: id of the (acting) player
+                game_section: GameSection
+                x, y: float32 event position, NaN if not available
+                attributes: dictionary with all attributes of the event type
+                            element, attributes of the sub elements are
+                            prefixed with their tag, e.g. 'Pass:Recipient'.
+    """
+    import pandas as pd
+
+    if event_types is not None:
+        event_types = set(event_types)
+    columns = {'event_id': [], 'event_time': [], 'event_type': [],
+            'event_subtype': [], 'team': [], 'player': [], 'game_section': [],
+            'x': [], 'y': [], 'attributes': []}
+
+    def first_of(attrs, names):
+        for name in names:
+            if name in attrs:
+                return attrs[name]
+        return None
+
+    for event_attrs, event_type, type_attrs, children in iter_match_events(match_event_file):
+        if event_types is not None and event_type not in event_types:
+            continue
+        attributes = dict(type_attrs)
+        for tag, child_attrs in children:
+            for name, value in child_attrs.items():
+                attributes[tag + ':' + name] = value
+        columns['event_id'].append(event_attrs.get('EventId'))
+        columns['event_time'].append(event_attrs.get('EventTime', ''))
+        columns['event_type'].append(event_type)
+        columns['event_subtype'].append(children[0][0] if children else '')
+        columns['team'].append(first_of(type_attrs, __event_team_attributes__))
+        columns['player'].append(first_of(type_attrs, __event_player_attributes__))
+        columns['game_section'].append(type_attrs.get('GameSection'))
+        columns['x'].append(event_attrs.get('X-Position', 'nan'))
+        columns['y'].append(event_attrs.get('Y-Position', 'nan'))
+        columns['attributes'].append(attributes)
+
+    columns['event_time'] = convert_event_times(columns['event_time'])
+    columns['x'] = np.array(columns['x'], dtype='float64').astype('float32')
+    columns['y'] = np.array(columns['y'], dtype='float64').astype('float32')
+    table = pd.DataFrame(columns, columns=['event_id', 'event_time',
+        'event_type', 'event_subtype', 'team', 'player', 'game_section',
+        'x', 'y', 'attributes'])
+    table['event_type'] = table['event_type'].astype('category')
+    table['event_subtype'] = table['event_subtype'].astype('category')
+    return table
+
+
 def calculate_frame_estimate(playing_time,padding_time = 5*60, freq = 25):
     secs_1st = (playing_time['firstHalf'][1] - playing_time['firstHalf'][0]).seconds
     secs_2nd = (playing_time['secondHalf'][1] - playing_time['secondHalf'][0]).seconds
@@ -246,7 +523,7 @@ class MatchPositionParser(ContentHandler):
     A parser for the position data.
     Attributes:
         currentID
-        currentPos
+        currentPos: GrowableArray collecting the frames of the current FrameSet.
         timeStamps
         tmpTimeStamp
         inFrameSet
@@ -257,11 +534,20 @@ class MatchPositionParser(ContentHandler):
         ball
         match
         teams
+        time_format: 'datetime' stores the time stamps as lists of datetime
+            objects, 'datetime64' as numpy datetime64[ns] arrays in UTC.
+        person_ids: PersonIds of the players to load, None loads all players.
+        team_roles: subset of ('home', 'guest', 'ball') to load, None loads all.
+        sections: subset of ('firstHalf', 'secondHalf') to load, None loads both.
+        frame_range: (first, last) tuple with the inclusive range of
+            frame numbers N to load, None loads all frames.
     """
-    def __init__(self,match,teams,no_frames = 200000):
+    def __init__(self,match,teams,no_frames = 200000, time_format = 'datetime',
+            person_ids = None, team_roles = None, sections = None,
+            frame_range = None):
         ContentHandler.__init__(self)
         self.currentID = ""
-        self.currentPos = np.zeros((no_frames,6),dtype='float32')
+        self.currentPos = GrowableArray(6, 'float32', capacity=no_frames)
         self.timeStamps = [[],[]]
         self.tmpTimeStamp = []
         self.inFrameSet = False
@@ -275,6 +561,18 @@ class MatchPositionParser(ContentHandler):
         self.match = match
         self.teams = teams
         self.trace = True
+        if time_format not in ('datetime', 'datetime64'):
+            raise ValueError('Unknown time format: %s' % time_format)
+        self.time_format = time_format
+        if time_format == 'datetime64':
+            self.timeStamps = [np.array([], dtype='datetime64[ns]')] * 2
+        self.person_ids = None if person_ids is None else set(person_ids)
+        self.team_roles = None if team_roles is None else set(team_roles)
+        self.sections = None if sections is None else set(sections)
+        self.frame_range = frame_range
+        self.skipFrameSet = False
+        self.totalFrames = 0
+        self.totalFrameSets = 0
 
     def startElement(self,name,attrs):
         if name == "FrameSet":
@@ -283,81 +581,153 @@ class MatchPositionParser(ContentHandler):
             self.currentID = attrs['PersonId']
             self.gameSection = attrs["GameSection"]
             self.teamID = attrs['TeamId']
+            self.skipFrameSet = not self.is_selected(
+                    self.currentID, self.teamID, self.gameSection)
             if self.teamID.upper() == "BALL":
                 self.isBall = True
-                if self.trace:
-                    print("Ball")
-            if self.trace:
-                print(self.currentID)
-        elif (name == "Frame") & self.inFrameSet:
+        elif (name == "Frame") & self.inFrameSet & (not self.skipFrameSet):
+            frame = float(attrs['N'])
+            if (self.frame_range is not None and
+                    not self.frame_range[0] <= frame <= self.frame_range[1]):
+                return
             x = float(attrs['X'])
             y = float(attrs['Y'])
-            frame = float(attrs['N'])
             if not self.isBall:
-                self.currentPos[self.frameCounter,:3] = (frame,x,y)
+                self.currentPos.push((frame,x,y,0.0,0.0,0.0))
             else: # ball data
                 z = float(attrs['Z'])
                 possession = float(attrs['BallPossession'])
                 ball_status = float(attrs['BallStatus'])
-                self.currentPos[self.frameCounter,] = ( 
-                    frame,x,y,z,possession,ball_status)
+                self.currentPos.push((
+                    frame,x,y,z,possession,ball_status))
                 # add timestamp information
-                timestamp = convertTime(attrs['T'])
-                self.tmpTimeStamp.append(timestamp)
+                if self.time_format == 'datetime':
+                    self.tmpTimeStamp.append(convertTime(attrs['T']))
+                else:
+                    self.tmpTimeStamp.append(attrs['T'])
 
             self.frameCounter += 1
 
     def endElement(self,name):
         if name == "FrameSet":
-            if self.trace:
-                print("Processed %d frames" % (self.frameCounter))
             self.inFrameSet = False
-            # get team: A or B            
-            section = self.gameSection
-            teamID = self.teamID
-            if self.isBall: # ball data
-                if section == "firstHalf":
-                    self.ball[0] = np.copy(
-                            self.currentPos[:self.frameCounter,])
-                    self.timeStamps[0] = self.tmpTimeStamp
-
-                elif section == "secondHalf":
-                    self.ball[1] = np.copy(
-                            self.currentPos[:self.frameCounter,])
-                    self.timeStamps[1] = self.tmpTimeStamp
-                else:
-                    raise LookupError
-                self.tmpTimeStamp = []
-
-            else: # player data
-                secID = '1st' if section == 'firstHalf' else '2nd'
-                teamRole = 'home' if teamID == self.match['home'] else 'guest'
-                play_pos = (self.teams[teamRole][[p['id'] for p in 
-                    self.teams[teamRole]].index(self.currentID)]['position'])
-                entry = (self.currentID,np.copy(self.currentPos[:self.frameCounter,:3]),play_pos)
-                self.position_data[teamRole][secID].append(entry)
+            timestamps = self.tmpTimeStamp
+            if not self.skipFrameSet:
+                if self.isBall: # ball data
+                    data = self.currentPos.data()
+                    if self.time_format == 'datetime64':
+                        timestamps = convert_time_array(timestamps)
+                else: # player data
+                    data = self.currentPos.view()[:,:3].copy()
+                self.store_frameset(self.currentID, self.teamID,
+                        self.gameSection, data, timestamps)
             # cleaning up
+            self.tmpTimeStamp = []
+            self.currentPos.clear()
             self.gameSection = "NaN"
             self.frameCounter = 0
             self.teamID = ''
+            self.skipFrameSet = False
             if self.isBall:                
                 self.isBall = False
 
+    def team_role(self, team_id):
+        """Maps a TeamId onto 'home', 'guest' or 'ball'."""
+        if team_id.upper() == "BALL":
+            return 'ball'
+        return 'home' if team_id == self.match['home'] else 'guest'
+
+    def is_selected(self, person_id, team_id, section):
+        """Checks whether a FrameSet passes the selection.
+
+        Args:
+            person_id: PersonId of the FrameSet.
+            team_id: TeamId of the FrameSet.
+            section: GameSection of the FrameSet.
+        Returns:
+            True if the FrameSet should be loaded.
+        """
+        role = self.team_role(team_id)
+        if self.team_roles is not None and role not in self.team_roles:
+            return False
+        if self.sections is not None and section not in self.sections:
+            return False
+        if (role != 'ball' and self.person_ids is not None and
+                person_id not in self.person_ids):
+            return False
+        return True
+
+    def store_frameset(self, person_id, team_id, section, data, timestamps):
+        """Stores a completed FrameSet into the result structure.
+
+        Args:
+            person_id: PersonId of the FrameSet.
+            team_id: TeamId of the FrameSet ('Ball' for the ball).
+            section: GameSection of the FrameSet.
+            data: numpy array with the frame data.
+            timestamps: time stamps of the frames, only used for the ball.
+        Returns:
+            Nothing
+        """
+        self.totalFrames += data.shape[0]
+        self.totalFrameSets += 1
+        if self.trace:
+            instrumentation.emit('dfl.frameset', person_id=person_id,
+                    team_id=team_id, section=section, frames=data.shape[0])
+        if team_id.upper() == "BALL": # ball data
+            if section == "firstHalf":
+                self.ball[0] = data
+                self.timeStamps[0] = timestamps
+            elif section == "secondHalf":
+                self.ball[1] = data
+                self.timeStamps[1] = timestamps
+            else:
+                raise LookupError
+        else: # player data
+            if self.frame_range is not None and data.shape[0] == 0:
+                # player not on the pitch within the frame range
+                return
+            # get team: A or B            
+            secID = '1st' if section == 'firstHalf' else '2nd'
+            teamRole = self.team_role(team_id)
+            play_pos = (self.teams[teamRole][[p['id'] for p in 
+                self.teams[teamRole]].index(person_id)]['position'])
+            entry = (person_id, data, play_pos)
+            self.position_data[teamRole][secID].append(entry)
+
+    def timed_run(self, fname):
+        """Returns the instrumentation context of a run over fname."""
+        return instrumentation.timed('dfl.position_data',
+                parser=type(self).__name__,
+                bytes=instrumentation.file_size(fname))
+
+    def run_metrics(self):
+        """Returns the measurements of a finished run.
+
+        Returns:
+            A dictionary with the number of stored FrameSets and frames
+            and the size of the position and ball arrays in bytes.
+        """
+        return {'framesets': self.totalFrameSets, 'frames': self.totalFrames,
+                'peak_bytes': instrumentation.nbytes([self.position_data,
+                    self.ball])}
+
     def run(self, fname, trace = True):
         """Starts parsing fname.
 
         Args:
             fname: filepath of the file.
-            trace: flag whether to print reading statements.
+            trace: flag whether to report every FrameSet, see
+                   footballpy.instrumentation.
         Returns:
             Nothing
         """
         self.trace = trace
         parser = make_parser()
         parser.setContentHandler(self)
-        print('Start parsing position data')
-        parser.parse(fname)
-        print('finished parsing position data')
+        with self.timed_run(fname) as metrics:
+            parser.parse(fname)
+            metrics.update(self.run_metrics())
 
 
     def getPositionInformation(self):
@@ -369,6 +739,440 @@ class MatchPositionParser(ContentHandler):
         """
         return self.position_data, self.ball, self.timeStamps
 
+
+# Frame attributes in the column order of the position arrays.
+__player_columns__ = ('N', 'X', 'Y')
+__ball_columns__ = ('N', 'X', 'Y', 'Z', 'BallPossession', 'BallStatus')
+__frame_attributes__ = __ball_columns__ + ('T',)
+# selected FrameSet bytes below which the parallel parser stays serial
+__PARALLEL_MIN_BYTES__ = 64 * 1024**2
+__frame_patterns__ = {name: re.compile((' %s="([^"]*)"' % name).encode())
+        for name in __frame_attributes__}
+
+
+def find_framesets(buf, start = 0, partial = False):
+    """Generator over the byte ranges of the FrameSet blocks in buf.
+
+        Args:
+            buf: bytes like object (bytes, mmap) with the position data.
+            start: offset where the search starts.
+            partial: if True buf may end within a FrameSet, which
+                     then ends the iteration instead of raising a
+                     LookupError.
+        Returns:
+            Yields (start, end) tuples such that buf[start:end] contains
+            exactly one FrameSet element.
+    """
+    pos = buf.find(b'<FrameSet', start)
+    while pos != -1:
+        header_end = buf.find(b'>', pos)
+        if header_end == -1:
+            if partial:
+                return
+            raise LookupError('Incomplete FrameSet at offset %d' % pos)
+        if buf[header_end-1:header_end] == b'/': # empty FrameSet
+            end = header_end + 1
+        else:
+            end = buf.find(b'</FrameSet>', header_end)
+            if end == -1:
+                if partial:
+                    return
+                raise LookupError('Incomplete FrameSet at offset %d' % pos)
+            end += len(b'</FrameSet>')
+        yield pos, end
+        pos = buf.find(b'<FrameSet', end)
+
+
+def parse_frameset_header(block):
+    """Extracts the attributes of the FrameSet tag with expat.
+
+        Args:
+            block: bytes of a FrameSet element.
+        Returns:
+            A dictionary with the FrameSet attributes.
+    """
+    header = block[:block.find(b'>') + 1]
+    if not header.endswith(b'/>'):
+        header += b'</FrameSet>'
+    attributes = []
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = lambda name, attrs: attributes.append(attrs)
+    parser.Parse(header, True)
+    return attributes[0]
+
+
+def scan_frame_columns(block, names):
+    """Extracts the raw Frame attribute columns from a FrameSet block.
+
+        The attributes are pulled out with one regular expression scan
+        per column. If the block does not follow the regular layout,
+        i.e. not every Frame carries every requested attribute, None
+        is returned and the block has to be parsed element wise.
+
+        Args:
+            block: bytes of a FrameSet element.
+            names: attribute names to extract.
+        Returns:
+            A dictionary from attribute names to lists with the raw
+            byte strings or None.
+    """
+    body = block[block.find(b'>') + 1:]
+    no_frames = body.count(b'<Frame ')
+    columns = {}
+    for name in names:
+        columns[name] = __frame_patterns__[name].findall(body)
+        if len(columns[name]) != no_frames:
+            return None
+    return columns
+
+
+def columns_to_array(columns, names):
+    """Converts raw Frame attribute columns into a float32 array.
+
+        Every column is converted in one vectorized step. The strings are
+        first converted to double precision and then rounded to float32
+        which gives the same values as the element wise float() calls
+        of the MatchPositionParser.
+
+        Args:
+            columns: dictionary from attribute names to lists of strings.
+            names: attribute names in the order of the output columns.
+        Returns:
+            A numpy array with shape (no_frames, len(names)).
+    """
+    no_frames = len(columns[names[0]])
+    data = np.empty((no_frames, len(names)), dtype='float32')
+    for j, name in enumerate(names):
+        data[:,j] = np.array(columns[name], dtype='float64')
+    return data
+
+
+def parse_frame_columns(block, names):
+    """Extracts the Frame attribute columns element wise with expat.
+
+        Fallback for FrameSet blocks which can not be handled
+        by scan_frame_columns.
+
+        Args:
+            block: bytes of a FrameSet element.
+            names: attribute names to extract.
+        Returns:
+            A dictionary from attribute names to lists with the values.
+    """
+    frames = []
+    def start_element(name, attrs):
+        if name == "Frame":
+            frames.append(attrs)
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start_element
+    parser.Parse(block, True)
+    return {name: [f[name] for f in frames] for name in names}
+
+
+def read_frameset(block, time_format = 'datetime', frame_range = None):
+    """Parses a single FrameSet block.
+
+        Args:
+            block: bytes of a FrameSet element.
+            time_format: 'datetime' or 'datetime64', see MatchPositionParser,
+                         'raw' keeps the undecoded time stamps as bytes
+                         array, see decode_times.
+            frame_range: (first, last) inclusive range of frames to keep,
+                         None keeps all frames.
+        Returns:
+            A tuple with the FrameSet attributes, the float32 frame data and
+            the time stamps (empty for players).
+    """
+    attrs = parse_frameset_header(block)
+    is_ball = attrs['TeamId'].upper() == "BALL"
+    names = __frame_attributes__ if is_ball else __player_columns__
+    columns = scan_frame_columns(block, names)
+    if columns is None:
+        # irregular block: fall back to expat
+        columns = parse_frame_columns(block, names)
+    if frame_range is not None:
+        frames = np.array(columns['N'], dtype='float64')
+        mask = (frames >= frame_range[0]) & (frames <= frame_range[1])
+        columns = {name: list(compress(columns[name], mask)) for name in names}
+    if is_ball:
+        data = columns_to_array(columns, __ball_columns__)
+        if time_format == 'raw':
+            timestamps = np.array(columns['T'], dtype='S')
+        elif time_format == 'datetime64':
+            timestamps = convert_time_array(columns['T'])
+        else:
+            timestamps = convert_time_objects(columns['T'])
+    else:
+        data = columns_to_array(columns, __player_columns__)
+        timestamps = []
+    return attrs, data, timestamps
+
+
+def scan_frameset_offsets(fname):
+    """Determines the byte ranges of all FrameSets in a position file.
+
+        The file is memory mapped and only searched for the FrameSet tags,
+        the frames themselves are not parsed.
+
+        Args:
+            fname: filepath of the position data file.
+        Returns:
+            A list with (start, end) byte offsets.
+    """
+    import mmap
+
+    with open(fname, 'rb') as fid:
+        if os.fstat(fid.fileno()).st_size == 0:
+            return []
+        buf = mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return list(find_framesets(buf))
+        finally:
+            buf.close()
+
+
+def scan_frameset_headers(fname):
+    """Determines the byte ranges and attributes of all FrameSets.
+
+        Like scan_frameset_offsets but additionally parses the FrameSet
+        tags. The frames themselves are not parsed.
+
+        Args:
+            fname: filepath of the position data file.
+        Returns:
+            A list with (start, end, attributes) tuples.
+    """
+    import mmap
+
+    with open(fname, 'rb') as fid:
+        if os.fstat(fid.fileno()).st_size == 0:
+            return []
+        buf = mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return [(start, end,
+                parse_frameset_header(buf[start:buf.find(b'>', start) + 1]))
+                for start, end in find_framesets(buf)]
+        finally:
+            buf.close()
+
+
+def decode_times(timestamps, time_format = 'datetime'):
+    """Decodes the raw time stamps of read_frameset(time_format = 'raw').
+
+        Args:
+            timestamps: bytes array with the time stamps.
+            time_format: 'datetime' or 'datetime64', see MatchPositionParser.
+        Returns:
+            The time stamps in time_format.
+    """
+    if time_format == 'datetime64':
+        return convert_time_array(timestamps)
+    return convert_time_objects(timestamps)
+
+
+def read_frameset_range(fname, start, end, time_format = 'datetime',
+        frame_range = None):
+    """Reads and parses the FrameSet at fname[start:end].
+
+        Args:
+            fname: filepath of the position data file.
+            start: byte offset of the FrameSet tag.
+            end: byte offset after the closing FrameSet tag.
+            time_format: 'datetime' or 'datetime64', see MatchPositionParser.
+            frame_range: see read_frameset
+        Returns:
+            see read_frameset
+    """
+    with open(fname, 'rb') as fid:
+        fid.seek(start)
+        block = fid.read(end - start)
+    return read_frameset(block, time_format, frame_range)
+
+
+class FastMatchPositionParser(MatchPositionParser):
+    """
+    A bulk parser for the position data.
+
+    The file is split into its FrameSet blocks. For each block the raw
+    Frame attributes are collected column wise and converted into
+    float32 columns in one vectorized step. Blocks which deviate from
+    the regular Frame layout are parsed element wise with expat instead.
+    The result is identical to MatchPositionParser which stays the
+    reference implementation. FrameSets which are not selected are
+    skipped after reading their header.
+    """
+    def __init__(self, match, teams, time_format = 'datetime', **selection):
+        """Initialization, see MatchPositionParser for the selection arguments."""
+        MatchPositionParser.__init__(self, match, teams, no_frames=0,
+                time_format=time_format, **selection)
+
+    def add_frameset(self, attrs, data, timestamps):
+        """Stores a FrameSet as returned by read_frameset.
+
+        Args:
+            attrs: FrameSet attributes.
+            data: frame data.
+            timestamps: time stamps of the frames.
+        Returns:
+            Nothing
+        """
+        self.store_frameset(attrs['PersonId'], attrs['TeamId'],
+                attrs['GameSection'], data, timestamps)
+
+    def parse_frameset(self, block):
+        """Parses a single FrameSet block and stores the result.
+
+        Args:
+            block: bytes of a FrameSet element.
+        Returns:
+            Nothing
+        """
+        attrs, data, timestamps = self.read_selected(block)
+        if attrs is not None:
+            self.add_frameset(attrs, data, timestamps)
+
+    def iter_framesets(self, fname, chunk_size = 2**22):
+        """Generator which yields every FrameSet as soon as it is parsed.
+
+        The file is read in chunks of chunk_size bytes and each completed
+        FrameSet is converted and handed out directly. Nothing is stored
+        in position_data, therefore the memory usage is bounded by the
+        largest FrameSet. The selection arguments are respected. The ball
+        time stamps are not part of the stream.
+
+        Args:
+            fname: filepath of the file.
+            chunk_size: number of bytes read at once.
+        Returns:
+            Yields (person_id, team_role, section, data) tuples with
+            team_role in ('home', 'guest', 'ball'), section in
+            ('1st', '2nd') and the numpy array with the frame data.
+        """
+        buf = bytearray()
+        with open(fname, 'rb') as fid:
+            chunk = fid.read(chunk_size)
+            while chunk:
+                buf += chunk
+                chunk = fid.read(chunk_size)
+                consumed = 0
+                for start, end in find_framesets(buf, partial=bool(chunk)):
+                    attrs, data, timestamps = self.read_selected(bytes(buf[start:end]))
+                    consumed = end
+                    if attrs is not None:
+                        yield (attrs['PersonId'], self.team_role(attrs['TeamId']),
+                                '1st' if attrs['GameSection'] == 'firstHalf' else '2nd',
+                                data)
+                if consumed == 0 and buf.find(b'<FrameSet') == -1:
+                    # keep a possibly truncated start tag
+                    consumed = max(len(buf) - len(b'<FrameSet'), 0)
+                del buf[:consumed]
+
+    def read_selected(self, block):
+        """Parses a FrameSet block if it passes the selection.
+
+        Args:
+            block: bytes of a FrameSet element.
+        Returns:
+            see read_frameset, (None, None, None) for unselected FrameSets.
+        """
+        attrs = parse_frameset_header(block)
+        if not self.is_selected(attrs['PersonId'], attrs['TeamId'],
+                attrs['GameSection']):
+            return None, None, None
+        return read_frameset(block, self.time_format, self.frame_range)
+
+    def run(self, fname, trace = True):
+        """Starts parsing fname.
+
+        Args:
+            fname: filepath of the file.
+            trace: flag whether to report every FrameSet, see
+                   footballpy.instrumentation.
+        Returns:
+            Nothing
+        """
+        self.trace = trace
+        with self.timed_run(fname) as metrics:
+            with open(fname, 'rb') as fid:
+                buf = fid.read()
+            for start, end in find_framesets(buf):
+                self.parse_frameset(buf[start:end])
+            metrics.update(self.run_metrics())
+
+
+class ParallelMatchPositionParser(FastMatchPositionParser):
+    """
+    A process parallel parser for the position data.
+
+    The FrameSet byte offsets are determined first, afterwards the
+    FrameSets are parsed independently in a process pool and
+    reassembled in file order. The workers return the time stamps
+    undecoded, they are decoded vectorized in the parent. The result is
+    identical to MatchPositionParser.
+
+    Starting the pool and transferring the arrays costs a fixed amount
+    of time, the serial FastMatchPositionParser takes about a second for
+    50 MB. Hence the pool is only used if the selected FrameSets exceed
+    min_bytes, smaller selections are parsed in this process.
+    Attributes:
+        processes: number of worker processes, None uses all cores.
+        min_bytes: minimum size of the selected FrameSets for the
+                   process pool.
+    """
+    def __init__(self, match, teams, time_format = 'datetime', processes = None,
+            min_bytes = __PARALLEL_MIN_BYTES__, **selection):
+        """Initialization, see MatchPositionParser for the selection arguments."""
+        FastMatchPositionParser.__init__(self, match, teams,
+                time_format=time_format, **selection)
+        self.processes = processes
+        self.min_bytes = min_bytes
+
+    def add_frameset(self, attrs, data, timestamps):
+        """Stores a FrameSet, raw ball time stamps are decoded first."""
+        if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind == 'S':
+            timestamps = decode_times(timestamps, self.time_format)
+        FastMatchPositionParser.add_frameset(self, attrs, data, timestamps)
+
+    def run(self, fname, trace = True):
+        """Starts parsing fname.
+
+        Args:
+            fname: filepath of the file.
+            trace: flag whether to report every FrameSet, see
+                   footballpy.instrumentation.
+        Returns:
+            Nothing
+        """
+        self.trace = trace
+        with self.timed_run(fname) as metrics:
+            offsets = [(start, end) for start, end, attrs in scan_frameset_headers(fname)
+                    if self.is_selected(attrs['PersonId'], attrs['TeamId'],
+                        attrs['GameSection'])]
+            no_framesets = len(offsets)
+            selected_bytes = sum(end - start for start, end in offsets)
+            processes = self.processes
+            if no_framesets < 2 or selected_bytes < self.min_bytes:
+                processes = 1
+            if processes == 1:
+                results = (read_frameset_range(fname, start, end, 'raw',
+                    self.frame_range) for start, end in offsets)
+                for frameset in results:
+                    self.add_frameset(*frameset)
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=processes) as executor:
+                    results = executor.map(read_frameset_range,
+                            [fname] * no_framesets,
+                            [start for start, end in offsets],
+                            [end for start, end in offsets],
+                            ['raw'] * no_framesets,
+                            [self.frame_range] * no_framesets)
+                    for frameset in results:
+                        self.add_frameset(*frameset)
+            metrics.update(self.run_metrics())
+            metrics['processes'] = processes
+
+
 def correct_substitions():
     """Correct position data overlap during substitions.
 
@@ -377,7 +1181,11 @@ def correct_substitions():
     """
     pass
 
-def get_df_from_files(match_info_file, match_pos_file, trace = True):
+@cache.cached(version = 3, files = ('match_info_file', 'match_pos_file'),
+        ignore = ('trace', 'engine', 'processes'))
+def get_df_from_files(match_info_file, match_pos_file, trace = True,
+        engine = 'expat', time_format = 'datetime', processes = None,
+        **selection):
     """Wrapper function to get a pandas dataframe from DFl position data. 
 
     This function is meant as an outside API to load position data from
@@ -387,6 +1195,18 @@ def get_df_from_files(match_info_file, match_pos_file, trace = True):
         match_info_file: full path to the MatchInformation file.
         match_pos_file: full path to the PositionData file.
         trace: Enable loading trace on dfl-parser.
+        engine: position data parser, either 'expat' for the
+                FastMatchPositionParser, 'parallel' for the
+                ParallelMatchPositionParser, 'indexed' for the
+                IndexedMatchPositionParser (keeps a FrameSet index in the
+                cache directory, see dfl_index) or 'sax' for the
+                reference MatchPositionParser.
+        time_format: 'datetime' fills the time column from timezone aware
+                datetime objects { default }, 'datetime64' puts the decoded
+                time stamps directly into the time column as UTC.
+        processes: number of worker processes for the 'parallel' engine.
+        selection: person_ids, team_roles, sections and frame_range to
+                restrict the loaded FrameSets, see MatchPositionParser.
     Returns:
         A tuple with a Pandas dataframe with the position data,
         the teams information dictionary, and
@@ -394,17 +1214,35 @@ def get_df_from_files(match_info_file, match_pos_file, trace = True):
     """
     import footballpy.fs.loader.papi as papi
 
-    mip = MatchInformationParser()
-    mip.run(match_info_file)
-    teams, match = mip.getTeamInformation()
+    match, teams, stadium = load_match_information(match_info_file)
 
-    mpp = MatchPositionParser(match, teams)
+    if engine == 'expat':
+        mpp = FastMatchPositionParser(match, teams, time_format=time_format,
+                **selection)
+    elif engine == 'parallel':
+        mpp = ParallelMatchPositionParser(match, teams,
+                time_format=time_format, processes=processes, **selection)
+    elif engine == 'indexed':
+        from footballpy.fs.loader.dfl_index import IndexedMatchPositionParser
+        mpp = IndexedMatchPositionParser(match, teams,
+                time_format=time_format, **selection)
+    elif engine == 'sax':
+        mpp = MatchPositionParser(match, teams, time_format=time_format,
+                **selection)
+    else:
+        raise ValueError('Unknown position parser engine: %s' % engine)
     mpp.run(match_pos_file, trace = trace)
     pos_data, ball_data, timestamps = mpp.getPositionInformation()
     pos_df = papi.pos_data_to_df(pos_data, ball_data)
-    timestamps_concatenated = timestamps[0] + timestamps[1]
-    assert(len(timestamps_concatenated) == pos_df.shape[0])
-    pos_df['time'] = timestamps_concatenated
+    if time_format == 'datetime64':
+        import pandas as pd
+        timestamps_concatenated = pd.DatetimeIndex(
+                np.concatenate(timestamps)).tz_localize('UTC')
+    else:
+        timestamps_concatenated = timestamps[0] + timestamps[1]
+    if mpp.team_roles is None or 'ball' in mpp.team_roles:
+        assert(len(timestamps_concatenated) == pos_df.shape[0])
+        pos_df['time'] = timestamps_concatenated
     return pos_df, teams, match
 
 def get_match_info(match_info_file):
@@ -415,27 +1253,27 @@ def get_match_info(match_info_file):
         Returns:
             a match information dictionary.
     """
-    from lxml import etree
-
-    root = etree.parse(match_info_file).getroot()
+    info = read_match_information(match_info_file)
+    general = info['general']
     match = dict()
-    general_element = root.xpath('//MatchInformation/General')[0]
-    match['game_name'] = general_element.get('GameTitle')
-    match['match_id'] = general_element.get('MatchId')
-    match['match_day'] = general_element.get('MatchDay')
-    match['team_name_home'] = general_element.get('HomeTeamName')
-    match['team_name_away'] = general_element.get('AwayTeamName')
-    match['home'] = general_element.get('HomeTeamId')
-    match['away'] = general_element.get('AwayTeamId')
+    match['game_name'] = general.get('GameTitle')
+    match['match_id'] = general.get('MatchId')
+    match['match_day'] = general.get('MatchDay')
+    match['team_name_home'] = general.get('HomeTeamName')
+    match['team_name_away'] = general.get('AwayTeamName')
+    match['home'] = general.get('HomeTeamId')
+    match['away'] = general.get('AwayTeamId')
     match['tracking_source'] = 'DFL'
-    match['start_date'] = dup.parse(general_element.get('KickoffTime'))
-    match['season'] = general_element.get('Season')
-    match['league'] = general_element.get('Competition')
-    match['team_color_home'] = root.xpath('//Teams/Team[@Role="home"]/@PlayerMainColorOfShirt')[0]
-    match['team_color_away'] = root.xpath('//Teams/Team[@Role="guest"]/@PlayerMainColorOfShirt')[0]
+    match['start_date'] = copy.deepcopy(info['match']['start_date'])
+    match['season'] = general.get('Season')
+    match['league'] = general.get('Competition')
+    match['team_color_home'] = info['match']['team_color_home']
+    match['team_color_away'] = info['match']['team_color_guest']
+    # the pitch dimensions are part of the Environment in newer files
+    environment = info['environment']
     stadium = dict()
-    stadium['width'] = general_element.get('PitchY')
-    stadium['length'] = general_element.get('PitchX')
+    stadium['width'] = general.get('PitchY', environment.get('PitchY'))
+    stadium['length'] = general.get('PitchX', environment.get('PitchX'))
     match['stadium'] = stadium
     return match
 
@@ -446,12 +1284,9 @@ def get_team_info(match_info_file):
         Returns:
             a dictionary with the team lists
     """
-    from lxml import etree
-
-    def process_player(element):
+    def process_player(player_items):
         """
         """
-        player_items = dict(element.items())
         player = dict()
         player['id'] = player_items['PersonId']
         player['name'] = player_items['FirstName'] + ' ' + player_items['LastName']
@@ -459,10 +1294,10 @@ def get_team_info(match_info_file):
         player['position'] = player_items['PlayingPosition'] if 'PlayingPosition' in player_items else ''
         return player
 
-    root = etree.parse(match_info_file).getroot()
+    player_attrs = read_match_information(match_info_file)['player_attrs']
     team = dict()
-    team['home'] = [process_player(player) for player in root.xpath('//Teams/Team[@Role="home"]/Players/Player')]
-    team['away'] = [process_player(player) for player in root.xpath('//Teams/Team[@Role="guest"]/Players/Player')]
+    team['home'] = [process_player(player) for player in player_attrs['home']]
+    team['away'] = [process_player(player) for player in player_attrs['guest']]
     return team
 
 
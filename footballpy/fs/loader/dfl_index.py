@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+dfl_index: Byte offset index for DFL position data files.
+
+The index records for every FrameSet of a position file the PersonId,
+TeamId, GameSection, the byte range and the first and last frame number.
+It is built once and stored as an entry of the loader cache (see
+footballpy.fs.loader.cache) keyed by the content hash of the position
+file, hence it is evicted and cleared like the other entries. Afterwards single players or halves can be loaded by seeking
+directly to the according FrameSets instead of reading the whole file.
+Without an enabled cache the index is scanned in memory on every run;
+nothing is written next to the input data unless an index file is
+passed explicitly.
+
+Usage:
+    python -m footballpy.fs.loader.dfl_index position_file [...]
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+from __future__ import print_function
+import json
+import mmap
+import os
+from footballpy import instrumentation
+import footballpy.fs.loader.cache as cache
+import footballpy.fs.loader.dfl as dfl
+
+__INDEX_VERSION__ = 1
+__INDEX_SUFFIX__ = '.idx.json'
+
+
+def index_path(fname):
+    """Returns the sidecar file name next to a position file."""
+    return fname + __INDEX_SUFFIX__
+
+
+def index_cache_key(match_cache, fname):
+    """Returns the cache key of the index of a position file.
+
+        Args:
+            match_cache: MatchCache instance.
+            fname: filepath of the position data file.
+        Returns:
+            The cache key, see MatchCache.key.
+    """
+    return match_cache.key(__name__ + '.index', __INDEX_VERSION__, [fname], [])
+
+
+def _frame_number(buf, pos):
+    """Reads the value of the N attribute starting at pos."""
+    start = pos + len(b' N="')
+    return int(float(buf[start:buf.find(b'"', start)]))
+
+
+def scan_position_file(fname):
+    """Scans a position file for its FrameSets.
+
+        Only the FrameSet tags and the first and last Frame of each
+        FrameSet are looked at.
+
+        Args:
+            fname: filepath of the position data file.
+        Returns:
+            A list with a dictionary per FrameSet.
+    """
+    entries = []
+    with open(fname, 'rb') as fid:
+        if os.fstat(fid.fileno()).st_size == 0:
+            return entries
+        buf = mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for start, end in dfl.find_framesets(buf):
+                header_end = buf.find(b'>', start) + 1
+                attrs = dfl.parse_frameset_header(buf[start:header_end])
+                first = buf.find(b' N="', header_end, end)
+                last = buf.rfind(b' N="', header_end, end)
+                entries.append({
+                    'PersonId': attrs['PersonId'],
+                    'TeamId': attrs['TeamId'],
+                    'GameSection': attrs['GameSection'],
+                    'start': start,
+                    'end': end,
+                    'first_frame': _frame_number(buf, first) if first != -1 else None,
+                    'last_frame': _frame_number(buf, last) if last != -1 else None
+                    })
+        finally:
+            buf.close()
+    return entries
+
+
+def build_position_index(fname, index_file = None):
+    """Builds the index for a position file and stores it.
+
+        Without index file the index is put into the loader cache. It is
+        only kept in memory if the cache is disabled or the index file
+        cannot be written, e.g. in a read only directory.
+
+        Args:
+            fname: filepath of the position data file.
+            index_file: filepath of the index { default: None = loader
+                        cache, see index_cache_key }
+        Returns:
+            The list of FrameSet entries.
+    """
+    stat = os.stat(fname)
+    with instrumentation.timed('dfl_index.build', bytes=stat.st_size) as metrics:
+        entries = scan_position_file(fname)
+        metrics['framesets'] = len(entries)
+    index = {
+            'version': __INDEX_VERSION__,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'framesets': entries
+            }
+    if index_file is None:
+        match_cache = cache.get_cache()
+        if match_cache is not None:
+            match_cache.put(index_cache_key(match_cache, fname), entries)
+        return entries
+    tmp_file = index_file + '.tmp'
+    try:
+        with open(tmp_file, 'w') as fid:
+            json.dump(index, fid)
+        os.replace(tmp_file, index_file)
+    except (IOError, OSError):
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return entries
+
+
+def load_position_index(fname, index_file = None, build = True):
+    """Loads the index of a position file.
+
+        An index which does not match the size and modification time of
+        the position file is considered stale.
+
+        Args:
+            fname: filepath of the position data file.
+            index_file: filepath of the index { default: None = loader
+                        cache, see index_cache_key }
+            build: (re)build missing or stale indices.
+        Returns:
+            The list of FrameSet entries or None if no valid index exists
+            and build is False.
+    """
+    if index_file is None:
+        match_cache = cache.get_cache()
+        if match_cache is not None:
+            found, entries = match_cache.get(index_cache_key(match_cache, fname))
+            if found:
+                return entries
+        return build_position_index(fname) if build else None
+    try:
+        with open(index_file, 'r') as fid:
+            index = json.load(fid)
+        stat = os.stat(fname)
+        if (index['version'] == __INDEX_VERSION__ and
+                index['size'] == stat.st_size and
+                index['mtime_ns'] == stat.st_mtime_ns):
+            return index['framesets']
+    except (IOError, OSError, ValueError, KeyError):
+        pass
+    if build:
+        return build_position_index(fname, index_file)
+    return None
+
+
+class IndexedMatchPositionParser(dfl.FastMatchPositionParser):
+    """
+    A parser which uses the FrameSet index to read only selected FrameSets.
+
+    FrameSets are selected with the selection arguments of the
+    MatchPositionParser. Using the first and last frame numbers of the
+    index also player FrameSets outside of the frame_range are skipped
+    without reading them. Missing or stale indices are rebuilt.
+    """
+    def __init__(self, match, teams, time_format = 'datetime',
+            index_file = None, **selection):
+        """Initialization, see MatchPositionParser for the selection arguments."""
+        dfl.FastMatchPositionParser.__init__(self, match, teams,
+                time_format=time_format, **selection)
+        self.index_file = index_file
+
+    def is_indexed_selected(self, entry):
+        """Checks an index entry against the selection."""
+        if not self.is_selected(entry['PersonId'], entry['TeamId'],
+                entry['GameSection']):
+            return False
+        if (self.frame_range is not None and entry['first_frame'] is not None and
+                entry['TeamId'].upper() != "BALL"):
+            if (entry['last_frame'] < self.frame_range[0] or
+                    entry['first_frame'] > self.frame_range[1]):
+                return False
+        return True
+
+    def run(self, fname, trace = True):
+        """Starts parsing fname.
+
+        Args:
+            fname: filepath of the file.
+            trace: flag whether to report every FrameSet, see
+                   footballpy.instrumentation.
+        Returns:
+            Nothing
+        """
+        self.trace = trace
+        with self.timed_run(fname) as metrics:
+            entries = load_position_index(fname, self.index_file)
+            bytes_read = 0
+            with open(fname, 'rb') as fid:
+                for entry in entries:
+                    if not self.is_indexed_selected(entry):
+                        continue
+                    fid.seek(entry['start'])
+                    block = fid.read(entry['end'] - entry['start'])
+                    bytes_read += len(block)
+                    self.add_frameset(*dfl.read_frameset(block, self.time_format,
+                        self.frame_range))
+            metrics.update(self.run_metrics())
+            metrics['bytes_read'] = bytes_read
+
+
+#######################################
+if __name__ == "__main__":
+    import sys
+
+    for fname in sys.argv[1:]:
+        entries = build_position_index(fname, index_path(fname))
+        print('%s: indexed %d FrameSets' % (fname, len(entries)))
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+growable_array: Typed row buffer with amortized geometric growth.
+
+The loaders accumulate frames of unknown count, e.g. the frames of a
+player or the ball. A GrowableArray stores the rows consecutively in a
+numpy array whose capacity is multiplied by the growth factor when it
+is exhausted. Appending n rows therefore costs O(n) copies in total.
+
+Example:
+    buf = GrowableArray(no_cols = 3, dtype = 'float32')
+    buf.push((frame, x, y))
+    buf.push_many(block)
+    data = buf.view()
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import numpy as np
+
+
+class GrowableArray:
+    """Growable buffer of rows with a fixed dtype.
+
+    Attributes:
+        no_cols: number of columns, None for a one dimensional buffer.
+        dtype: numpy dtype of the rows.
+        growth: factor by which the capacity is increased.
+        array: underlying numpy array, only the first size rows are valid.
+        size: number of stored rows.
+    """
+
+    def __init__(self, no_cols = None, dtype = 'float64', capacity = 1024,
+            growth = 2.0):
+        """Constructor method.
+
+        Args:
+            no_cols: number of columns { default: None = one dimensional }
+            dtype: numpy dtype of the rows { default: float64 }
+            capacity: initial number of rows { default: 1024 }
+            growth: factor the capacity is multiplied with when the buffer
+                    is full, must be larger than one { default: 2.0 }
+        Returns:
+            Nothing
+        """
+        if growth <= 1.0:
+            raise ValueError('growth factor has to be larger than one: %s' % growth)
+        self.no_cols = no_cols
+        self.dtype = np.dtype(dtype)
+        self.growth = growth
+        self.array = np.empty(self.row_shape(max(int(capacity), 1)), dtype=self.dtype)
+        self.size = 0
+
+    def row_shape(self, no_rows):
+        """Returns the array shape for no_rows rows."""
+        if self.no_cols is None:
+            return (no_rows,)
+        return (no_rows, self.no_cols)
+
+    @property
+    def capacity(self):
+        """Number of rows which can be stored without reallocation."""
+        return self.array.shape[0]
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, no_rows):
+        """Ensures the capacity for no_rows rows.
+
+        The capacity grows at least by the growth factor. The data is
+        copied into a new array, hence views obtained before stay valid
+        but do not see later pushes.
+
+        Args:
+            no_rows: total number of rows to hold.
+        Returns:
+            Nothing
+        """
+        if no_rows <= self.capacity:
+            return
+        capacity = max(no_rows, int(np.ceil(self.capacity * self.growth)))
+        array = np.empty(self.row_shape(capacity), dtype=self.dtype)
+        array[:self.size] = self.array[:self.size]
+        self.array = array
+
+    def push(self, row):
+        """Appends a single row.
+
+        Args:
+            row: scalar or sequence with no_cols values.
+        Returns:
+            Nothing
+        """
+        if self.size == self.capacity:
+            self.reserve(self.size + 1)
+        self.array[self.size] = row
+        self.size += 1
+
+    def push_many(self, rows):
+        """Appends a block of rows.
+
+        Args:
+            rows: array like with shape (n,) or (n, no_cols).
+        Returns:
+            Nothing
+        """
+        rows = np.asarray(rows)
+        no_rows = rows.shape[0] if rows.ndim > 0 else 1
+        self.reserve(self.size + no_rows)
+        self.array[self.size:self.size + no_rows] = rows
+        self.size += no_rows
+
+    def view(self):
+        """Returns the stored rows without copying.
+
+        The view shares memory with the buffer. It is only valid until
+        the next push which reallocates or the next clear.
+        """
+        return self.array[:self.size]
+
+    def data(self):
+        """Returns a copy of the stored rows."""
+        return self.array[:self.size].copy()
+
+    def trim(self):
+        """Releases the unused capacity and returns a view of the rows."""
+        if self.size < self.capacity:
+            self.array = self.array[:max(self.size, 1)].copy()
+        return self.view()
+
+    def clear(self):
+        """Removes all rows, the capacity is kept."""
+        self.size = 0
@@ -12,12 +12,15 @@ impire_parser : Module which provides parsing function for Soccer
 @version 0.1
 """
 
+import io
 import os
 from xml.sax import make_parser, ContentHandler
 from xml.sax.handler import feature_external_ges
 import numpy as np
 import dateutil.parser as dup
 from lxml import etree
+from footballpy import instrumentation
+from footballpy.fs.loader import cache
 # import pdb
 
 class MatchInformationParser(ContentHandler):
@@ -143,13 +146,13 @@ class MatchInformationParser(ContentHandler):
 
     def run(self, fname):
         """Runs the parse on fname."""
-        print('Start reading in match information')
-        parser = make_parser()
-        parser.setContentHandler(self)
-        # prevent external DTD load
-        parser.setFeature(feature_external_ges, False)
-        parser.parse(fname)
-        print('finished parsing match information')
+        with instrumentation.timed('impire.match_information',
+                bytes=instrumentation.file_size(fname)):
+            parser = make_parser()
+            parser.setContentHandler(self)
+            # prevent external DTD load
+            parser.setFeature(feature_external_ges, False)
+            parser.parse(fname)
 
 class MatchEventParser(ContentHandler):
     """XML parser for the event(action) impire data.
@@ -190,10 +193,13 @@ class MatchEventParser(ContentHandler):
             Returns:
                 None
         """
-        parser = make_parser()
-        parser.setContentHandler(self)
-        parser.setFeature(feature_external_ges, False)
-        parser.parse(match_event_file)
+        with instrumentation.timed('impire.match_events',
+                bytes=instrumentation.file_size(match_event_file)) as metrics:
+            parser = make_parser()
+            parser.setContentHandler(self)
+            parser.setFeature(feature_external_ges, False)
+            parser.parse(match_event_file)
+            metrics['shots'] = len(self.result['shots'])
 
     def getEvents(self):
         """Returns the parsed data."""
@@ -201,33 +207,47 @@ class MatchEventParser(ContentHandler):
 
 
 
-def read_in_position_data(fname):
-    """Reads in a pos file and extract the ball/player data
+# MAGIC NUMBERS
+__MISSING__ = -10000.0
+__NO_PLAYER__ = 11
+__NO_DIM__ = 3          # FRAME, X, Y
+__NO_DIM_BALL__ = 6     # FRAME, X, Y, Z, POSSESSION, STATUS
+# tokens of a regular line: frame specs (3), home and guest players
+# (2 x 11 x 4), referees (3 x 3), and ball (6)
+__LINE_TOKENS__ = 106
+__SEPARATORS__ = bytes.maketrans(b';', b',')
+
+
+def allocate_position_arrays(no_frames):
+    """Allocates the result arrays of read_in_position_data.
+
     Args:
-		fname: name of the position data file.
+        no_frames: number of frames.
     Returns:
-		tuple with four entries:
-		[0] = data for home team
-		[1] = data for guest team
-		[2] = data for ball
-		[3] = half time index
+        tuple with home team, guest team, ball and half time arrays
+        initialized with the missing value marker.
     """
+    home_team = np.ones((no_frames, __NO_PLAYER__, __NO_DIM__)) * __MISSING__
+    guest_team = home_team.copy()
+    ball = np.ones((no_frames, __NO_DIM_BALL__)) * __MISSING__
+    half_time_id = np.ones(no_frames) * __MISSING__
+    return home_team, guest_team, ball, half_time_id
 
-    print('Start reading in position data...')
-
-    # MAGIC NUMBERS
-    _MISSING_ = -10000.0
-    NO_PLAYER = 11
-    NO_DIM = 3      # FRAME, X, Y
-    # NO_DIM_BALL = 6     # FRAME, X, Y, Z, POSSESSION, STATUS
 
-    no_frames = sum([1 for f in open(fname)])
+def parse_position_line(line, i, home_team, guest_team, ball, half_time_id):
+    """Parses a single line of a pos file into row i of the result arrays.
 
-    home_team = np.ones((no_frames,NO_PLAYER, NO_DIM)) * _MISSING_
-    guest_team = home_team.copy()
-    ball = np.ones((no_frames, 6)) * _MISSING_
-    half_time_id = np.ones(no_frames) * _MISSING_
+    This is the reference implementation which handles lines with
+    missing players as well.
 
+    Args:
+        line: string with one frame of the pos file.
+        i: row index in the result arrays.
+        home_team, guest_team, ball, half_time_id: result arrays
+            as returned by allocate_position_arrays.
+    Returns:
+        Nothing
+    """
     def process_player(player):
         """Extracts information from player-pos string.
 
@@ -243,32 +263,467 @@ def read_in_position_data(fname):
         y = float(data[2])      # y-position
         return (pid,x,y)
 
-    for i,frame in enumerate(open(fname)):
-        #0: Frame, 1: Home, 2: Guest, 3: Referee, 4: Ball
-        hash_split = frame.split('#')
-        frame_specs = hash_split[0][:-1].split(',')
-        # get frame index
-        frame = int(frame_specs[0])
-        # half time index
-        half_time_id[i] = int(frame_specs[2])
-        # process home team
-        for j, player in enumerate(hash_split[1][:-1].split(';')):
-            home_team[i,j,:] = process_player(player)
-        # process guest team
-        for j,player in enumerate(hash_split[2][:-1].split(';')):
-            guest_team[i,j,:] = process_player(player)
-        # ball: frame, x, y, z, possession, status
-        ball_data = hash_split[4][:-1].split(',')
-        x = float(ball_data[0])
-        y = float(ball_data[1])
-        z = float(ball_data[2])
-        poss = float(ball_data[5])
-        status = float(ball_data[4])
-        ball[i,:] = [frame,x,y,z,poss,status]
-
-    print('finished.')
+    #0: Frame, 1: Home, 2: Guest, 3: Referee, 4: Ball
+    hash_split = line.split('#')
+    frame_specs = hash_split[0][:-1].split(',')
+    # get frame index
+    frame = int(frame_specs[0])
+    # half time index
+    half_time_id[i] = int(frame_specs[2])
+    # process home team
+    for j, player in enumerate(hash_split[1][:-1].split(';')):
+        home_team[i,j,:] = process_player(player)
+    # process guest team
+    for j,player in enumerate(hash_split[2][:-1].split(';')):
+        guest_team[i,j,:] = process_player(player)
+    # ball: frame, x, y, z, possession, status
+    ball_data = hash_split[4][:-1].split(',')
+    x = float(ball_data[0])
+    y = float(ball_data[1])
+    z = float(ball_data[2])
+    poss = float(ball_data[5])
+    status = float(ball_data[4])
+    ball[i,:] = [frame,x,y,z,poss,status]
+
+
+def parse_position_lines(lines):
+    """Parses lines with parse_position_line.
+
+    Args:
+        lines: list with the lines as bytes.
+    Returns:
+        tuple with home team, guest team, ball and half time arrays.
+    """
+    res = allocate_position_arrays(len(lines))
+    for i, line in enumerate(lines):
+        parse_position_line(line.decode('ascii'), i, *res)
+    return res
+
+
+def parse_position_block(block):
+    """Parses a block of complete lines in bulk.
+
+    The separators are unified and the whole block is converted by a
+    single numpy.loadtxt call. Blocks which contain lines deviating from
+    the regular number of tokens are parsed line by line with
+    parse_position_line instead.
+
+    Args:
+        block: bytes with complete lines, each terminated by a newline.
+    Returns:
+        tuple with home team, guest team, ball and half time arrays.
+    """
+    text = block.translate(__SEPARATORS__, b'#\r').replace(b',\n', b'\n')
+    try:
+        values = np.loadtxt(io.BytesIO(text), delimiter=',', comments=None,
+                ndmin=2)
+    except ValueError:
+        values = None
+    if values is None or values.shape[1] != __LINE_TOKENS__:
+        return parse_position_lines(block.splitlines())
+    no_frames = values.shape[0]
+    home_team = values[:,3:47].reshape((no_frames, __NO_PLAYER__, 4))[:,:,:__NO_DIM__]
+    guest_team = values[:,47:91].reshape((no_frames, __NO_PLAYER__, 4))[:,:,:__NO_DIM__]
+    # ball: frame, x, y, z, possession, status
+    ball = values[:,(0, 100, 101, 102, 105, 104)]
+    return home_team.copy(), guest_team.copy(), ball, values[:,2].copy()
+
+
+def iter_line_blocks(fid, block_size, size = None):
+    """Generator which reads blocks of complete lines.
+
+    Args:
+        fid: file object opened in binary mode.
+        block_size: approximate number of bytes per block.
+        size: number of bytes to read from the current position,
+              None reads until the end of the file.
+    Returns:
+        Yields bytes with complete lines, the last line of the input
+        is terminated with a newline if necessary.
+    """
+    rest = b''
+    remaining = size
+    while True:
+        chunk = fid.read(block_size if remaining is None
+                else min(block_size, remaining))
+        if not chunk:
+            break
+        if remaining is not None:
+            remaining -= len(chunk)
+        chunk = rest + chunk
+        end = chunk.rfind(b'\n') + 1
+        rest = chunk[end:]
+        if end > 0:
+            yield chunk[:end]
+    if rest.strip():
+        yield rest + b'\n'
+
+
+def find_line_chunks(fname, chunk_size):
+    """Splits a pos file into byte ranges of complete lines.
+
+    The first line is not part of the chunks.
+
+    Args:
+        fname: name of the position data file.
+        chunk_size: approximate number of bytes per chunk.
+    Returns:
+        tuple with the first line and a list of (start, end) byte offsets.
+    """
+    size = os.path.getsize(fname)
+    chunks = []
+    with open(fname, 'rb') as fid:
+        first_line = fid.readline()
+        start = fid.tell()
+        while start < size:
+            fid.seek(min(start + chunk_size, size))
+            # advance to the next line start
+            fid.readline()
+            end = fid.tell()
+            chunks.append((start, end))
+            start = end
+    return first_line, chunks
+
+
+def count_position_lines(fname, start, end):
+    """Counts the frames between the byte offsets start and end."""
+    with open(fname, 'rb') as fid:
+        fid.seek(start)
+        data = fid.read(end - start)
+    no_lines = data.count(b'\n')
+    if data and not data.endswith(b'\n'):
+        no_lines += 1
+    return no_lines
+
+
+# shared output arrays of the worker processes
+__shared_position_arrays__ = None
+
+def init_shared_position_arrays(buffers, no_frames):
+    """Worker initializer, wraps the shared buffers into numpy arrays."""
+    global __shared_position_arrays__
+    __shared_position_arrays__ = shared_position_arrays(buffers, no_frames)
+
+
+def shared_position_arrays(buffers, no_frames):
+    """Wraps shared buffers into the result arrays of read_in_position_data.
+
+    Args:
+        buffers: four multiprocessing.RawArray('d') buffers.
+        no_frames: number of frames.
+    Returns:
+        tuple with home team, guest team, ball and half time arrays.
+    """
+    shapes = [(no_frames, __NO_PLAYER__, __NO_DIM__),
+            (no_frames, __NO_PLAYER__, __NO_DIM__),
+            (no_frames, __NO_DIM_BALL__), (no_frames,)]
+    return tuple(np.frombuffer(buf, dtype=np.float64).reshape(shape)
+            for buf, shape in zip(buffers, shapes))
+
+
+def parse_position_range(fname, start, end, offset, block_size):
+    """Parses the lines between the byte offsets start and end.
+
+    The result is written directly into the shared arrays beginning
+    with row offset.
+
+    Args:
+        fname: name of the position data file.
+        start, end: byte offsets of the line chunk.
+        offset: row of the first frame of the chunk.
+        block_size: number of bytes converted at once.
+    Returns:
+        The row after the last frame of the chunk.
+    """
+    with open(fname, 'rb') as fid:
+        fid.seek(start)
+        for block in iter_line_blocks(fid, block_size, end - start):
+            res = parse_position_block(block)
+            no_frames = res[2].shape[0]
+            for shared, arr in zip(__shared_position_arrays__, res):
+                shared[offset:offset + no_frames] = arr
+            offset += no_frames
+    return offset
+
+
+def read_in_position_data(fname, engine = 'bulk', block_size = 2**22,
+        processes = None, chunk_size = 2**23):
+    """Reads in a pos file and extract the ball/player data
+    Args:
+		fname: name of the position data file.
+		engine: 'bulk' converts blocks of lines in a single pass over
+		        the file, 'parallel' converts line chunks in worker
+		        processes, 'python' parses the file line by line.
+		block_size: number of bytes per block for the 'bulk' and
+		            'parallel' engines.
+		processes: number of worker processes for the 'parallel' engine,
+		           None uses all cores.
+		chunk_size: number of bytes per worker task for the 'parallel'
+		            engine.
+    Returns:
+		tuple with four entries:
+		[0] = data for home team
+		[1] = data for guest team
+		[2] = data for ball
+		[3] = half time index
+    """
+    if engine not in ('bulk', 'parallel', 'python'):
+        raise ValueError('Unknown position parser engine: %s' % engine)
+
+    with instrumentation.timed('impire.position_data', engine=engine,
+            bytes=instrumentation.file_size(fname)) as metrics:
+        if engine == 'python':
+            no_frames = sum([1 for f in open(fname)])
+            home_team, guest_team, ball, half_time_id = \
+                    allocate_position_arrays(no_frames)
+            for i,frame in enumerate(open(fname)):
+                parse_position_line(frame, i, home_team, guest_team, ball,
+                        half_time_id)
+        elif engine == 'parallel':
+            home_team, guest_team, ball, half_time_id = \
+                    read_in_position_data_parallel(fname, block_size,
+                            processes, chunk_size)
+            no_frames = ball.shape[0]
+        else:
+            blocks = []
+            with open(fname, 'rb') as fid:
+                # the first line carries the stadium specifications
+                first_line = fid.readline()
+                if first_line:
+                    blocks.append(parse_position_lines([first_line]))
+                for block in iter_line_blocks(fid, block_size):
+                    blocks.append(parse_position_block(block))
+            if blocks:
+                home_team, guest_team, ball, half_time_id = \
+                        [np.concatenate(arrays) for arrays in zip(*blocks)]
+            else:
+                home_team, guest_team, ball, half_time_id = \
+                        allocate_position_arrays(0)
+            no_frames = ball.shape[0]
+
+        metrics['frames'] = no_frames
+        metrics['peak_bytes'] = instrumentation.nbytes(
+                [home_team, guest_team, ball, half_time_id])
     return home_team, guest_team, ball, half_time_id
 
+
+def read_in_position_data_parallel(fname, block_size, processes, chunk_size):
+    """Reads in a pos file with a pool of worker processes.
+
+    Every line of a pos file is a self-contained frame. The file is split
+    into byte ranges of complete lines. The lines per range are counted
+    first, which determines the rows of each range in the output.
+    Afterwards the ranges are parsed in the worker processes and written
+    directly into shared output arrays. The result is identical to the
+    serial engines.
+
+    Args:
+        see read_in_position_data.
+    Returns:
+        see read_in_position_data.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import RawArray
+
+    first_line, chunks = find_line_chunks(fname, chunk_size)
+    starts = [start for start, end in chunks]
+    ends = [end for start, end in chunks]
+    if chunks:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            counts = list(executor.map(count_position_lines,
+                [fname] * len(chunks), starts, ends))
+    else:
+        counts = []
+    offsets = np.cumsum([1 if first_line else 0] + counts)
+    no_frames = int(offsets[-1])
+    if no_frames == 0:
+        return allocate_position_arrays(0)
+
+    sizes = [no_frames * __NO_PLAYER__ * __NO_DIM__] * 2 + \
+            [no_frames * __NO_DIM_BALL__, no_frames]
+    buffers = [RawArray('d', size) for size in sizes]
+    res = shared_position_arrays(buffers, no_frames)
+    for arr, first in zip(res, parse_position_lines([first_line])):
+        arr[0] = first[0]
+    if chunks:
+        with ProcessPoolExecutor(max_workers=processes,
+                initializer=init_shared_position_arrays,
+                initargs=(buffers, no_frames)) as executor:
+            stops = list(executor.map(parse_position_range,
+                [fname] * len(chunks), starts, ends, offsets[:-1].tolist(),
+                [block_size] * len(chunks)))
+        if stops != offsets[1:].tolist():
+            raise ValueError('Irregular lines in position data file %s' % fname)
+    return res
+
+
+class CompactPositionData:
+    """Memory compact layout of the impire position data.
+
+    Coordinates are stored with coord_dtype, shirt numbers, half time
+    ids, and ball states with id_dtype, and frame counters as int32.
+    Missing players keep the missing value marker.
+
+    Attributes:
+        frame: (frames,) frame counter.
+        half: (frames,) half time id.
+        home_shirt, guest_shirt: (frames, 11) shirt numbers.
+        home_xy, guest_xy: (frames, 11, 2) x and y positions.
+        ball_xyz: (frames, 3) x, y and z position of the ball.
+        ball_state: (frames, 2) ball possession and status.
+    """
+    fields = ('frame', 'half', 'home_shirt', 'home_xy', 'guest_shirt',
+            'guest_xy', 'ball_xyz', 'ball_state')
+
+    def __init__(self, frame, half, home_shirt, home_xy, guest_shirt,
+            guest_xy, ball_xyz, ball_state):
+        self.frame = frame
+        self.half = half
+        self.home_shirt = home_shirt
+        self.home_xy = home_xy
+        self.guest_shirt = guest_shirt
+        self.guest_xy = guest_xy
+        self.ball_xyz = ball_xyz
+        self.ball_state = ball_state
+
+    @classmethod
+    def from_arrays(cls, home_team, guest_team, ball, half_time_id,
+            coord_dtype = np.float32, id_dtype = np.int16):
+        """Converts the result of read_in_position_data.
+
+        Args:
+            home_team, guest_team, ball, half_time_id: position arrays
+                as returned by read_in_position_data.
+            coord_dtype: dtype of the coordinates.
+            id_dtype: dtype of the shirt numbers, half time ids and states.
+        Returns:
+            A CompactPositionData instance.
+        """
+        return cls(ball[:,0].astype(np.int32), half_time_id.astype(id_dtype),
+                home_team[:,:,0].astype(id_dtype),
+                home_team[:,:,1:].astype(coord_dtype),
+                guest_team[:,:,0].astype(id_dtype),
+                guest_team[:,:,1:].astype(coord_dtype),
+                ball[:,1:4].astype(coord_dtype), ball[:,4:].astype(id_dtype))
+
+    @classmethod
+    def concatenate(cls, parts):
+        """Concatenates a list of CompactPositionData instances."""
+        return cls(*[np.concatenate([getattr(part, field) for part in parts])
+            for field in cls.fields])
+
+    def select(self, index):
+        """Returns the frames selected by index, slices result in views."""
+        return CompactPositionData(*[getattr(self, field)[index]
+            for field in self.fields])
+
+    def halves(self):
+        """Splits the data into the first and second half.
+
+        Position data files are ordered by time, hence each half is a
+        contiguous block of frames and the halves are returned as views.
+        Only if the half time ids are interleaved copies are made.
+
+        Returns:
+            A list with the CompactPositionData of both halves.
+        """
+        res = []
+        for ht_id in [1,2]:
+            idx = np.flatnonzero(self.half == ht_id)
+            if idx.size == 0:
+                res.append(self.select(slice(0, 0)))
+            elif idx[-1] - idx[0] + 1 == idx.size:
+                res.append(self.select(slice(idx[0], idx[-1] + 1)))
+            else:
+                res.append(self.select(idx))
+        return res
+
+    def ball_array(self):
+        """Returns the ball data in the (frames, 6) layout of the loaders."""
+        ball = np.empty((self.frame.shape[0], __NO_DIM_BALL__),
+                dtype=self.ball_xyz.dtype)
+        ball[:,0] = self.frame
+        ball[:,1:4] = self.ball_xyz
+        ball[:,4:] = self.ball_state
+        return ball
+
+    def player_data(self, role, team):
+        """Groups the data of a team into the player entries of the loaders.
+
+        Args:
+            role: 'home' or 'guest'.
+            team: team specifications as obtained from MatchInformationParser.
+        Returns:
+            A list with (player id, (frames, 3) array with frame, x, and y,
+            player role) tuples.
+        """
+        shirts = getattr(self, role + '_shirt').ravel()
+        xy = getattr(self, role + '_xy').reshape((-1, 2))
+        # flat indices of the present players in frame order
+        present = np.flatnonzero(shirts != __MISSING__)
+        order, trikots, starts = group_keys(shirts[present])
+        if not trikots.size:
+            return []
+        flat = present[order]
+        data = np.empty((flat.size, __NO_DIM__), dtype=xy.dtype)
+        data[:,0] = self.frame[flat // __NO_PLAYER__]
+        data[:,1:] = xy[flat]
+        idx = lookup_players(trikots, team)
+        return [(team[i]['id'], player, team[i]['position'])
+                for i, player in zip(idx, np.split(data, starts[1:]))]
+
+    @property
+    def nbytes(self):
+        """Number of bytes of all arrays."""
+        return sum(getattr(self, field).nbytes for field in self.fields)
+
+
+def read_in_compact_position_data(fname, engine = 'bulk', block_size = 2**22,
+        coord_dtype = np.float32, id_dtype = np.int16, **kwargs):
+    """Reads in a pos file into the compact memory layout.
+
+    With the 'bulk' engine every block is converted right after parsing,
+    thus the float64 arrays of the whole file are never allocated.
+
+    Args:
+        fname: name of the position data file.
+        engine: position parser engine, see read_in_position_data.
+        block_size: number of bytes per block.
+        coord_dtype: dtype of the coordinates.
+        id_dtype: dtype of the shirt numbers, half time ids and states.
+        kwargs: further arguments of read_in_position_data.
+    Returns:
+        A CompactPositionData instance.
+    """
+    if engine != 'bulk':
+        return CompactPositionData.from_arrays(*read_in_position_data(fname,
+            engine=engine, block_size=block_size, **kwargs),
+            coord_dtype=coord_dtype, id_dtype=id_dtype)
+
+    with instrumentation.timed('impire.compact_position_data',
+            bytes=instrumentation.file_size(fname)) as metrics:
+        parts = []
+        with open(fname, 'rb') as fid:
+            first_line = fid.readline()
+            blocks = iter_line_blocks(fid, block_size)
+            if first_line:
+                parts.append(CompactPositionData.from_arrays(
+                    *parse_position_lines([first_line]),
+                    coord_dtype=coord_dtype, id_dtype=id_dtype))
+            for block in blocks:
+                parts.append(CompactPositionData.from_arrays(
+                    *parse_position_block(block),
+                    coord_dtype=coord_dtype, id_dtype=id_dtype))
+        if not parts:
+            parts.append(CompactPositionData.from_arrays(
+                *allocate_position_arrays(0), coord_dtype=coord_dtype,
+                id_dtype=id_dtype))
+        data = CompactPositionData.concatenate(parts)
+        metrics['frames'] = data.frame.shape[0]
+        metrics['peak_bytes'] = data.nbytes
+    return data
+
+
 def split_positions_into_game_halves(pos,ht,ball):
     """ splits the data frames into first and second halves.
         Args:
@@ -290,19 +745,57 @@ def split_positions_into_game_halves(pos,ht,ball):
 
     return res
 
+def group_keys(keys):
+    """Groups equal keys with a single stable argsort.
+
+        Args:
+            keys: one dimensional array with the keys.
+        Returns:
+            tuple with the sort order, the unique keys in ascending order,
+            and the start of each group within the sort order. Within a
+            group the original order is preserved.
+    """
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True],
+        sorted_keys[1:] != sorted_keys[:-1]))) if keys.size else \
+        np.zeros(0, dtype=np.intp)
+    return order, sorted_keys[starts], starts
+
+def lookup_players(trikots, team):
+    """Maps shirt numbers onto the entries of a team.
+
+        Args:
+            trikots: array with shirt numbers.
+            team: Team specifications as obtained from MatchInformationParser.
+        Returns:
+            Array with the index of the player in team for each shirt number.
+    """
+    team_trikots = np.array([player['trikot'] for player in team])
+    trikots = np.asarray(trikots).astype(team_trikots.dtype)
+    order = np.argsort(team_trikots, kind='stable')
+    keys = team_trikots[order]
+    # the last entry wins for duplicate shirt numbers
+    idx = np.searchsorted(keys, trikots, side='right') - 1
+    unknown = (idx < 0) | (keys[np.maximum(idx, 0)] != trikots)
+    if np.any(unknown):
+        raise KeyError(trikots[unknown][0])
+    return order[idx]
+
 def sort_position_data(pos,id=1):
     """Sorts the position data according to player and period.
 
+        All players are grouped in a single pass with a stable argsort
+        over the player ids.
+
         Args:
             pos: The position data as obtained from read_in_position
         Returns:
             A list with position data from each player.
     """
-    unique_player = np.unique(pos[:,:,id])
-    res = []
-    for pid in unique_player:
-        res.append(pos[pos[:,:,id]==pid])
-    return res
+    rows = pos.reshape((-1, pos.shape[2]))
+    order, unique_player, starts = group_keys(rows[:,id])
+    return np.split(rows[order], starts[1:]) if unique_player.size else []
 
 def read_stadium_dimensions_from_pos(fname):
     """Gets the stadium specifications from the pos file.
@@ -315,6 +808,16 @@ def read_stadium_dimensions_from_pos(fname):
     fid = open(fname,'r')
     line = fid.readline()
     fid.close()
+    return parse_stadium_dimensions(line)
+
+def parse_stadium_dimensions(line):
+    """Gets the stadium specifications from the first line of a pos file.
+
+        Args:
+            line: first line of the position file.
+        Returns:
+            A dictionary with width and length entries.
+    """
     specs_string = line.split('#')[5].rstrip()[:-1].split(',')
     length = float(specs_string[1])
     width = float(specs_string[2])
@@ -329,26 +832,52 @@ def combine_position_with_role(pos, team):
             team: Team specifications as obtained from MatchInformationParser.
         Returns:
     """
-    # build simple dictionary from trikot to role
-    trikot_to_role = {}
-    trikot_to_pid = {}
-    for player in team:
-        trikot_to_role[player['trikot']] = player['position']
-        trikot_to_pid[player['trikot']] = player['id']
-    res = []
-    for player in pos:
-        trikot = int(player[1,1])
-        res.append((trikot_to_pid[trikot],
-                    player[:,(0,2,3)],
-                    trikot_to_role[trikot]))
-    return res
+    idx = lookup_players([int(player[0,1]) for player in pos], team)
+    return [(team[i]['id'], player[:,(0,2,3)], team[i]['position'])
+            for i, player in zip(idx, pos)]
+
+def sort_and_combine_position_data(pos, team, id=1):
+    """Groups the position data by player and combines it with the roles.
+
+        Equivalent to combine_position_with_role(sort_position_data(pos), team)
+        but the rows are sorted and the frame, x, and y columns are gathered
+        once for all players. Entries of missing players are dropped.
 
-def run(match_info_file, match_pos_file):
+        Args:
+            pos: position data of one half from split_positions_into_game_halves.
+            team: Team specifications as obtained from MatchInformationParser.
+            id: column of the player ids.
+        Returns:
+            A list with (player id, (frames, 3) array with frame, x, and y,
+            player role) tuples.
+    """
+    rows = pos.reshape((-1, pos.shape[2]))
+    keys = rows[:,id]
+    present = keys != __MISSING__
+    if not np.all(present):
+        rows = rows[present]
+        keys = keys[present]
+    order, trikots, starts = group_keys(keys)
+    if not trikots.size:
+        return []
+    players = np.split(rows[order][:,(0,2,3)], starts[1:])
+    idx = lookup_players(trikots.astype(int), team)
+    return [(team[i]['id'], player, team[i]['position'])
+            for i, player in zip(idx, players)]
+
+@cache.cached(version = 2, files = ('match_info_file', 'match_pos_file'),
+        ignore = ('engine', 'processes'))
+def run(match_info_file, match_pos_file, engine = 'bulk', processes = None,
+        compact = False):
     """Driver function to run data loading of impire data.
 
         Args:
             match_info_file: matchfacts file
             match_pos_file: position data file.
+            engine: position parser engine, see read_in_position_data.
+            processes: number of worker processes for the 'parallel' engine.
+            compact: load through the CompactPositionData layout, the
+                     player and ball arrays are float32 then.
         Returns:
           pos_data: position data struct with keys ['home','guest']
                     with sub struct ['1st','2nd'] for game halves
@@ -370,18 +899,23 @@ def run(match_info_file, match_pos_file):
         raise ValueError('fname_specs and fname_pos refer to different games.')
 
     match, teams = get_impire_match_information(match_info_file, match_pos_file)
-    home, guest, ball, half_time_id = read_in_position_data(match_pos_file)
+    if compact:
+        return run_compact(match_pos_file, teams, engine, processes) + \
+                (match, teams)
+    home, guest, ball, half_time_id = read_in_position_data(match_pos_file,
+            engine=engine, processes=processes)
 
     def process_teams(team,type):
         """Just to work through the team data."""
         periods = split_positions_into_game_halves(team,half_time_id,ball)
-        periods_sorted = [sort_position_data(p) for p in periods]
-        position_arr = [combine_position_with_role(ps,teams[type])
-                            for ps in periods_sorted]
-        return position_arr
-
-    home_data = process_teams(home,'home')
-    guest_data = process_teams(guest,'guest')
+        return [sort_and_combine_position_data(p, teams[type])
+                for p in periods]
+
+    with instrumentation.timed('impire.process_teams',
+            frames=ball.shape[0]) as metrics:
+        home_data = process_teams(home,'home')
+        guest_data = process_teams(guest,'guest')
+        metrics['players'] = sum(len(half) for half in home_data + guest_data)
     ball_1 = ball[half_time_id==1,:]
     ball_2 = ball[half_time_id==2,:]
 
@@ -393,6 +927,34 @@ def run(match_info_file, match_pos_file):
     return pos_data, ball, match, teams
 
 
+def run_compact(match_pos_file, teams, engine = 'bulk', processes = None):
+    """Loads position data through the CompactPositionData layout.
+
+        The halves are views of the compact arrays and the player arrays
+        are directly grouped from them without intermediate copies.
+
+        Args:
+            match_pos_file: position data file.
+            teams: team information dictionary.
+            engine: position parser engine, see read_in_position_data.
+            processes: number of worker processes for the 'parallel' engine.
+        Returns:
+            tuple with pos_data and ball, see run.
+    """
+    kwargs = {} if engine != 'parallel' else {'processes': processes}
+    data = read_in_compact_position_data(match_pos_file, engine=engine, **kwargs)
+    halves = data.halves()
+    with instrumentation.timed('impire.process_teams',
+            frames=data.frame.shape[0]) as metrics:
+        pos_data = dict((role, dict(zip(['1st', '2nd'],
+            [half.player_data(role, teams[role]) for half in halves])))
+            for role in ['home', 'guest'])
+        metrics['players'] = sum(len(half) for team in pos_data.values()
+                for half in team.values())
+    ball = [half.ball_array() for half in halves]
+    return pos_data, ball
+
+
 def get_impire_match_information(match_info_file, pos_data_file):
     """Simple interface to read in impire matchfacts and team data.
 
@@ -465,7 +1027,59 @@ def increase_frame_counter(position_data, ball_data, fh_frame_start = 10000, sh_
 
     return position_data_nf, ball_data_nf
 
-def get_df_from_files(match_info_file, match_pos_file):
+def transform_position_data(position_data, ball_data, length, width,
+        fh_frame_start = 10000, sh_frame_start = 100000, copy = True):
+    """Rescales the xy positions and shifts the frame counters in one pass.
+
+        Fuses rescale_xy_positions and increase_frame_counter. Every
+        player and ball array is touched once, the frame, x and y columns
+        are multiplied with (1, length / 2, width / 2) and the half
+        specific frame offset is added. The results are identical to the
+        two step chain.
+
+        Args:
+            position_data: player position data structure
+            ball_data: ball data list with first [0] and second half [1]
+            length: length of pitch
+            width: width of pitch
+            fh_frame_start: first half frame counter start
+            sh_frame_start: second half frame counter start
+            copy: if True the input is left untouched and the results are
+                  written into newly allocated arrays, if False the
+                  arrays are transformed in place and the input
+                  structures are returned.
+        Returns:
+            The transformed position data structure and ball data list.
+    """
+    scale = np.array([1.0, length / 2.0, width / 2.0])
+    offsets = {'1st': fh_frame_start, '2nd': sh_frame_start}
+
+    def transform(arr, offset):
+        if copy:
+            out = np.empty_like(arr)
+            out[:,3:] = arr[:,3:]
+        else:
+            out = arr
+        coords = out[:,:3]
+        np.multiply(arr[:,:3], scale.astype(arr.dtype), out=coords)
+        coords[:,0] += offset
+        return out
+
+    ball_res = [transform(half, offsets[key]) for half, key in
+            zip(ball_data, ['1st', '2nd'])]
+    pos_res = dict((key_t, dict((key_h, [(player[0],
+        transform(player[1], offsets[key_h]), player[2]) for player in half])
+        for key_h, half in team_pos_data.items()))
+        for key_t, team_pos_data in position_data.items())
+    if not copy:
+        # the arrays were transformed in place
+        return position_data, ball_data
+    return pos_res, ball_res
+
+@cache.cached(version = 2, files = ('match_info_file', 'match_pos_file'),
+        ignore = ('engine', 'processes'))
+def get_df_from_files(match_info_file, match_pos_file, engine = 'bulk',
+        processes = None, compact = False):
     """Wrapper function to get a pandas dataframe from impire position data. 
 
     This function is meant as an outside API to load position data from
@@ -474,6 +1088,9 @@ def get_df_from_files(match_info_file, match_pos_file):
     Args:
         match_info_file: full path to the MatchInformation file.
         match_pos_file: full path to the PositionData file.
+        engine: position parser engine, see read_in_position_data.
+        processes: number of worker processes for the 'parallel' engine.
+        compact: load through the CompactPositionData layout, see run.
     Returns:
         A tuple with a Pandas dataframe with the position data,
         the teams information dictionary, and
@@ -482,11 +1099,13 @@ def get_df_from_files(match_info_file, match_pos_file):
     import footballpy.fs.loader.papi as papi
 
     # read in position data
-    pos_data, ball_data, match, teams = run(match_info_file, match_pos_file)
-    # rescale to actual meters
-    pos_data_sc, ball_data_sc = rescale_xy_positions(pos_data, ball_data, **match['stadium'])
-    # add frame counters
-    pos_data_reindex, ball_data_reindex = increase_frame_counter(pos_data_sc, ball_data_sc)
+    pos_data, ball_data, match, teams = run(match_info_file, match_pos_file,
+            engine=engine, processes=processes, compact=compact)
+    with instrumentation.timed('impire.transform',
+            frames=sum(half.shape[0] for half in ball_data)):
+        # rescale to actual meters and add frame counters
+        pos_data_reindex, ball_data_reindex = transform_position_data(
+                pos_data, ball_data, copy=False, **match['stadium'])
     # transform to pandas dataframe
     pos_df = papi.pos_data_to_df(pos_data_reindex, ball_data_reindex)
     return pos_df, teams, match
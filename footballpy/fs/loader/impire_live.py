@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+impire_live: Incremental reading of growing impire position data files.
+
+During a match the position feed appends one line per frame to the .pos
+file. The PositionFileFollower remembers the byte offset of the last
+complete line and parses only the newly appended lines on every poll.
+The frames are kept in a RollingPositionBuffer which holds the most
+recent frames in the column layout of impire.read_in_position_data.
+
+Example:
+    follower = PositionFileFollower('123456.pos')
+    for no_new in follower.follow(interval = 0.04):
+        home, guest, ball, half_time_id = follower.buffer.latest(250)
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import os
+import time
+import numpy as np
+from footballpy import instrumentation
+import footballpy.fs.loader.impire as impire
+
+__DEFAULT_CAPACITY__ = 25 * 60 * 60    # one hour at 25 Hz
+
+
+class RollingPositionBuffer:
+    """Ring buffer holding the most recent frames.
+
+    The arrays have the layout of impire.read_in_position_data, i.e.
+    home and guest (capacity, 11, 3), ball (capacity, 6) and the half
+    time index (capacity,).
+
+    Attributes:
+        capacity: maximum number of frames.
+        size: number of frames currently held.
+        total: number of frames appended since the last clear.
+    """
+
+    def __init__(self, capacity = __DEFAULT_CAPACITY__):
+        """Constructor method.
+
+        Args:
+            capacity: maximum number of frames { default: one hour at 25 Hz }
+        Returns:
+            Nothing
+        """
+        self.capacity = capacity
+        self.arrays = impire.allocate_position_arrays(capacity)
+        self.clear()
+
+    def clear(self):
+        """Removes all frames."""
+        self.start = 0
+        self.size = 0
+        self.total = 0
+
+    def append(self, home_team, guest_team, ball, half_time_id):
+        """Appends frames, the oldest frames are dropped when full.
+
+        Args:
+            home_team, guest_team, ball, half_time_id: arrays of new frames
+                as returned by impire.read_in_position_data.
+        Returns:
+            Nothing
+        """
+        no_frames = ball.shape[0]
+        new = (home_team, guest_team, ball, half_time_id)
+        if no_frames > self.capacity:
+            new = [arr[-self.capacity:] for arr in new]
+        count = new[2].shape[0]
+        end = (self.start + self.size) % self.capacity
+        first = min(count, self.capacity - end)
+        for buf, arr in zip(self.arrays, new):
+            buf[end:end + first] = arr[:first]
+            buf[:count - first] = arr[first:]
+        overflow = max(self.size + count - self.capacity, 0)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+        self.total += no_frames
+
+    def latest(self, no_frames = None):
+        """Returns the most recent frames in chronological order.
+
+        Args:
+            no_frames: number of frames, None returns all held frames.
+        Returns:
+            tuple with home team, guest team, ball and half time arrays.
+            These are views into the buffer if the frames are stored
+            contiguously and copies otherwise.
+        """
+        if no_frames is None or no_frames > self.size:
+            no_frames = self.size
+        first = (self.start + self.size - no_frames) % self.capacity
+        if first + no_frames <= self.capacity:
+            return tuple(buf[first:first + no_frames] for buf in self.arrays)
+        idx = (first + np.arange(no_frames)) % self.capacity
+        return tuple(buf[idx] for buf in self.arrays)
+
+
+class PositionFileFollower:
+    """Follows a growing impire position data file.
+
+    Attributes:
+        fname: name of the position data file.
+        buffer: RollingPositionBuffer with the parsed frames.
+        offset: byte offset after the last parsed line.
+        stadium: stadium dimensions from the first line, None before the
+                 first line was read.
+    """
+
+    def __init__(self, fname, capacity = __DEFAULT_CAPACITY__):
+        """Constructor method.
+
+        Args:
+            fname: name of the position data file.
+            capacity: number of frames kept in the buffer.
+        Returns:
+            Nothing
+        """
+        self.fname = fname
+        self.buffer = RollingPositionBuffer(capacity)
+        self.offset = 0
+        self.stadium = None
+
+    def reset(self):
+        """Starts again from the beginning of the file."""
+        self.offset = 0
+        self.stadium = None
+        self.buffer.clear()
+
+    def poll(self):
+        """Parses the complete lines appended since the last poll.
+
+        An incomplete last line is left for the next poll. If the file
+        shrank it is considered to be replaced and read from the start.
+
+        Returns:
+            The number of new frames.
+        """
+        try:
+            size = os.path.getsize(self.fname)
+        except OSError:
+            return 0
+        if size < self.offset:
+            self.reset()
+        if size == self.offset:
+            return 0
+        with open(self.fname, 'rb') as fid:
+            fid.seek(self.offset)
+            data = fid.read(size - self.offset)
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return 0
+        block = data[:end]
+        no_frames = 0
+        with instrumentation.timed('impire_live.poll', bytes=end) as metrics:
+            if self.offset == 0:
+                first_end = block.find(b'\n') + 1
+                first_line = block[:first_end]
+                self.stadium = impire.parse_stadium_dimensions(
+                        first_line.decode('ascii'))
+                self.buffer.append(*impire.parse_position_lines([first_line]))
+                no_frames += 1
+                block = block[first_end:]
+            if block:
+                new = impire.parse_position_block(block)
+                self.buffer.append(*new)
+                no_frames += new[2].shape[0]
+            metrics['frames'] = no_frames
+        self.offset += end
+        return no_frames
+
+    def follow(self, interval = 0.04, timeout = None):
+        """Generator which polls the file periodically.
+
+        Args:
+            interval: seconds between two polls { default: one frame at 25 Hz }
+            timeout: stop after this many seconds without new frames,
+                     None follows forever.
+        Returns:
+            Yields the number of new frames after every poll with new frames.
+        """
+        last_update = time.time()
+        while True:
+            no_frames = self.poll()
+            if no_frames:
+                last_update = time.time()
+                yield no_frames
+            elif timeout is not None and time.time() - last_update > timeout:
+                return
+            else:
+                time.sleep(interval)
@@ -1,6 +1,7 @@
 # -*- encoding: utf-8 -*-
 
 from lxml import etree
+import numpy as np
 import pandas as pd
 
 
@@ -28,18 +29,25 @@ def get_game_info(el):
     """
     return dict(list(map(lambda key: (key, el.get(key)), el.keys())))
 
-def parse_pass(el):
+def parse_pass(el, qualifiers = None):
     """ Parsing passe element from F24
+
+        Args:
+            el: lxml-element
+            qualifiers: qualifier dictionary of el, see get_qualifiers.
+        Returns:
+            A dictionary with the according entries.
     """
+    q = get_qualifiers(el) if qualifiers is None else qualifiers
     basic_info = get_basic_info(el)
     x0 = float(el.get('x'))
     y0 = float(el.get('y'))
-    x1 = float(get_q_value(el, 140))
-    y1 = float(get_q_value(el, 141))
+    x1 = float(q[140])
+    y1 = float(q[141])
     outcome = el.get('outcome')
-    cross = check_q_element_present(el, 2)
-    free_kick = check_q_element_present(el, 5)
-    corner = check_q_element_present(el, 6)
+    cross = 2 in q
+    free_kick = 5 in q
+    corner = 6 in q
     return {**{
             'evt_type': 'pass',
             'outcome': outcome,
@@ -63,11 +71,12 @@ def get_events(root, evt_type):
     """
     return root.xpath('//Event[@type_id="{0}"]'.format(evt_type))
 
-def parse_miss(el):
+def parse_miss(el, qualifiers = None):
     """Parsing function for a missed shot.
 
         Args:
             el: lxml-element
+            qualifiers: not used, for a uniform parser signature.
         Returns:
             A dictionary with the according entries.
     """
@@ -82,8 +91,8 @@ def parse_miss(el):
         'outcome': outcome
         }, **basic_info }
 
-def parse_post(el):
-    """
+def parse_post(el, qualifiers = None):
+    """Parsing function for a shot hitting the post.
     """
     evt_type = 'post'
     basic_info = get_basic_info(el)
@@ -97,15 +106,16 @@ def parse_post(el):
         }, **basic_info }
 
 
-def parse_attempt(el):
-    """
+def parse_attempt(el, qualifiers = None):
+    """Parsing function for a saved attempt.
     """
+    q = get_qualifiers(el) if qualifiers is None else qualifiers
     evt_type = 'attempt'
     basic_info = get_basic_info(el)
     x = float(el.get('x'))
     y = float(el.get('y'))
     outcome = el.get('outcome')
-    header = check_q_element_present(el, 15)
+    header = 15 in q
     return { **{
         'x': x,
         'y': y,
@@ -114,20 +124,21 @@ def parse_attempt(el):
         }, **basic_info }
 
 
-def parse_goal(el):
-    """
+def parse_goal(el, qualifiers = None):
+    """Parsing function for a goal.
     """
+    q = get_qualifiers(el) if qualifiers is None else qualifiers
     evt_type = 'goal'
     basic_info = get_basic_info(el)
     x = float(el.get('x'))
     y = float(el.get('y'))
     outcome = el.get('outcome')
-    open_play = check_q_element_present(el, 22)
-    set_play = check_q_element_present(el, 24)
-    penalty = check_q_element_present(el, 9)
-    own_goal = check_q_element_present(el, 28)
-    header = check_q_element_present(el, 15)
-    assist_id = get_q_value_safe(el, 55)
+    open_play = 22 in q
+    set_play = 24 in q
+    penalty = 9 in q
+    own_goal = 28 in q
+    header = 15 in q
+    assist_id = q.get(55, 'NA')
     return { **{
         'evt_type': evt_type,
         'open_play': open_play,
@@ -141,9 +152,10 @@ def parse_goal(el):
         'outcome': outcome
         }, **basic_info }
 
-def parse_sub(el):
-    """
+def parse_sub(el, qualifiers = None):
+    """Parsing function for the substitution events 18, 19 and 20.
     """
+    q = get_qualifiers(el) if qualifiers is None else qualifiers
     evt_type = 'substitution'
     type_id = int(el.get('type_id'))
     if type_id == 18:
@@ -155,9 +167,9 @@ def parse_sub(el):
     else:
         evt_type_qualified = 'NA'
     basic_info = get_basic_info(el)
-    position = get_q_value(el, 44)
-    connected_sub = get_q_value(el, 55)
-    detailed_position = detailed_position_key[int(get_q_value_safe(el, 292, 0))]
+    position = q[44]
+    connected_sub = q[55]
+    detailed_position = detailed_position_key[int(q.get(292, 0))]
     return { **{
         'evt_type': evt_type,
         'evt_type_qualified': evt_type_qualified,
@@ -166,6 +178,23 @@ def parse_sub(el):
         'detailed_position': detailed_position
         }, **basic_info }
 
+def get_qualifiers(el):
+    """Collects the qualifiers of an event in a single pass.
+
+        Args:
+            el: etree._Element of event
+        Returns:
+            A dictionary qualifier_id (int) -> value. The value is None for
+            qualifiers without value. For repeated qualifiers the first
+            entry is kept.
+    """
+    qualifiers = {}
+    for q in el.iterchildren('Q'):
+        key = int(q.get('qualifier_id'))
+        if key not in qualifiers:
+            qualifiers[key] = q.get('value')
+    return qualifiers
+
 def get_q_value(el, id):
     """Returns the q value from el children.
 
@@ -217,6 +246,179 @@ def get_basic_info(el):
             }
 
 
+def parse_other(el, qualifiers = None):
+    """Parsing function for events without a dedicated parser.
+
+        Args:
+            el: lxml-element
+            qualifiers: not used, for a uniform parser signature.
+        Returns:
+            A dictionary with the basic information, the position and the
+            outcome of the event.
+    """
+    x = el.get('x')
+    y = el.get('y')
+    return { **{
+        'x': float(x) if x is not None else None,
+        'y': float(y) if y is not None else None,
+        'outcome': el.get('outcome')
+        }, **get_basic_info(el) }
+
+
+__event_parsers__ = {
+        1: parse_pass,
+        13: parse_miss,
+        14: parse_post,
+        15: parse_attempt,
+        16: parse_goal,
+        18: parse_sub,
+        19: parse_sub,
+        20: parse_sub
+        }
+
+__event_types__ = {
+        1: 'pass',
+        13: 'miss',
+        14: 'post',
+        15: 'attempt',
+        16: 'goal',
+        18: 'substitution',
+        19: 'substitution',
+        20: 'substitution'
+        }
+
+# format of the event time stamps, explicit for pandas < 2.0
+__TIMESTAMP_FORMAT__ = '%Y-%m-%dT%H:%M:%S.%f'
+
+# column name, dtype and value of events without the entry
+__event_columns__ = [
+        ('evt_id', 'int64', -1),
+        ('type_id', 'int16', -1),
+        ('evt_type', 'category', None),
+        ('evt_type_qualified', 'category', None),
+        ('period', 'int8', -1),
+        ('minute', 'int16', -1),
+        ('second', 'int8', -1),
+        ('timestamp', 'datetime64[ns]', None),
+        ('team_id', 'category', None),
+        ('player_id', 'category', None),
+        ('outcome', 'int8', -1),
+        ('x', 'float32', np.nan),
+        ('y', 'float32', np.nan),
+        ('x1', 'float32', np.nan),
+        ('y1', 'float32', np.nan),
+        ('cross', 'bool', False),
+        ('free_kick', 'bool', False),
+        ('corner', 'bool', False),
+        ('header', 'bool', False),
+        ('open_play', 'bool', False),
+        ('set_play', 'bool', False),
+        ('penalty', 'bool', False),
+        ('own_goal', 'bool', False),
+        ('assist_id', 'category', None),
+        ('position', 'category', None),
+        ('connected_sub', 'category', None),
+        ('detailed_position', 'category', None)
+        ]
+
+
+def iter_events(fname, type_ids = None):
+    """Streams the events of an F24 file in a single pass.
+
+        Every Event element is parsed once: its qualifiers are collected
+        into a dictionary which is handed to the parser of the event type
+        (see __event_parsers__, other types use parse_other). Afterwards
+        the element is released, so the document is never held in memory
+        as a whole.
+
+        Args:
+            fname: filepath or file object of the F24 file.
+            type_ids: iterable of event type ids to parse
+                      { default: None = all events }
+        Returns:
+            A generator yielding a dictionary per event. The event type id
+            is added under the key 'type_id'.
+    """
+    if type_ids is not None:
+        type_ids = set(int(t) for t in type_ids)
+    for _, el in etree.iterparse(fname, events=('end',), tag='Event'):
+        type_id = int(el.get('type_id'))
+        if type_ids is None or type_id in type_ids:
+            parser = __event_parsers__.get(type_id, parse_other)
+            event = parser(el, get_qualifiers(el))
+            event['type_id'] = type_id
+        else:
+            event = None
+        el.clear()
+        while el.getprevious() is not None:
+            del el.getparent()[0]
+        if event is not None:
+            yield event
+
+
+def read_game_info(fname):
+    """Reads the match infos from the Game tag without parsing the events.
+
+        Args:
+            fname: filepath or file object of the F24 file.
+        Returns:
+            A dictionary with the attributes of the Game tag.
+    """
+    for _, el in etree.iterparse(fname, events=('start',), tag='Game'):
+        return get_game_info(el)
+    return {}
+
+
+def events_to_table(events):
+    """Converts parsed events into a typed columnar table.
+
+        Args:
+            events: iterable of event dictionaries, e.g. from iter_events.
+        Returns:
+            A pandas DataFrame with the columns of __event_columns__. Entries
+            which do not apply to an event type are filled with -1, NaN,
+            False or missing values respectively.
+    """
+    columns = {name: [] for name, _, _ in __event_columns__}
+    defaults = [(name, columns[name], default) for name, _, default in __event_columns__]
+    for event in events:
+        if 'x0' in event:
+            event = dict(event, x=event['x0'], y=event['y0'])
+        if 'evt_type' not in event:
+            event = dict(event, evt_type=__event_types__.get(event['type_id'], 'other'))
+        for name, values, default in defaults:
+            value = event.get(name)
+            values.append(default if value is None else value)
+    data = {}
+    for name, dtype, _ in __event_columns__:
+        values = columns[name]
+        if name == 'timestamp':
+            # time stamps without fraction are padded to the common format
+            values = [v if v is None or '.' in v else v + '.0' for v in values]
+            data[name] = pd.to_datetime(pd.Series(values, dtype=object),
+                    format=__TIMESTAMP_FORMAT__).astype(dtype)
+        elif name == 'outcome':
+            data[name] = np.array([int(v) for v in values], dtype=dtype)
+        elif dtype == 'category':
+            data[name] = pd.Categorical(values)
+        else:
+            data[name] = np.array(values, dtype=dtype)
+    return pd.DataFrame(data, columns=[name for name, _, _ in __event_columns__])
+
+
+def get_event_table(fname, type_ids = None):
+    """Loads the events of an F24 file into a typed columnar table.
+
+        Args:
+            fname: filepath of the F24 file.
+            type_ids: iterable of event type ids to load
+                      { default: None = all events }
+        Returns:
+            A pandas DataFrame with a row per event, see events_to_table.
+    """
+    return events_to_table(iter_events(fname, type_ids))
+
+
 if __name__ == '__main__':
     fname = 'f24-22-2016-861478-eventdetails.xml'
     tree = etree.parse(fname)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+opta_store: Columnar on disk store of Opta F24 event data.
+
+Many F24 files, e.g. all matches of a season, are parsed in a process
+pool and written into a single store directory. Every column of the
+event table (see opta_f24.get_event_table) is saved as a .npy file.
+Player, team and the other identifier columns are dictionary encoded:
+the file holds int32 codes (-1 for missing) and the dictionary is kept
+in the meta data file. The columns can be memory mapped back, hence
+season wide queries only read the columns they use.
+
+Usage:
+    python -m footballpy.fs.loader.opta_store store_dir f24_file [...]
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+from __future__ import print_function
+import glob
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+from footballpy import instrumentation
+import footballpy.fs.loader.opta_f24 as f24
+
+__STORE_VERSION__ = 1
+__META_FILE__ = 'meta.json'
+__F24_PATTERN__ = re.compile(r'f24-(\d+)-(\d+)-(\d+)-eventdetails\.xml$')
+
+
+def find_season_files(directory, pattern = 'f24-*-eventdetails.xml'):
+    """Groups the F24 files of a directory by competition and season.
+
+        The competition and season ids are taken from the file names
+        f24-<competition>-<season>-<game>-eventdetails.xml.
+
+        Args:
+            directory: directory containing the F24 files.
+            pattern: glob pattern of the F24 files.
+        Returns:
+            A dictionary (competition_id, season_id) -> sorted list of
+            filepaths.
+    """
+    seasons = {}
+    for fname in sorted(glob.glob(os.path.join(directory, pattern))):
+        match = __F24_PATTERN__.search(os.path.basename(fname))
+        if match is None:
+            continue
+        key = (match.group(1), match.group(2))
+        seasons.setdefault(key, []).append(fname)
+    return seasons
+
+
+def parse_event_file(fname, type_ids = None):
+    """Parses a single F24 file, used by the worker processes.
+
+        Args:
+            fname: filepath of the F24 file.
+            type_ids: event type ids to load { default: None = all }
+        Returns:
+            A tuple (game_info, table) with the Game attributes and the
+            event table including a 'game_id' column.
+    """
+    game_info = f24.read_game_info(fname)
+    table = f24.get_event_table(fname, type_ids)
+    table.insert(0, 'game_id', pd.Categorical([game_info.get('id')] * len(table)))
+    return game_info, table
+
+
+def build_event_store(fnames, store_dir, processes = None, type_ids = None):
+    """Parses F24 files in parallel and writes them into a columnar store.
+
+        Args:
+            fnames: list of F24 filepaths, e.g. of a single season.
+            store_dir: directory of the store, created if necessary. An
+                       existing store is overwritten.
+            processes: number of worker processes { default: None =
+                       number of CPUs }, 1 parses in this process.
+            type_ids: event type ids to load { default: None = all }
+        Returns:
+            The number of stored events.
+    """
+    fnames = list(fnames)
+    with instrumentation.timed('opta_store.build', files=len(fnames)) as metrics:
+        if processes == 1 or len(fnames) < 2:
+            results = [parse_event_file(fname, type_ids) for fname in fnames]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                results = list(executor.map(parse_event_file, fnames,
+                    [type_ids] * len(fnames)))
+        games = [game_info for game_info, _ in results]
+        if results:
+            table = pd.concat([t for _, t in results], ignore_index=True)
+        else:
+            table = f24.events_to_table([])
+            table.insert(0, 'game_id', pd.Categorical([]))
+        write_event_store(table, store_dir, games=games, files=fnames)
+        metrics['events'] = len(table)
+        metrics['bytes'] = sum(instrumentation.file_size(f) or 0 for f in fnames)
+    return len(table)
+
+
+def write_event_store(table, store_dir, games = None, files = None):
+    """Writes an event table into a columnar store.
+
+        Args:
+            table: pandas DataFrame, string and categorical columns are
+                   dictionary encoded.
+            store_dir: directory of the store.
+            games: list with the Game attributes of the stored matches.
+            files: list with the source files.
+        Returns:
+            Nothing
+    """
+    if not os.path.isdir(store_dir):
+        os.makedirs(store_dir)
+    columns = []
+    dictionaries = {}
+    for name in table.columns:
+        series = table[name]
+        if (isinstance(series.dtype, pd.CategoricalDtype) or
+                pd.api.types.is_string_dtype(series.dtype)):
+            values = pd.Categorical(series)
+            dictionaries[name] = [str(v) for v in values.categories]
+            arr = values.codes.astype(np.int32)
+        else:
+            arr = series.to_numpy()
+        np.save(os.path.join(store_dir, name + '.npy'), arr)
+        columns.append(name)
+    meta = {
+            'version': __STORE_VERSION__,
+            'rows': len(table),
+            'columns': columns,
+            'dictionaries': dictionaries,
+            'games': games or [],
+            'files': [os.path.abspath(f) for f in (files or [])]
+            }
+    tmp_file = os.path.join(store_dir, __META_FILE__ + '.tmp')
+    with open(tmp_file, 'w') as fid:
+        json.dump(meta, fid)
+    os.replace(tmp_file, os.path.join(store_dir, __META_FILE__))
+
+
+def read_store_meta(store_dir):
+    """Reads the meta data of a store.
+
+        Args:
+            store_dir: directory of the store.
+        Returns:
+            A dictionary with the keys 'rows', 'columns', 'dictionaries',
+            'games' and 'files'.
+    """
+    with open(os.path.join(store_dir, __META_FILE__), 'r') as fid:
+        meta = json.load(fid)
+    if meta.get('version') != __STORE_VERSION__:
+        raise ValueError('Unsupported event store version in %s' % store_dir)
+    return meta
+
+
+def read_event_columns(store_dir, columns = None, mmap_mode = 'r'):
+    """Reads the raw columns of a store.
+
+        Dictionary encoded columns are returned as int32 codes, see
+        meta['dictionaries'] for the according values.
+
+        Args:
+            store_dir: directory of the store.
+            columns: list of column names { default: None = all }
+            mmap_mode: see numpy.load, None reads the columns into memory.
+        Returns:
+            A tuple (arrays, meta) with a dictionary column -> array and
+            the meta data.
+    """
+    meta = read_store_meta(store_dir)
+    if columns is None:
+        columns = meta['columns']
+    arrays = {}
+    for name in columns:
+        if name not in meta['columns']:
+            raise KeyError('Unknown column %s in event store %s' % (name, store_dir))
+        arrays[name] = np.load(os.path.join(store_dir, name + '.npy'),
+                mmap_mode=mmap_mode)
+    return arrays, meta
+
+
+def load_event_store(store_dir, columns = None, mmap_mode = 'r'):
+    """Loads a store as event table.
+
+        Args:
+            store_dir: directory of the store.
+            columns: list of column names { default: None = all }
+            mmap_mode: see numpy.load.
+        Returns:
+            A pandas DataFrame, dictionary encoded columns are decoded to
+            categorical columns.
+    """
+    arrays, meta = read_event_columns(store_dir, columns, mmap_mode)
+    data = {}
+    for name, arr in arrays.items():
+        if name in meta['dictionaries']:
+            data[name] = pd.Categorical.from_codes(arr,
+                    categories=meta['dictionaries'][name])
+        else:
+            data[name] = arr
+    return pd.DataFrame(data, columns=list(arrays))
+
+
+#######################################
+if __name__ == "__main__":
+    import sys
+
+    store_dir = sys.argv[1]
+    no_events = build_event_store(sys.argv[2:], store_dir)
+    print('%s: stored %d events' % (store_dir, no_events))
@@ -10,6 +10,7 @@ papi: Module which provides a pandas functions to convert
 """
 import numpy as np
 import pandas as pd
+from footballpy import instrumentation
 
 
 def collect_pos_data_into_dataframe(pos_data, half_tresh = 100000):
@@ -24,12 +25,14 @@ def collect_pos_data_into_dataframe(pos_data, half_tresh = 100000):
     """
     def util_1(dataset):
         """Processes team by half position data. """
+        if not dataset:
+            return pd.DataFrame()
         dummy_ = []
         for player in dataset:
             dummy_.append(
                     pd.DataFrame(
                     player[1][:,1:],
-                    index = (player[1][:,0]).astype(np.int),
+                    index = (player[1][:,0]).astype(int),
                     columns = [player[0]+ '_x',
                         player[0] + '_y']))
         return pd.concat(dummy_, axis=1)
@@ -42,10 +45,11 @@ def collect_pos_data_into_dataframe(pos_data, half_tresh = 100000):
     
     home_df = util_2(pos_data, 'home')
     guest_df = util_2(pos_data, 'guest')
-    assert(home_df.shape[0] == guest_df.shape[0])
+    # teams can be missing after a selective load
+    player_df = pd.concat([home_df, guest_df], axis=1)
     # add index for half_time
-    guest_df['half'] = (guest_df.index >= half_tresh) + 1
-    return pd.concat([home_df, guest_df], axis=1)
+    player_df['half'] = (player_df.index >= half_tresh) + 1
+    return player_df
 
 def collect_ball_data_into_dataframe(ball_data):
     """ Generates a pandas dataframe from the ball position data.
@@ -57,26 +61,159 @@ def collect_ball_data_into_dataframe(ball_data):
         ball_df = pd.DataFrame(
                 ball[:,[1,2,4,5]],
                 columns = ['ball_x','ball_y','possession','game_state'],
-                index = ball[:,0].astype(np.int))
-        ball_df['possession'] = ball_df['possession'].astype(np.int)
-        ball_df['game_state'] = ball_df['game_state'].astype(np.int)
+                index = ball[:,0].astype(int))
+        ball_df['possession'] = ball_df['possession'].astype(int)
+        ball_df['game_state'] = ball_df['game_state'].astype(int)
         return ball_df
-    ball_1st = util_(ball_data[0])
-    ball_2nd = util_(ball_data[1])
-    return pd.concat([ball_1st, ball_2nd])
+    # halves which were not loaded are not stored as arrays
+    ball_halves = [util_(ball) for ball in ball_data if isinstance(ball, np.ndarray)]
+    if not ball_halves:
+        return pd.DataFrame(columns = ['ball_x','ball_y','possession','game_state'])
+    return pd.concat(ball_halves)
 
-def pos_data_to_df(pos_data, ball_data):
+def frame_index(pos_data, ball_data):
+    """Determines the union of the frame indices of players and ball.
+
+    Args:
+        pos_data: position data structure
+        ball_data: ball data list, halves which were not loaded are no arrays.
+    Returns:
+        A sorted numpy int64 array with the unique frame indices.
+    """
+    frames = [player[1][:,0] for team in ['home', 'guest'] if team in pos_data
+            for half in ['1st', '2nd'] for player in pos_data[team][half]]
+    frames += [ball[:,0] for ball in ball_data if isinstance(ball, np.ndarray)]
+    frames = [f for f in frames if f.size > 0]
+    if not frames:
+        return np.array([], dtype=np.int64)
+    first = int(min(f.min() for f in frames))
+    span = int(max(f.max() for f in frames)) - first + 1
+    if span <= 4 * sum(f.size for f in frames):
+        # frame counters are dense, mark them instead of sorting
+        mask = np.zeros(span, dtype=bool)
+        for f in frames:
+            mask[f.astype(np.int64) - first] = True
+        return np.flatnonzero(mask) + first
+    frames = np.concatenate(frames).astype(np.int64)
+    frames.sort()
+    return frames[np.concatenate(([True], frames[1:] != frames[:-1]))]
+
+
+def row_lookup(index):
+    """Returns a function mapping frame numbers onto rows of index.
+
+    Args:
+        index: sorted unique frame indices, see frame_index.
+    Returns:
+        A function taking an array of frame numbers contained in index
+        and returning their row numbers.
+    """
+    if len(index) == 0:
+        return lambda frames: np.zeros(0, dtype=np.intp)
+    first = index[0]
+    span = int(index[-1] - first) + 1
+    if span > 4 * len(index):
+        return lambda frames: np.searchsorted(index, frames.astype(np.int64))
+    rows = np.full(span, -1, dtype=np.intp)
+    rows[index - first] = np.arange(len(index))
+    return lambda frames: rows[frames.astype(np.int64) - first]
+
+
+def build_position_frame(pos_data, ball_data, half_tresh = 100000,
+        dtype = 'float32', multi_index = False):
+    """Builds the position data frame in a single preallocated block.
+
+        The union of the frame indices is computed once and the x- and
+        y-positions of all players are scattered into one block, which
+        is wrapped into the data frame without further copies. Players
+        with several entries in a half, e.g. after a substitution, share
+        their columns.
+
+        Args:
+            pos_data: position data structure
+            ball_data: ball data list
+            half_tresh: first frame of the second half.
+            dtype: dtype of the position columns, None keeps the dtype
+                   of the position data { default: float32 }
+            multi_index: use (player, axis) column tuples, e.g.
+                   (pid, 'x'), ('half', ''), ('ball', 'x'), instead of the
+                   flat pid_x column names.
+        Returns:
+            A dataframe with the frame index, x- and y-positions per player,
+            the half, and the ball columns ball_x, ball_y, possession and
+            game_state, see pos_data_to_df.
+    """
+    entries = [player for team in ['home', 'guest'] if team in pos_data
+            for half in ['1st', '2nd'] for player in pos_data[team][half]]
+    balls = [ball for ball in ball_data if isinstance(ball, np.ndarray)]
+    if dtype is None:
+        dtype = np.result_type(*([e[1] for e in entries] + balls + [np.float32]))
+    index = frame_index(pos_data, ball_data)
+    no_frames = len(index)
+    # column pair of every player in order of first appearance
+    players = {}
+    for player in entries:
+        players.setdefault(player[0], len(players))
+    # column major, the columns are filled and stored by pandas as they are
+    block = np.full((no_frames, 2 * len(players)), np.nan, dtype=dtype, order='F')
+    lookup = row_lookup(index)
+    for pid, data in ((e[0], e[1]) for e in entries):
+        rows = lookup(data[:,0])
+        col = 2 * players[pid]
+        if (len(rows) and rows[-1] - rows[0] == len(rows) - 1 and
+                np.all(np.diff(rows) == 1)):
+            # consecutive frames in order
+            rows = slice(rows[0], rows[-1] + 1)
+        block[rows, col] = data[:,1]
+        block[rows, col+1] = data[:,2]
+    if multi_index:
+        columns = pd.MultiIndex.from_tuples([(pid, axis) for pid in players
+            for axis in ['x', 'y']])
+    else:
+        columns = ['%s_%s' % (pid, axis) for pid in players for axis in ['x', 'y']]
+    pos_df = pd.DataFrame(block, index=pd.Index(index), columns=columns, copy=False)
+    # ball columns, possession and game state stay integer if the ball
+    # covers every frame
+    ball_columns = {'ball_x': np.full(no_frames, np.nan, dtype=dtype),
+            'ball_y': np.full(no_frames, np.nan, dtype=dtype)}
+    ball = np.concatenate(balls) if balls else np.zeros((0, 6))
+    rows = lookup(ball[:,0])
+    ball_columns['ball_x'][rows] = ball[:,1]
+    ball_columns['ball_y'][rows] = ball[:,2]
+    mask = np.zeros(no_frames, dtype=bool)
+    mask[rows] = True
+    covered = no_frames > 0 and bool(mask.all())
+    for name, col in [('possession', 4), ('game_state', 5)]:
+        values = np.full(no_frames, 0 if covered else np.nan,
+                dtype=np.int64 if covered else np.float64)
+        values[rows] = ball[:,col]
+        ball_columns[name] = values
+    names = ['half', 'ball_x', 'ball_y', 'possession', 'game_state']
+    keys = [('half', '')] + [('ball', n[5:] if n.startswith('ball_') else n)
+            for n in names[1:]] if multi_index else names
+    pos_df[keys[0]] = (index >= half_tresh) + 1
+    for key, name in zip(keys[1:], names[1:]):
+        pos_df[key] = ball_columns[name]
+    return pos_df
+
+
+def pos_data_to_df(pos_data, ball_data, dtype = 'float32', multi_index = False):
     """Wrapper function to convert the player and ball position into pandas dataframe.
 
     Args:
         pos_data: A player position data list
         ball_data: A ball position data list
-        
+        dtype: dtype of the position columns, None keeps the dtype of
+               the position data { default: float32 }
+        multi_index: use a (player, axis) column MultiIndex, see
+               build_position_frame.
+
     Returns:
         a pandas data frame containing the position data.
     """
-    player_df = collect_pos_data_into_dataframe(pos_data)
-    ball_df = collect_ball_data_into_dataframe(ball_data)
-    assert(player_df.shape[0] == ball_df.shape[0])
-    return pd.concat([player_df, ball_df], axis=1)
-
+    with instrumentation.timed('papi.pos_data_to_df') as metrics:
+        pos_df = build_position_frame(pos_data, ball_data, dtype=dtype,
+                multi_index=multi_index)
+        metrics['frames'] = pos_df.shape[0]
+        metrics['peak_bytes'] = instrumentation.nbytes(pos_df)
+    return pos_df
@@ -10,6 +10,8 @@ single_frame_parser: Loads the raw position data and game data using
 import numpy as np
 from xml.sax import make_parser, ContentHandler
 import os
+from footballpy import instrumentation
+from footballpy.fs.loader.growable_array import GrowableArray
 
 def get_data_files(folder):
     """Determines the position data files.
@@ -73,56 +75,129 @@ class GameStatsParser(ContentHandler):
     def getTeamInformation(self):
         return self.teams, self.match
 
-    def run(self, name):
+    def run(self, fname):
         parser = make_parser()
         parser.setContentHandler(self)
         parser.parse(fname)
 
 
 class PositionFileParser(ContentHandler):
-    """A XML Parser for a PutPositionalDataRequest file.
+    """A XML Parser for PutPositionalDataRequest files.
+
+    Parses out the position data. The frames of every player and the
+    ball are pushed into per player and half buffers, hence several
+    files can be streamed through a single parser one after another.
 
-    Parses out the position data.
+    Attributes:
+        players: dictionary (player id, half) -> GrowableArray with
+                 frame, x, y rows.
+        ball: dictionary half -> GrowableArray with frame, x, y, z,
+              possession, status rows.
+        frames: number of parsed frames.
     """
 
     def __init__(self):
         self.inPosition = False
         self.counter = 0
         self.line = ''
+        self.chunks = []
+        self.players = {}
+        self.ball = {}
+        self.frames = 0
 
     def startElement(self, name, attrs):
         if name == "Positions":
             self.inPosition = True
-    
+            self.chunks = []
+
     def characters(self, data):
+        # the character data of a frame may be delivered in several
+        # pieces, therefore the lines are processed at the end tag.
         if self.inPosition:
-            if not data or (data == "\n") or (data == ']'):
-                return
-            # cut out CDATA part
-            if data.startswith('CDATA'):
-                data = data[6:]
-            # if remaining parts starts with
-            # -1 than game is not running yet.
-            if data.startswith('-1'):
-                return
-            # TODO store data in structure
-            process_line(data)
+            self.chunks.append(data)
 
     def endElement(self, name):
         if name == "Positions":
             self.inPosition = False
+            for line in ''.join(self.chunks).splitlines():
+                self.store_line(line)
+            self.chunks = []
+
+    def store_line(self, line):
+        """Pushes the data of a single line into the buffers.
+
+        Args:
+            line: A string containing one line of the Positions tag.
+        Returns:
+            Nothing
+        """
+        line = line.strip()
+        # cut out CDATA part
+        if line.startswith('CDATA['):
+            line = line[6:]
+        if line.endswith(']'):
+            line = line[:-1]
+        # if remaining parts starts with
+        # -1 than game is not running yet.
+        if not line or line.startswith('-1'):
+            return
+        frame, half, players, ball = process_frame(line)
+        for pid, (x, y) in players.items():
+            key = (pid, half)
+            if key not in self.players:
+                self.players[key] = GrowableArray(3, capacity=2**14)
+            self.players[key].push((frame, x, y))
+        if half not in self.ball:
+            self.ball[half] = GrowableArray(6, capacity=2**14)
+        self.ball[half].push((frame,) + ball)
+        self.frames += 1
 
     def run(self, fname):
-        parser = make_parser()
-        parser.setContentHandler(self)
-        parser.parse(fname)
+        with instrumentation.timed('single_frame.position_file',
+                bytes=instrumentation.file_size(fname)) as metrics:
+            frames = self.frames
+            parser = make_parser()
+            parser.setContentHandler(self)
+            parser.parse(fname)
+            metrics['frames'] = self.frames - frames
+
+    def getPositionInformation(self, teams):
+        """Extractor function to retrieve position data.
+
+        Args:
+            teams: team information dictionary, see GameStatsParser.
+        Returns:
+            The player position data and the ball data in the structure
+            of the DFL and impire loaders. Player ids of the position
+            file are matched with the team ids with and without the
+            leading 'p'. Players who are not found in teams are skipped.
+        """
+        roles = {}
+        for role in ['home', 'guest']:
+            for player in teams[role]:
+                roles[player['id']] = (role, player['position'])
+        position_data = {'home': {'1st':[], '2nd':[]},
+                'guest': {'1st':[], '2nd':[]}}
+        for (pid, half), values in sorted(self.players.items()):
+            player = roles.get(pid) or roles.get(pid[1:])
+            if player is None:
+                continue
+            role, position = player
+            pid = pid if pid in roles else pid[1:]
+            secID = '1st' if half == 1 else '2nd'
+            position_data[role][secID].append((pid, values.trim(), position))
+        ball = [self.ball[half].trim() if half in self.ball else
+                np.zeros((0, 6)) for half in (1, 2)]
+        return position_data, ball
+
 
-class FloodArray:
+class FloodArray(GrowableArray):
     """Stores consecutive vectors into a matrix.
 
     Just a thin wrapper to a numpy array useful when
     it is not clear how many points are needed but all points
-    should be stored consecutively.
+    should be stored consecutively. Kept for compatibility, the matrix
+    grows geometrically like a GrowableArray.
     Attributes:
         max_rows: maximum number of possible rows in matrix.
         no_cols: number of cols.
@@ -136,39 +211,87 @@ class FloodArray:
         Args:
             max_rows: number of rows { default: 10000 }
             no_cols: number of columns { default: 4}
-            expand_step: number of rows the matrix is expanded when maximum
-                      row size is reached. { default: 1000 }
+            expand_step: minimum number of rows the matrix is expanded
+                      when maximum row size is reached. { default: 1000 }
         Returns:
             Nothing
         """
-        self.max_rows = max_rows
-        self.expand = expand_step 
-        self.no_cols = no_cols
-        self.array = -13 * np.ones((max_rows, no_cols))
-        self.current_row = 0
+        GrowableArray.__init__(self, no_cols, 'float64', max_rows)
+        self.expand = expand_step
+        self.array[:] = -13
 
-    def push(self, data):
-        """Pushes a new vector onto the matrix.
+    @property
+    def max_rows(self):
+        return self.capacity
 
-        Args:
-            data: a new vector.
-        Returns:
-            Nothing
-        """
-        if self.current_row + 2 == self.max_rows:
-            no_rows, no_cols = self.array.shape
-            self.array.resize((no_rows + self.expand, no_cols), refcheck=False)
-        self.array[self.current_row,:] = data
-        self.current_row += 1
-
-    def data(self):
-        """Returns the current data.
-        Args:
-            Nothing
-        Returns:
-            A numpy matrix containing the data.
-        """
-        return self.array[:self.current_row,:].copy()
+    @property
+    def current_row(self):
+        return self.size
+
+    def reserve(self, no_rows):
+        if no_rows > self.capacity:
+            no_rows = max(no_rows, self.capacity + self.expand)
+        GrowableArray.reserve(self, no_rows)
+
+
+def process_frame(line):
+    """Processes a single line from a put file.
+
+    Args:
+        line: A string containing the one line of data. CDATA is
+              already cleaned out.
+    Returns:
+        A tuple with the frame counter, the half, a dictionary mapping
+        player ids to (x,y) tuples, and the ball (x, y, z, possession,
+        status) tuple. Officials are left out.
+    """
+    frame_specs, players, ball = line.split('#')
+    frame_specs = frame_specs.split(',')
+    frame = int(frame_specs[0])
+    half = int(frame_specs[2])
+    pos_data = {}
+    for player in players.split(';'):
+        if player.startswith('p'):
+            pid, xs, ys = player.split(',')[:3]
+            pos_data[pid] = (float(xs), float(ys))
+    xs, ys, zs, _, status, possession = ball.split(';')[0].split(',')[:6]
+    ball = (float(xs), float(ys), float(zs), float(possession), float(status))
+    return frame, half, pos_data, ball
+
+
+def read_position_files(folder, teams):
+    """Streams all position files of a folder into the ragged structure.
+
+    Args:
+        folder: folder containing the PutPositionalDataRequest files,
+                see get_data_files.
+        teams: team information dictionary, see GameStatsParser.
+    Returns:
+        A tuple with the position data and the ball data, see
+        PositionFileParser.getPositionInformation.
+    """
+    pos_files, max_no_frames = get_data_files(folder)
+    parser = PositionFileParser()
+    for fname in pos_files:
+        parser.run(os.path.join(folder, fname))
+    return parser.getPositionInformation(teams)
+
+
+def run(game_stats_file, folder):
+    """Driver function to load the position data of a match.
+
+    Args:
+        game_stats_file: game stats xml file with the lineups.
+        folder: folder containing the PutPositionalDataRequest files.
+    Returns:
+        A tuple with the position data, the ball data, the match and
+        the team information, like impire.run.
+    """
+    gsp = GameStatsParser()
+    gsp.run(game_stats_file)
+    teams, match = gsp.getTeamInformation()
+    pos_data, ball = read_position_files(folder, teams)
+    return pos_data, ball, match, teams
 
 
 def process_line(line):
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+instrumentation: Progress and timing reports of the loaders and
+                 processing stages.
+
+Every loader and processing stage reports its measurements as an event
+dictionary to the registered callbacks. An event contains at least the
+key 'stage' and, depending on the stage, keys like 'seconds', 'frames',
+'frames_per_sec', 'bytes' or 'peak_bytes'. Per FrameSet progress of the
+DFL parsers is reported with stage 'dfl.frameset' when trace is set.
+
+No callback is registered by default, hence the library stays silent.
+Reporting to the console is switched on with
+    instrumentation.register(instrumentation.print_event)
+and measurements are collected with a MetricsRecorder.
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+from __future__ import print_function
+import os
+import time
+
+__callbacks__ = []
+
+
+def register(callback):
+    """Registers a callback which receives every event.
+
+    Args:
+        callback: callable taking the event dictionary.
+    Returns:
+        The callback, thus register can be used as a decorator.
+    """
+    if callback not in __callbacks__:
+        __callbacks__.append(callback)
+    return callback
+
+
+def unregister(callback):
+    """Removes a registered callback."""
+    if callback in __callbacks__:
+        __callbacks__.remove(callback)
+
+
+def clear():
+    """Removes all registered callbacks."""
+    del __callbacks__[:]
+
+
+def is_active():
+    """Returns True if at least one callback is registered."""
+    return len(__callbacks__) > 0
+
+
+def emit(stage, **metrics):
+    """Sends an event to all registered callbacks.
+
+    Args:
+        stage: name of the reporting stage, e.g. 'dfl.position_data'.
+        metrics: measurements of the stage.
+    Returns:
+        Nothing
+    """
+    if not __callbacks__:
+        return
+    event = dict(metrics)
+    event['stage'] = stage
+    for callback in list(__callbacks__):
+        callback(event)
+
+
+class timed:
+    """Context manager which measures the run time of a stage.
+
+    The context yields the metrics dictionary which can be filled with
+    further measurements inside the block. On exit the elapsed time is
+    added as 'seconds', the throughput as 'frames_per_sec' if 'frames'
+    were given, and the event is emitted. If the block raises, the name
+    of the exception is reported as 'error'.
+
+    Example:
+        with instrumentation.timed('impire.position_data') as metrics:
+            ...
+            metrics['frames'] = no_frames
+    """
+
+    def __init__(self, stage, **metrics):
+        """Constructor method.
+
+        Args:
+            stage: name of the stage.
+            metrics: initial measurements.
+        Returns:
+            Nothing
+        """
+        self.stage = stage
+        self.metrics = metrics
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.metrics
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        self.metrics['seconds'] = seconds
+        if self.metrics.get('frames') is not None and seconds > 0:
+            self.metrics['frames_per_sec'] = self.metrics['frames'] / seconds
+        if exc_type is not None:
+            self.metrics['error'] = exc_type.__name__
+        emit(self.stage, **self.metrics)
+        return False
+
+
+def file_size(fname):
+    """Returns the size of fname in bytes or None for non-path sources."""
+    try:
+        return os.path.getsize(fname)
+    except (TypeError, OSError):
+        return None
+
+
+def nbytes(data):
+    """Sums up the array sizes in a nested structure.
+
+    Args:
+        data: numpy array, pandas object or nested lists, tuples and
+              dictionaries thereof.
+    Returns:
+        The total number of bytes of all contained arrays.
+    """
+    if isinstance(data, dict):
+        return sum(nbytes(v) for v in data.values())
+    if isinstance(data, (list, tuple)):
+        return sum(nbytes(v) for v in data)
+    if hasattr(data, 'memory_usage'):
+        usage = data.memory_usage(deep=False)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    return int(getattr(data, 'nbytes', 0))
+
+
+def print_event(event):
+    """Callback which prints every event in a single line."""
+    metrics = ', '.join('%s=%s' % (key, _format_value(event[key]))
+            for key in sorted(event) if key != 'stage')
+    print('%s: %s' % (event['stage'], metrics))
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return '%.3f' % value
+    return str(value)
+
+
+class MetricsRecorder:
+    """Callback which collects all events.
+
+    Attributes:
+        events: list with the received event dictionaries.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    def stage_events(self, stage):
+        """Returns all events of a stage."""
+        return [e for e in self.events if e['stage'] == stage]
+
+    def summary(self):
+        """Aggregates the events per stage.
+
+        Returns:
+            A dictionary stage -> dictionary with the number of events
+            'count', the summed 'seconds', 'frames' and 'bytes' and the
+            maximal 'peak_bytes'.
+        """
+        res = {}
+        for event in self.events:
+            entry = res.setdefault(event['stage'], {'count': 0,
+                'seconds': 0.0, 'frames': 0, 'bytes': 0, 'peak_bytes': 0})
+            entry['count'] += 1
+            for key in ('seconds', 'frames', 'bytes'):
+                if event.get(key) is not None:
+                    entry[key] += event[key]
+            if event.get('peak_bytes') is not None:
+                entry['peak_bytes'] = max(entry['peak_bytes'], event['peak_bytes'])
+        return res
+
+    def clear(self):
+        """Removes all collected events."""
+        del self.events[:]
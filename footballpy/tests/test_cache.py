@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+test_cache: unittests for the on disk cache of the loaders
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+import footballpy.fs.loader.cache as cache
+import footballpy.fs.loader.dfl as dfl_parser
+import footballpy.fs.loader.impire as impire_parser
+
+
+def path_to_tstfile(fname, folder = 'impire'):
+    """
+    """
+    return os.path.abspath(os.path.join(__file__, '../../testfiles/', folder, fname))
+
+class TestMatchCache(unittest.TestCase):
+    """Unit test class for the cached decorator.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp_dir, 'source.txt')
+        with open(self.source, 'w') as fid:
+            fid.write('1,2,3')
+        self.calls = []
+
+        @cache.cached(version = 1, files = ('fname',), ignore = ('trace',))
+        def loader(fname, scale = 1, trace = False):
+            self.calls.append(fname)
+            with open(fname) as fid:
+                return np.array(fid.read().split(','), dtype=float) * scale
+        self.loader = loader
+        self.cache = cache.enable(os.path.join(self.tmp_dir, 'cache'))
+
+    def tearDown(self):
+        cache.disable()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_repeated_load(self):
+        res_1 = self.loader(self.source)
+        res_2 = self.loader(self.source, trace = True)
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(np.all(res_1 == res_2))
+
+    def test_arguments_in_key(self):
+        self.loader(self.source)
+        res = self.loader(self.source, scale = 2)
+        self.assertEqual(len(self.calls), 2)
+        self.assertTrue(np.all(res == (2.0, 4.0, 6.0)))
+
+    def test_changed_source(self):
+        self.loader(self.source)
+        with open(self.source, 'w') as fid:
+            fid.write('4,5,6,7')
+        os.utime(self.source, (0, 12345))
+        res = self.loader(self.source)
+        self.assertEqual(len(self.calls), 2)
+        self.assertTrue(np.all(res == (4.0, 5.0, 6.0, 7.0)))
+
+    def test_digest_memo(self):
+        for mtime, content in [(12345, '4,5,6,7'), (23456, '8,9')]:
+            self.loader(self.source)
+            with open(self.source, 'w') as fid:
+                fid.write(content)
+            os.utime(self.source, (0, mtime))
+        res = self.loader(self.source)
+        self.assertTrue(np.all(res == (8.0, 9.0)))
+        self.assertEqual(len(os.listdir(self.cache.hash_dir)), 1)
+        self.assertEqual(self.loader(self.source).tolist(), [8.0, 9.0])
+        self.assertEqual(len(self.calls), 3)
+
+    def test_eviction(self):
+        self.cache.max_bytes = 1
+        self.loader(self.source)
+        self.assertEqual(self.cache.entries(), [])
+        self.loader(self.source)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_disabled(self):
+        cache.disable()
+        self.loader(self.source)
+        self.loader(self.source)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_impire_run(self):
+        match_file = path_to_tstfile('vistrack-matchfacts-123456.xml')
+        pos_file = path_to_tstfile('123456.pos')
+        pos_1, ball_1, match_1, teams_1 = impire_parser.run(match_file, pos_file)
+        self.assertEqual(len(self.cache.entries()), 1)
+        pos_2, ball_2, match_2, teams_2 = impire_parser.run(match_file, pos_file)
+        self.assertEqual(match_1, match_2)
+        self.assertTrue(np.all(ball_1[0] == ball_2[0]))
+        self.assertTrue(np.all(pos_1['home']['1st'][0][1] == pos_2['home']['1st'][0][1]))
+
+    def key(self, value):
+        return self.cache.key('loader', 1, [], [('arg', value)])
+
+    def test_array_key(self):
+        arr = np.arange(5000)
+        other = arr.copy()
+        other[2500] = -1
+        self.assertNotEqual(self.key(arr), self.key(other))
+        self.assertNotEqual(self.key(arr), self.key(arr.astype(float)))
+        self.assertNotEqual(self.key(arr), self.key(arr.reshape((50, 100))))
+        self.assertEqual(self.key(arr), self.key(np.arange(5000)))
+
+    def test_set_key(self):
+        self.assertEqual(self.key({'home', 'guest'}), self.key(frozenset(['guest', 'home'])))
+        self.assertEqual(self.key({'a': 1, 'b': 2}), self.key({'b': 2, 'a': 1}))
+        self.assertNotEqual(self.key(['home', 'guest']), self.key(('home', 'guest')))
+        self.assertNotEqual(self.key(1), self.key(1.0))
+        self.assertNotEqual(self.key('1'), self.key(1))
+        code = ('import footballpy.fs.loader.cache as cache, hashlib; '
+                'key = hashlib.sha1(); '
+                'cache.update_key(key, {"home", "guest", "ball", "x1", "x2"}); '
+                'print(key.hexdigest())')
+        keys = set()
+        for seed in ['1', '2', '3']:
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            keys.add(subprocess.check_output([sys.executable, '-c', code],
+                env=env, cwd=os.path.join(os.path.dirname(__file__), '../..')))
+        self.assertEqual(len(keys), 1)
+
+    def test_unknown_type(self):
+        self.assertRaises(TypeError, self.key, object())
+        self.assertRaises(TypeError, self.key, np.array([object()]))
+        self.assertRaises(TypeError, self.loader, self.source, scale = object())
+
+    def test_version_in_key(self):
+        self.loader(self.source)
+
+        @cache.cached(version = 2, files = ('fname',), ignore = ('trace',))
+        def loader(fname, scale = 1, trace = False):
+            self.calls.append(fname)
+            return None
+        loader.__module__ = self.loader.__module__
+        loader.__name__ = self.loader.__name__
+        self.assertIsNone(loader(self.source))
+        self.assertEqual(len(self.calls), 2)
+
+    def assertNoStaleEntry(self, loader, args):
+        """Puts entries under the old versions and checks they are not used."""
+        # the output changed since version 1 (float32 coordinates)
+        self.assertGreater(loader.cache_version, 1)
+        for version in range(1, loader.cache_version):
+            self.cache.put(loader.cache_key(self.cache, args, {}, version), 'stale')
+        res = loader(*args)
+        self.assertNotEqual(res, 'stale')
+        return res
+
+    def test_impire_stale_versions(self):
+        args = (path_to_tstfile('vistrack-matchfacts-123456.xml'),
+                path_to_tstfile('123456.pos'))
+        pos_df, teams, match = self.assertNoStaleEntry(
+                impire_parser.get_df_from_files, args)
+        self.assertEqual(pos_df['ball_x'].dtype, np.float32)
+        self.assertIsInstance(self.assertNoStaleEntry(impire_parser.run, args),
+                tuple)
+
+    def test_dfl_stale_versions(self):
+        args = (path_to_tstfile('MatchInformation/test.xml', 'dfl'),
+                path_to_tstfile('ObservedPositionalData/test.xml', 'dfl'))
+        pos_df, teams, match = self.assertNoStaleEntry(
+                dfl_parser.get_df_from_files, args + (False,))
+        self.assertEqual(pos_df['ball_x'].dtype, np.float32)
+
+
+if __name__ == '__main__':
+    unittest.main()
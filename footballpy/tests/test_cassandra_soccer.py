@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+test_cassandra_soccer: unittests for the bulk insertion into cassandra
+                       using an in-process stand-in for the session
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import threading
+import unittest
+import numpy as np
+from footballpy import instrumentation
+
+try:
+    import cassandra
+    import footballpy.db.cassandra_soccer as cs
+except ImportError:
+    cassandra = None
+
+
+class FakeFuture(object):
+    """Completes the request in a timer thread."""
+
+    def __init__(self, session, error):
+        self.session = session
+        self.error = error
+
+    def add_callbacks(self, callback, errback, callback_args = (),
+            errback_args = ()):
+        def complete():
+            with self.session.lock:
+                self.session.in_flight -= 1
+            if self.error is None:
+                callback(None, *callback_args)
+            else:
+                errback(self.error, *errback_args)
+        threading.Timer(0.001, complete).start()
+
+
+class FakeSession(object):
+    """Records the executed batches, fails the requests listed in errors."""
+
+    def __init__(self, errors = None):
+        self.errors = dict(errors or {})
+        self.requests = 0
+        self.batch_sizes = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def prepare(self, query):
+        return query.replace('?', '%s')
+
+    def execute_async(self, statement, parameters = None):
+        with self.lock:
+            error = self.errors.pop(self.requests, None)
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if error is None:
+                self.batch_sizes.append(1 if parameters else len(statement))
+        return FakeFuture(self, error)
+
+
+def player_xy(no_rows, offset = 0):
+    frames = np.arange(offset, offset + no_rows, dtype=float)
+    return np.column_stack((frames, frames / 10.0, -frames))
+
+
+@unittest.skipIf(cassandra is None, 'cassandra-driver is not installed')
+class TestBatchRows(unittest.TestCase):
+
+    def test_player_rows(self):
+        rows = list(cs.player_rows('g1', 2, 't1', 'p1', player_xy(2, 10)))
+        self.assertEqual(rows, [('g1', 2, 't1', 'p1', 10, 1.0, -10.0),
+            ('g1', 2, 't1', 'p1', 11, 1.1, -11.0)])
+        self.assertIsInstance(rows[0][4], int)
+
+    def test_batches(self):
+        rows = [('g1', i) for i in range(5)] + [('g2', i) for i in range(3)]
+        batches = list(cs.batch_rows(rows, 2))
+        self.assertEqual([len(b) for b in batches], [2, 2, 1, 2, 1])
+        for batch in batches:
+            self.assertEqual(len(set(row[0] for row in batch)), 1)
+        self.assertEqual(sum(batches, []), rows)
+
+
+@unittest.skipIf(cassandra is None, 'cassandra-driver is not installed')
+class TestBulkInserter(unittest.TestCase):
+
+    def test_bounded_in_flight(self):
+        session = FakeSession()
+        inserter = cs.BulkInserter(session, session.prepare(cs.__pi_query__),
+                max_in_flight=3, batch_size=7)
+        inserter.insert(cs.player_rows('g1', 1, 't1', 'p1', player_xy(100)))
+        inserter.join()
+        self.assertEqual(inserter.rows, 100)
+        self.assertEqual(inserter.batches, 15)
+        self.assertEqual(sum(session.batch_sizes), 100)
+        self.assertLessEqual(session.max_in_flight, 3)
+
+    def test_retry_transient_errors(self):
+        session = FakeSession({0: cassandra.WriteTimeout('timeout', write_type=0),
+            2: cassandra.OperationTimedOut('timeout')})
+        inserter = cs.BulkInserter(session, session.prepare(cs.__pi_query__),
+                batch_size=10, retry_delay=0.001)
+        inserter.insert(cs.player_rows('g1', 1, 't1', 'p1', player_xy(30)))
+        inserter.join()
+        self.assertEqual(inserter.rows, 30)
+        self.assertEqual(inserter.retries, 2)
+        self.assertEqual(session.requests, 5)
+
+    def test_retries_exhausted(self):
+        errors = dict((i, cassandra.Unavailable('down')) for i in range(3))
+        session = FakeSession(errors)
+        inserter = cs.BulkInserter(session, session.prepare(cs.__pi_query__),
+                max_retries=2, retry_delay=0.001)
+        inserter.insert(cs.player_rows('g1', 1, 't1', 'p1', player_xy(5)))
+        self.assertRaises(cassandra.Unavailable, inserter.join)
+
+    def test_permanent_error(self):
+        session = FakeSession({0: ValueError('invalid')})
+        inserter = cs.BulkInserter(session, session.prepare(cs.__pi_query__),
+                retry_delay=0.001)
+        inserter.insert(cs.player_rows('g1', 1, 't1', 'p1', player_xy(5)))
+        self.assertRaises(ValueError, inserter.join)
+        self.assertEqual(session.requests, 1)
+
+
+@unittest.skipIf(cassandra is None, 'cassandra-driver is not installed')
+class TestInsertMatch(unittest.TestCase):
+
+    def test_insert_match(self):
+        position_data = {
+                'home': {'1st': [('p1', player_xy(120), 'TW'), ('p2', player_xy(80), 'STZ')],
+                    '2nd': [('p1', player_xy(60, 1000), 'TW')]},
+                'guest': {'1st': [('p3', player_xy(1), 'TW')], '2nd': []}}
+        match = {'match_id': 'g1', 'home': 't1', 'guest': 't2'}
+        session = FakeSession()
+        rows = cs.insert_match(match, position_data, session=session,
+                batch_size=50)
+        self.assertEqual(rows, 261)
+        self.assertEqual(sorted(session.batch_sizes),
+                [1, 10, 20, 30] + [50] * 4)
+
+    def test_insert_player_metrics(self):
+        recorder = instrumentation.MetricsRecorder()
+        instrumentation.register(recorder)
+        try:
+            cs.insert_player('g1', 1, 't1', 'p1', player_xy(30),
+                    session=FakeSession())
+        finally:
+            instrumentation.unregister(recorder)
+        events = recorder.stage_events('cassandra_soccer.insert_player')
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['player_id'], 'p1')
+        self.assertEqual(events[0]['rows'], 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
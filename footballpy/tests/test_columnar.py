@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+test_columnar: unittests for the columnar export of tracking data frames
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import footballpy.fs.columnar as columnar
+import footballpy.fs.loader.papi as papi
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def tracking_frame(multi_index = False, ball_frames = 10):
+    frames = np.arange(10000, 10010, dtype=float)
+    pos_data = {
+            'home': {'1st': [('p_1', np.column_stack((frames, frames / 10, -frames)), 'TW')],
+                '2nd': []},
+            'guest': {'1st': [('p2', np.column_stack((frames[2:], frames[2:], frames[2:])), 'STZ')],
+                '2nd': []}}
+    ball = np.zeros((ball_frames, 6))
+    ball[:,0] = frames[:ball_frames]
+    ball[:,1] = 1.5
+    ball[:,4] = 1
+    ball[:,5] = 2
+    return papi.pos_data_to_df(pos_data, [ball, 0], multi_index=multi_index)
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class TestTrackingFrameFiles(unittest.TestCase):
+    """Unit test class for writing and reading tracking frames.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.df = tracking_frame()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def expected(self, df):
+        df = df.copy()
+        for name in ['half', 'possession', 'game_state']:
+            df[name] = df[name].astype(np.int8)
+        return df
+
+    def test_round_trip(self):
+        for ext in ['parquet', 'arrow']:
+            fname = os.path.join(self.tmp_dir, 'match.' + ext)
+            columnar.write_tracking_frame(self.df, fname)
+            res = columnar.read_tracking_frame(fname)
+            pd.testing.assert_frame_equal(res, self.expected(self.df))
+            self.assertEqual(res['p_1_x'].dtype, np.float32)
+
+    def test_projection(self):
+        fname = os.path.join(self.tmp_dir, 'match.parquet')
+        columnar.write_tracking_frame(self.df, fname)
+        meta = columnar.read_tracking_metadata(fname)
+        self.assertEqual(meta['players'], ['p_1', 'p2'])
+        res = columnar.read_tracking_frame(fname, columns=['ball_x'], players=['p2'])
+        self.assertEqual(list(res.columns), ['ball_x', 'p2_x', 'p2_y'])
+        self.assertEqual(list(res.index), list(range(10000, 10010)))
+        self.assertTrue(np.isnan(res['p2_x'].iloc[0]))
+        with self.assertRaises(KeyError):
+            columnar.read_tracking_frame(fname, players=['p3'])
+        with self.assertRaises(KeyError):
+            columnar.read_tracking_frame(fname, columns=['foo'])
+
+    def test_multi_index(self):
+        df = tracking_frame(multi_index=True)
+        fname = os.path.join(self.tmp_dir, 'match.feather')
+        columnar.write_tracking_frame(df, fname)
+        res = columnar.read_tracking_frame(fname)
+        self.assertEqual(list(res.columns), list(df.columns))
+        self.assertEqual(res[('ball', 'possession')].dtype, np.int8)
+        self.assertTrue(np.all(res[('p_1', 'y')] == df[('p_1', 'y')]))
+
+    def test_ball_gaps(self):
+        df = tracking_frame(ball_frames=7)
+        self.assertEqual(df['possession'].dtype, np.float64)
+        for ext in ['parquet', 'arrow']:
+            fname = os.path.join(self.tmp_dir, 'match.' + ext)
+            columnar.write_tracking_frame(df, fname)
+            res = columnar.read_tracking_frame(fname)
+            self.assertEqual(columnar.read_schema(fname).field('possession').type,
+                    pyarrow.int8())
+            for name in ['possession', 'game_state']:
+                self.assertEqual(res[name].dtype, pd.Int8Dtype())
+                self.assertEqual(res[name].isna().tolist(), [False] * 7 + [True] * 3)
+            self.assertEqual(res['game_state'].iloc[0], 2)
+            self.assertEqual(res['half'].dtype, np.int8)
+        res = columnar.read_tracking_frame(fname, columns=['possession', 'ball_x'])
+        self.assertEqual(res['possession'].dtype, pd.Int8Dtype())
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            columnar.write_tracking_frame(self.df, os.path.join(self.tmp_dir, 'match.csv'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+test_dfl_index: unittests for the sidecar index of DFL position files
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import footballpy.fs.loader.cache as cache
+import footballpy.fs.loader.dfl as dfl_parser
+import footballpy.fs.loader.dfl_index as dfl_index
+
+def path_to_tstfile(folder, fname):
+    """
+    """
+    return os.path.abspath(os.path.join(__file__, '../../testfiles/dfl/', folder, fname))
+
+class TestPositionIndex(unittest.TestCase):
+    """Unit test class for building and using the position index.
+    """
+    @classmethod
+    def setUpClass(cls):
+        mip = dfl_parser.MatchInformationParser()
+        mip.run(path_to_tstfile('MatchInformation', 'test.xml'))
+        cls._teams, cls._match = mip.getTeamInformation()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp_dir, 'test.xml')
+        shutil.copy(path_to_tstfile('ObservedPositionalData', 'test.xml'), self.fname)
+
+    def tearDown(self):
+        cache.disable()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_build_index(self):
+        entries = dfl_index.build_position_index(self.fname,
+                dfl_index.index_path(self.fname))
+        self.assertTrue(os.path.exists(dfl_index.index_path(self.fname)))
+        self.assertEqual(len(entries), 17)
+        self.assertEqual(entries[0]['PersonId'], 'DFL-OBJ-a00001')
+        self.assertEqual(entries[0]['GameSection'], 'firstHalf')
+        self.assertEqual((entries[0]['first_frame'], entries[0]['last_frame']),
+                (10000, 10008))
+        with open(self.fname, 'rb') as fid:
+            content = fid.read()
+        block = content[entries[-1]['start']:entries[-1]['end']]
+        self.assertTrue(block.startswith(b'<FrameSet'))
+        self.assertTrue(block.endswith(b'</FrameSet>'))
+
+    def test_stale_index(self):
+        index_file = dfl_index.index_path(self.fname)
+        dfl_index.build_position_index(self.fname, index_file)
+        self.assertIsNotNone(dfl_index.load_position_index(self.fname,
+            index_file, build = False))
+        with open(self.fname, 'ab') as fid:
+            fid.write(b'\n')
+        self.assertIsNone(dfl_index.load_position_index(self.fname,
+            index_file, build = False))
+        self.assertEqual(len(dfl_index.load_position_index(self.fname, index_file)), 17)
+
+    def test_no_index_without_cache(self):
+        entries = dfl_index.load_position_index(self.fname)
+        self.assertEqual(len(entries), 17)
+        self.assertEqual(os.listdir(self.tmp_dir), ['test.xml'])
+        self.assertIsNone(dfl_index.load_position_index(self.fname, build = False))
+
+    def test_index_in_cache(self):
+        match_cache = cache.enable(os.path.join(self.tmp_dir, 'cache'))
+        dfl_index.load_position_index(self.fname)
+        found, entries = match_cache.get(dfl_index.index_cache_key(match_cache, self.fname))
+        self.assertTrue(found)
+        self.assertEqual(len(entries), 17)
+        self.assertEqual(len(match_cache.entries()), 1)
+        self.assertFalse(os.path.exists(dfl_index.index_path(self.fname)))
+        self.assertEqual(len(dfl_index.load_position_index(self.fname, build = False)), 17)
+
+    def test_clear_removes_index(self):
+        match_cache = cache.enable(os.path.join(self.tmp_dir, 'cache'))
+        dfl_parser.get_df_from_files(path_to_tstfile('MatchInformation', 'test.xml'),
+                self.fname, trace = False, engine = 'indexed')
+        self.assertIsNotNone(dfl_index.load_position_index(self.fname, build = False))
+        match_cache.clear()
+        self.assertEqual(match_cache.entries(), [])
+        self.assertEqual(os.listdir(match_cache.cache_dir), ['hashes'])
+        self.assertIsNone(dfl_index.load_position_index(self.fname, build = False))
+
+    def test_index_evicted(self):
+        match_cache = cache.enable(os.path.join(self.tmp_dir, 'cache'), max_bytes = 1)
+        dfl_index.load_position_index(self.fname)
+        self.assertEqual(match_cache.entries(), [])
+        self.assertIsNone(dfl_index.load_position_index(self.fname, build = False))
+
+    def test_unwritable_index(self):
+        index_file = os.path.join(self.tmp_dir, 'missing', 'test.xml.idx.json')
+        entries = dfl_index.build_position_index(self.fname, index_file)
+        self.assertEqual(len(entries), 17)
+        self.assertEqual(os.listdir(self.tmp_dir), ['test.xml'])
+
+    def test_indexed_parser(self):
+        mpp = dfl_parser.MatchPositionParser(self._match, self._teams,
+                sections = ['secondHalf'], frame_range = (100005, 100008))
+        mpp.run(self.fname, trace = False)
+        ref_pos, ref_ball, ref_time = mpp.getPositionInformation()
+        impp = dfl_index.IndexedMatchPositionParser(self._match, self._teams,
+                sections = ['secondHalf'], frame_range = (100005, 100008))
+        impp.run(self.fname, trace = False)
+        pos, ball, time = impp.getPositionInformation()
+        for team in ['home', 'guest']:
+            self.assertEqual([p[0] for p in pos[team]['2nd']],
+                    [p[0] for p in ref_pos[team]['2nd']])
+            for res, ref in zip(pos[team]['2nd'], ref_pos[team]['2nd']):
+                self.assertTrue(np.array_equal(res[1], ref[1]))
+        self.assertTrue(np.array_equal(ball[1], ref_ball[1]))
+        self.assertEqual(time, ref_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
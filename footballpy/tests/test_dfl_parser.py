@@ -70,6 +70,56 @@ class TestMatchInformation(unittest.TestCase):
         match = TestMatchInformation._match
         self.assertEqual(match['match_day'], '1')
 
+class TestMatchInformationLoader(unittest.TestCase):
+    """Unit test class for the memoized match information loader.
+    """
+    def setUp(self):
+        import shutil
+        import tempfile
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp_dir, 'test.xml')
+        shutil.copy(path_to_tstfile('MatchInformation', 'test.xml'), self.fname)
+        dfl_parser.clear_match_information()
+
+    def tearDown(self):
+        import shutil
+        dfl_parser.clear_match_information()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_same_as_parser(self):
+        match, teams, stadium = dfl_parser.load_match_information(self.fname)
+        mip = dfl_parser.MatchInformationParser()
+        mip.run(self.fname)
+        teams_ref, match_ref = mip.getTeamInformation()
+        self.assertEqual(match, match_ref)
+        self.assertEqual(teams, teams_ref)
+        self.assertEqual(stadium, {'length': 105.0, 'width': 69.0})
+
+    def test_memoized(self):
+        info_1 = dfl_parser.read_match_information(self.fname)
+        info_2 = dfl_parser.read_match_information(self.fname)
+        self.assertTrue(info_1 is info_2)
+        # results are copies of the memo
+        match, teams, stadium = dfl_parser.load_match_information(self.fname)
+        teams['home'].pop()
+        self.assertEqual(len(dfl_parser.load_match_information(self.fname)[1]['home']), 6)
+
+    def test_changed_file(self):
+        info_1 = dfl_parser.read_match_information(self.fname)
+        os.utime(self.fname, (0, 12345))
+        info_2 = dfl_parser.read_match_information(self.fname)
+        self.assertFalse(info_1 is info_2)
+
+    def test_match_and_team_info(self):
+        match = dfl_parser.get_match_info(self.fname)
+        self.assertEqual(match['away'], 'DFL-ABC-12345B')
+        self.assertEqual(match['team_color_home'], '#FF1122')
+        self.assertEqual(match['stadium'], {'width': '69.00', 'length': '105.00'})
+        teams = dfl_parser.get_team_info(self.fname)
+        self.assertEqual(teams['away'][3], {'id': 'DFL-OBJ-b00004',
+            'name': 'Barney Rubble', 'trikot': '4', 'position': 'MZ'})
+        self.assertEqual(len(dfl_parser.__match_information__), 1)
+
 class TestMatchEvent(unittest.TestCase):
     """Unit test class for the MatchEventParser.
     """
@@ -87,6 +137,70 @@ class TestMatchEvent(unittest.TestCase):
         self.assertEqual(play_time['firstHalf'][1],
                dup.parse('2015-05-16T15:30:40.640+02:00'))
 
+class TestMatchEventTable(unittest.TestCase):
+    """Unit test class for the streaming event table.
+    """
+    shot_events = """<PutDataRequest>
+    <Event EventTime="2015-05-16T15:31:40.480+02:00" EventId="1" X-Position="10.5" Y-Position="-3.25">
+        <ShotAtGoal Team="DFL-ABC-12345A" Player="DFL-OBJ-a00004">
+            <SuccessfulShot CurrentResult="1:0"/>
+        </ShotAtGoal>
+    </Event>
+    <Event EventTime="2015-05-16T15:32:40Z" EventId="2">
+        <Play Team="DFL-ABC-12345B" Player="DFL-OBJ-b00002" GameSection="firstHalf">
+            <Pass Recipient="DFL-OBJ-b00003"/>
+        </Play>
+    </Event>
+</PutDataRequest>"""
+
+    @classmethod
+    def setUpClass(cls, fname=path_to_tstfile('EventData', 'test.xml')):
+        cls._table = dfl_parser.get_match_event_table(fname)
+
+    def test_all_events(self):
+        table = TestMatchEventTable._table
+        self.assertEqual(table.shape[0], 6)
+        self.assertEqual(sorted(table['event_type'].unique()),
+                ['FinalWhistle', 'KickoffWhistle', 'Substitution'])
+        self.assertEqual(table['event_time'].dtype, np.dtype('datetime64[ns]'))
+
+    def test_kickoff_time(self):
+        table = TestMatchEventTable._table
+        kickoff = table[(table['event_type'] == 'KickoffWhistle') &
+                (table['game_section'] == 'firstHalf')]
+        self.assertEqual(kickoff['event_time'].iloc[0],
+                np.datetime64('2015-05-16T13:30:40.320'))
+
+    def test_substitution(self):
+        table = TestMatchEventTable._table
+        sub = table.iloc[0]
+        self.assertEqual(sub['team'], 'DFL-ABC-12345A')
+        self.assertEqual(sub['player'], 'DFL-OBJ-a00004')
+        self.assertEqual(sub['attributes']['PlayerOut'], 'DFL-OBJ-a00003')
+
+    def test_shots(self):
+        import shutil
+        import tempfile
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmp_dir, 'events.xml')
+            with open(fname, 'w') as fid:
+                fid.write(TestMatchEventTable.shot_events)
+            table = dfl_parser.get_match_event_table(fname)
+            self.assertEqual(list(table['event_subtype']), ['SuccessfulShot', 'Pass'])
+            self.assertEqual(table['x'].iloc[0], np.float32(10.5))
+            self.assertTrue(np.isnan(table['y'].iloc[1]))
+            self.assertEqual(table['attributes'].iloc[1]['Pass:Recipient'],
+                    'DFL-OBJ-b00003')
+            self.assertEqual(table['event_time'].iloc[1],
+                    np.datetime64('2015-05-16T15:32:40'))
+            shots = dfl_parser.get_match_events(fname)['goal_shots']
+            self.assertEqual(len(shots), 1)
+            self.assertEqual(shots[0]['ResultType'], 'SuccessfulShot')
+            self.assertEqual(shots[0]['Result:CurrentResult'], '1:0')
+        finally:
+            shutil.rmtree(tmp_dir)
+
 class TestMatchPosition(unittest.TestCase):
     """Unit test class for the MatchPositionParser.
     """
@@ -125,6 +239,223 @@ class TestMatchPosition(unittest.TestCase):
         self.assertEqual(home_2nd[pid_2][1].shape,(4,3))
         self.assertTrue(np.all(home_2nd[pid_2][1][2,:2]==(100007.0,57.0)))
 
+class TestFastMatchPosition(unittest.TestCase):
+    """Unit test class for the FastMatchPositionParser.
+    """
+    @classmethod
+    def setUpClass(cls, fname=path_to_tstfile('ObservedPositionalData', 'test.xml')):
+        mip = dfl_parser.MatchInformationParser()
+        mip.run(path_to_tstfile('MatchInformation', 'test.xml'))
+        teams, match = mip.getTeamInformation()
+        mpp = dfl_parser.MatchPositionParser(match,teams)
+        mpp.run(fname, trace = False)
+        cls._reference = mpp.getPositionInformation()
+        fmpp = dfl_parser.FastMatchPositionParser(match,teams)
+        fmpp.run(fname, trace = False)
+        pmpp = dfl_parser.ParallelMatchPositionParser(match,teams,processes=2,
+                min_bytes=0)
+        pmpp.run(fname, trace = False)
+        smpp = dfl_parser.ParallelMatchPositionParser(match,teams,processes=2)
+        smpp.run(fname, trace = False)
+        cls._results = [fmpp.getPositionInformation(), pmpp.getPositionInformation(),
+                smpp.getPositionInformation()]
+        cls._datetime64 = []
+        for parser, kwargs in [(dfl_parser.FastMatchPositionParser, {}),
+                (dfl_parser.ParallelMatchPositionParser, {'min_bytes': 0})]:
+            mpp = parser(match, teams, time_format='datetime64', **kwargs)
+            mpp.run(fname, trace = False)
+            cls._datetime64.append(mpp.getPositionInformation()[2])
+
+    def test_position_data(self):
+        ref_pos = self._reference[0]
+        for res_pos, _, _ in self._results:
+            for team in ['home', 'guest']:
+                for half in ['1st', '2nd']:
+                    self.assertEqual(len(ref_pos[team][half]), len(res_pos[team][half]))
+                    for ref, res in zip(ref_pos[team][half], res_pos[team][half]):
+                        self.assertEqual(ref[0], res[0])
+                        self.assertEqual(ref[2], res[2])
+                        self.assertEqual(res[1].dtype, np.float32)
+                        self.assertTrue(np.array_equal(ref[1], res[1]))
+
+    def test_ball_data(self):
+        for result in self._results:
+            for ref, res in zip(self._reference[1], result[1]):
+                self.assertEqual(res.shape, (9,6))
+                self.assertTrue(np.array_equal(ref, res))
+
+    def test_timestamps(self):
+        for result in self._results:
+            self.assertEqual(self._reference[2], result[2])
+            for ref, res in zip(self._reference[2], result[2]):
+                self.assertEqual([t.utcoffset() for t in ref],
+                        [t.utcoffset() for t in res])
+        ref, res = self._datetime64
+        for half in [0, 1]:
+            self.assertTrue(np.array_equal(ref[half], res[half]))
+
+    def test_convert_time_objects(self):
+        tstrings = ['2015-08-14T20:30:00.040+02:00', '2015-08-14T20:30:00.080-05:30']
+        res = dfl_parser.convert_time_objects(tstrings)
+        self.assertEqual(res, [dfl_parser.convertTime(t) for t in tstrings])
+        self.assertEqual([t.utcoffset().total_seconds() for t in res], [7200, -19800])
+        res = dfl_parser.convert_time_objects([b'2015-08-14T20:30:00.120'])
+        self.assertEqual(res, [dfl_parser.convertTime('2015-08-14T20:30:00.120')])
+        self.assertIsNone(res[0].tzinfo)
+
+    def test_frameset_offsets(self):
+        fname = path_to_tstfile('ObservedPositionalData', 'test.xml')
+        offsets = dfl_parser.scan_frameset_offsets(fname)
+        self.assertEqual(len(offsets), 17)
+        with open(fname, 'rb') as fid:
+            content = fid.read()
+        for start, end in offsets:
+            self.assertTrue(content[start:end].startswith(b'<FrameSet '))
+            self.assertTrue(content[start:end].endswith(b'</FrameSet>'))
+
+    def test_irregular_frameset(self):
+        block = (b'<FrameSet GameSection="firstHalf" TeamId="DFL-ABC-12345B" '
+                b'PersonId="DFL-OBJ-b00001">\n'
+                b'<Frame N="10000" X="1.5" Y="2.25"/>\n'
+                b'<Frame N="10001"\tX="1.75" Y="-2.5"/>\n</FrameSet>')
+        self.assertIsNone(dfl_parser.scan_frame_columns(block, ('N', 'X', 'Y')))
+        mip = dfl_parser.MatchInformationParser()
+        mip.run(path_to_tstfile('MatchInformation', 'test.xml'))
+        teams, match = mip.getTeamInformation()
+        fmpp = dfl_parser.FastMatchPositionParser(match, teams)
+        fmpp.trace = False
+        fmpp.parse_frameset(block)
+        pid, data, position = fmpp.position_data['guest']['1st'][0]
+        self.assertEqual(pid, 'DFL-OBJ-b00001')
+        self.assertEqual(position, 'TW')
+        self.assertTrue(np.array_equal(data,
+            np.array([[10000, 1.5, 2.25], [10001, 1.75, -2.5]], dtype='float32')))
+
+class TestSelectivePosition(unittest.TestCase):
+    """Unit test class for the FrameSet selection of the position parsers.
+    """
+    @classmethod
+    def setUpClass(cls):
+        mip = dfl_parser.MatchInformationParser()
+        mip.run(path_to_tstfile('MatchInformation', 'test.xml'))
+        cls._teams, cls._match = mip.getTeamInformation()
+        cls._fname = path_to_tstfile('ObservedPositionalData', 'test.xml')
+        cls._parsers = [dfl_parser.MatchPositionParser,
+                dfl_parser.FastMatchPositionParser,
+                dfl_parser.ParallelMatchPositionParser]
+
+    def parse(self, parser, **selection):
+        mpp = parser(self._match, self._teams, **selection)
+        mpp.run(self._fname, trace = False)
+        return mpp.getPositionInformation()
+
+    def test_person_and_section(self):
+        for parser in self._parsers:
+            pos_data, ball, timestamps = self.parse(parser,
+                    person_ids = ['DFL-OBJ-b00001'], sections = ['secondHalf'])
+            self.assertEqual(len(pos_data['guest']['2nd']), 1)
+            self.assertEqual(pos_data['guest']['2nd'][0][0], 'DFL-OBJ-b00001')
+            for team, half in [('home','1st'), ('home','2nd'), ('guest','1st')]:
+                self.assertEqual(pos_data[team][half], [])
+            self.assertEqual(ball[0], 0)
+            self.assertEqual(ball[1].shape, (9,6))
+
+    def test_team_roles(self):
+        for parser in self._parsers:
+            pos_data, ball, timestamps = self.parse(parser, team_roles = ['home'])
+            self.assertEqual(len(pos_data['home']['1st']), 3)
+            self.assertEqual(pos_data['guest']['1st'], [])
+            self.assertEqual(ball, [0, 0])
+
+    def test_frame_range(self):
+        for parser in self._parsers:
+            pos_data, ball, timestamps = self.parse(parser,
+                    frame_range = (10002, 10004))
+            for pid, data, position in pos_data['home']['1st']:
+                self.assertTrue(np.array_equal(data[:,0], [10002, 10003, 10004]))
+            self.assertEqual(pos_data['home']['2nd'], [])
+            self.assertEqual(ball[0].shape, (3,6))
+            self.assertEqual(ball[1].shape, (0,6))
+            self.assertEqual(len(timestamps[0]), 3)
+
+class TestStreamingPosition(unittest.TestCase):
+    """Unit test class for the FrameSet generator of the FastMatchPositionParser.
+    """
+    @classmethod
+    def setUpClass(cls):
+        mip = dfl_parser.MatchInformationParser()
+        mip.run(path_to_tstfile('MatchInformation', 'test.xml'))
+        cls._teams, cls._match = mip.getTeamInformation()
+        cls._fname = path_to_tstfile('ObservedPositionalData', 'test.xml')
+        mpp = dfl_parser.MatchPositionParser(cls._match, cls._teams)
+        mpp.run(cls._fname, trace = False)
+        cls._pos_data, cls._ball, _ = mpp.getPositionInformation()
+
+    def test_stream(self):
+        for chunk_size in [100, 2**22]:
+            fmpp = dfl_parser.FastMatchPositionParser(self._match, self._teams)
+            framesets = list(fmpp.iter_framesets(self._fname, chunk_size = chunk_size))
+            self.assertEqual(len(framesets), 17)
+            players = [f for f in framesets if f[1] != 'ball']
+            for team in ['home', 'guest']:
+                for half in ['1st', '2nd']:
+                    streamed = [(f[0], f[3]) for f in players
+                            if f[1] == team and f[2] == half]
+                    reference = self._pos_data[team][half]
+                    self.assertEqual([p[0] for p in streamed], [p[0] for p in reference])
+                    for res, ref in zip(streamed, reference):
+                        self.assertTrue(np.array_equal(res[1], ref[1]))
+            ball = [f for f in framesets if f[1] == 'ball']
+            self.assertEqual([f[2] for f in ball], ['1st', '2nd'])
+            self.assertTrue(np.array_equal(ball[1][3], self._ball[1]))
+            self.assertEqual(fmpp.position_data['home']['1st'], [])
+
+    def test_stream_selection(self):
+        fmpp = dfl_parser.FastMatchPositionParser(self._match, self._teams,
+                team_roles = ['guest'], sections = ['secondHalf'])
+        framesets = list(fmpp.iter_framesets(self._fname, chunk_size = 1000))
+        self.assertEqual(len(framesets), 4)
+        self.assertTrue(all(f[1:3] == ('guest', '2nd') for f in framesets))
+
+class TestTimeArray(unittest.TestCase):
+    """Unit test class for the datetime64 time stamp decoding.
+    """
+    def test_convert_time_array(self):
+        tstrings = ['2015-05-16T15:30:40.320+02:00', '2015-05-16T01:30:40.360-05:30']
+        res = dfl_parser.convert_time_array(tstrings)
+        self.assertEqual(res.dtype, np.dtype('datetime64[ns]'))
+        self.assertEqual(res[0], np.datetime64('2015-05-16T13:30:40.320'))
+        self.assertEqual(res[1], np.datetime64('2015-05-16T07:00:40.360'))
+
+    def test_parser_time_format(self):
+        mip = dfl_parser.MatchInformationParser()
+        mip.run(path_to_tstfile('MatchInformation', 'test.xml'))
+        teams, match = mip.getTeamInformation()
+        fname = path_to_tstfile('ObservedPositionalData', 'test.xml')
+        mpp = dfl_parser.MatchPositionParser(match, teams)
+        mpp.run(fname, trace = False)
+        reference = mpp.getPositionInformation()[2]
+        for parser in [dfl_parser.MatchPositionParser, dfl_parser.FastMatchPositionParser]:
+            mpp = parser(match, teams, time_format = 'datetime64')
+            mpp.run(fname, trace = False)
+            timestamps = mpp.getPositionInformation()[2]
+            for ref, res in zip(reference, timestamps):
+                self.assertEqual(res.dtype, np.dtype('datetime64[ns]'))
+                self.assertEqual(len(ref), len(res))
+                self.assertTrue(all(np.datetime64(r.replace(tzinfo=None) - r.utcoffset(), 'ns') == t
+                    for r, t in zip(ref, res)))
+
+    def test_get_df_time_column(self):
+        args = (path_to_tstfile('MatchInformation', 'test.xml'),
+                path_to_tstfile('ObservedPositionalData', 'test.xml'))
+        pos_df = dfl_parser.get_df_from_files(*args, trace = False)[0]
+        self.assertIsNotNone(pos_df['time'].dt.tz)
+        self.assertEqual(pos_df['time'].iloc[0].utcoffset().total_seconds(), 7200)
+        pos_df64 = dfl_parser.get_df_from_files(*args, trace = False,
+                time_format = 'datetime64')[0]
+        self.assertEqual(str(pos_df64['time'].dt.tz), 'UTC')
+        self.assertTrue((pos_df64['time'] == pos_df['time']).all())
+
 class TestSanity(unittest.TestCase):
     """Unit test for more general checks.
     """
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+test_growable_array: unittests for the growable row buffer
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import unittest
+import numpy as np
+from footballpy.fs.loader.growable_array import GrowableArray
+
+
+class TestGrowableArray(unittest.TestCase):
+    """Unit test class for the GrowableArray.
+    """
+
+    def test_push(self):
+        buf = GrowableArray(3, 'float32', capacity = 2)
+        for i in range(100):
+            buf.push((i, 2.0 * i, 3.0 * i))
+        self.assertEqual(len(buf), 100)
+        self.assertEqual(buf.capacity, 128)
+        res = buf.view()
+        self.assertEqual(res.dtype, np.float32)
+        self.assertTrue(np.all(res[:,0] == np.arange(100)))
+        self.assertTrue(np.all(res[:,2] == 3.0 * np.arange(100)))
+
+    def test_push_many(self):
+        buf = GrowableArray(2, 'int32', capacity = 4)
+        buf.push((-1, -1))
+        buf.push_many(np.arange(20).reshape((10, 2)))
+        buf.push_many(np.zeros((0, 2)))
+        self.assertEqual(len(buf), 11)
+        self.assertEqual(buf.capacity, 11)
+        self.assertTrue(np.all(buf.view()[1:].ravel() == np.arange(20)))
+
+    def test_one_dimensional(self):
+        buf = GrowableArray(dtype = 'int64', capacity = 1)
+        buf.push(5)
+        buf.push_many([6, 7, 8])
+        self.assertTrue(np.all(buf.view() == (5, 6, 7, 8)))
+
+    def test_view_and_data(self):
+        buf = GrowableArray(2, capacity = 8)
+        buf.push((1.0, 2.0))
+        view = buf.view()
+        data = buf.data()
+        view[0,0] = 10.0
+        self.assertEqual(buf.view()[0,0], 10.0)
+        self.assertEqual(data[0,0], 1.0)
+
+    def test_clear_and_trim(self):
+        buf = GrowableArray(2, capacity = 8)
+        buf.push_many(np.ones((5, 2)))
+        res = buf.trim()
+        self.assertEqual(buf.capacity, 5)
+        self.assertEqual(res.shape, (5, 2))
+        buf.clear()
+        self.assertEqual(len(buf), 0)
+        self.assertEqual(buf.view().shape, (0, 2))
+
+    def test_growth_factor(self):
+        with self.assertRaises(ValueError):
+            GrowableArray(2, growth = 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
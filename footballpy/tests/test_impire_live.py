@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+test_impire_live: unittests for the incremental impire position reader
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import footballpy.fs.loader.impire as impire_parser
+import footballpy.fs.loader.impire_live as impire_live
+
+
+def path_to_tstfile(fname):
+    """
+    """
+    return os.path.abspath(os.path.join(__file__, '../../testfiles/impire/', fname))
+
+class TestPositionFileFollower(unittest.TestCase):
+    """Unit test class for the PositionFileFollower.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp_dir, '123456.pos')
+        with open(path_to_tstfile('123456.pos'), 'rb') as fid:
+            self.data = fid.read()
+        self.reference = impire_parser.read_in_position_data(path_to_tstfile('123456.pos'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, data, mode = 'ab'):
+        with open(self.fname, mode) as fid:
+            fid.write(data)
+
+    def assert_frames(self, arrays, first, last):
+        for arr, ref in zip(arrays, self.reference):
+            self.assertTrue(np.array_equal(arr, ref[first:last]))
+
+    def test_incremental(self):
+        lines = self.data.splitlines(True)
+        self.write(b''.join(lines[:2]) + lines[2][:50], 'wb')
+        follower = impire_live.PositionFileFollower(self.fname)
+        self.assertEqual(follower.poll(), 2)
+        self.assertEqual(follower.stadium, {'length': 105.0, 'width': 68.0})
+        self.assertEqual(follower.poll(), 0)
+        self.write(lines[2][50:] + b''.join(lines[3:]))
+        self.assertEqual(follower.poll(), 5)
+        self.assertEqual(follower.offset, len(self.data))
+        self.assert_frames(follower.buffer.latest(), 0, 7)
+        self.assert_frames(follower.buffer.latest(3), 4, 7)
+
+    def test_rolling(self):
+        self.write(self.data, 'wb')
+        follower = impire_live.PositionFileFollower(self.fname, capacity = 4)
+        self.assertEqual(follower.poll(), 7)
+        self.assertEqual(follower.buffer.total, 7)
+        self.assert_frames(follower.buffer.latest(), 3, 7)
+
+    def test_wrap_around(self):
+        buf = impire_live.RollingPositionBuffer(capacity = 5)
+        for first, last in [(0, 3), (3, 5), (5, 7)]:
+            buf.append(*[arr[first:last] for arr in self.reference])
+        self.assertEqual(buf.size, 5)
+        self.assert_frames(buf.latest(), 2, 7)
+        self.assert_frames(buf.latest(2), 5, 7)
+
+    def test_replaced_file(self):
+        self.write(self.data, 'wb')
+        follower = impire_live.PositionFileFollower(self.fname)
+        follower.poll()
+        self.write(b''.join(self.data.splitlines(True)[:3]), 'wb')
+        self.assertEqual(follower.poll(), 3)
+        self.assert_frames(follower.buffer.latest(), 0, 3)
+
+    def test_follow(self):
+        self.write(self.data, 'wb')
+        follower = impire_live.PositionFileFollower(self.fname)
+        counts = list(follower.follow(interval = 0.001, timeout = 0.01))
+        self.assertEqual(counts, [7])
+
+
+if __name__ == '__main__':
+    unittest.main()
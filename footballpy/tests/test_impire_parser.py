@@ -122,6 +122,198 @@ class TestMatchPosition(unittest.TestCase):
         test_case = [x for x in pos_data_guest_2 if x[0] == '11002'][0]
         self.assertTrue(np.all(test_case[1][1,:] == (37043,-0.2715,0.1733)))
 
+    def test_sort_many_players(self):
+        """Compares the grouping with a mask per player."""
+        rng = np.random.RandomState(1)
+        pos = rng.rand(50, 11, 4)
+        pos[:,:,1] = rng.randint(1, 40, size=(50, 11))
+        pos_s = impire_parser.sort_position_data(pos)
+        unique_player = np.unique(pos[:,:,1])
+        self.assertEqual(len(pos_s), unique_player.size)
+        for pid, player in zip(unique_player, pos_s):
+            self.assertTrue(np.array_equal(player, pos[pos[:,:,1]==pid]))
+
+    def test_sort_and_combine(self):
+        """Tests the fused grouping against the two step chain."""
+        mip = impire_parser.MatchInformationParser()
+        mip.run(TestMatchPosition.match_file)
+        teams, match = mip.getTeamInformation()
+        home,guest,ball,half_time_id = impire_parser.read_in_position_data(TestMatchPosition.pos_file)
+        guest_1, guest_2 = impire_parser.split_positions_into_game_halves(guest,half_time_id,ball)
+        reference = impire_parser.combine_position_with_role(
+                impire_parser.sort_position_data(guest_2), teams['guest'])
+        fused = impire_parser.sort_and_combine_position_data(guest_2, teams['guest'])
+        self.assertEqual([p[0] for p in fused], [p[0] for p in reference])
+        self.assertEqual([p[2] for p in fused], [p[2] for p in reference])
+        for player, ref in zip(fused, reference):
+            self.assertTrue(np.array_equal(player[1], ref[1]))
+
+    def test_unknown_trikot(self):
+        team = [{'trikot': 3, 'id': 'a', 'position': 'TW'},
+                {'trikot': 7, 'id': 'b', 'position': 'ST'}]
+        self.assertTrue(np.all(impire_parser.lookup_players([7, 3, 7], team) == (1, 0, 1)))
+        with self.assertRaises(KeyError):
+            impire_parser.lookup_players([7, 5], team)
+
+
+class TestBulkPosition(unittest.TestCase):
+    """Unit test class for the bulk position parser engine.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.pos_file = path_to_tstfile('123456.pos')
+        cls._reference = impire_parser.read_in_position_data(cls.pos_file,
+                engine='python')
+
+    def assert_reference(self, data):
+        for arr, ref in zip(data, TestBulkPosition._reference):
+            self.assertEqual(arr.shape, ref.shape)
+            self.assertTrue(np.array_equal(arr, ref))
+
+    def test_same_as_reference(self):
+        self.assert_reference(impire_parser.read_in_position_data(
+            TestBulkPosition.pos_file, engine='bulk'))
+
+    def test_small_blocks(self):
+        self.assert_reference(impire_parser.read_in_position_data(
+            TestBulkPosition.pos_file, engine='bulk', block_size=100))
+
+    def test_parallel(self):
+        self.assert_reference(impire_parser.read_in_position_data(
+            TestBulkPosition.pos_file, engine='parallel', processes=2,
+            chunk_size=1000))
+
+    def test_line_chunks(self):
+        first_line, chunks = impire_parser.find_line_chunks(
+                TestBulkPosition.pos_file, 1000)
+        self.assertTrue(first_line.endswith(b'#4,105.0,68.0;\n'))
+        self.assertEqual(chunks[0][0], len(first_line))
+        self.assertEqual(chunks[-1][1], os.path.getsize(TestBulkPosition.pos_file))
+        counts = [impire_parser.count_position_lines(TestBulkPosition.pos_file,
+            start, end) for start, end in chunks]
+        self.assertEqual(sum(counts), 6)
+
+    def test_irregular_line(self):
+        import shutil
+        import tempfile
+        with open(TestBulkPosition.pos_file) as fid:
+            lines = fid.readlines()
+        # drop the last home player of the third frame
+        hash_split = lines[2].split('#')
+        hash_split[1] = ';'.join(hash_split[1].split(';')[:-2]) + ';'
+        lines[2] = '#'.join(hash_split)
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmp_dir, '123456.pos')
+            with open(fname, 'w') as fid:
+                fid.writelines(lines)
+            bulk = impire_parser.read_in_position_data(fname)
+            ref = impire_parser.read_in_position_data(fname, engine='python')
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertTrue(np.all(bulk[0][2,10,:] == -10000.0))
+        for arr, ref_arr in zip(bulk, ref):
+            self.assertTrue(np.array_equal(arr, ref_arr))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            impire_parser.read_in_position_data(TestBulkPosition.pos_file,
+                    engine='fortran')
+
+
+class TestCompactPosition(unittest.TestCase):
+    """Unit test class for the compact position data layout.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.pos_file = path_to_tstfile('123456.pos')
+        cls.match_file = path_to_tstfile('vistrack-matchfacts-123456.xml')
+        cls._data = impire_parser.read_in_compact_position_data(cls.pos_file)
+
+    def test_layout(self):
+        data = TestCompactPosition._data
+        self.assertEqual(data.home_xy.shape, (7,11,2))
+        self.assertEqual(data.home_xy.dtype, np.float32)
+        self.assertEqual(data.home_shirt.dtype, np.int16)
+        self.assertEqual(data.ball_state.dtype, np.int16)
+        home, guest, ball, ht = impire_parser.read_in_position_data(
+                TestCompactPosition.pos_file)
+        self.assertTrue(np.all(data.home_shirt == home[:,:,0]))
+        self.assertTrue(np.all(data.guest_xy == guest[:,:,1:].astype(np.float32)))
+        self.assertTrue(np.all(data.frame == ball[:,0]))
+        self.assertTrue(np.all(data.half == ht))
+
+    def test_halves_are_views(self):
+        data = TestCompactPosition._data
+        first, second = data.halves()
+        self.assertEqual(first.frame.shape[0], 4)
+        self.assertEqual(second.frame.shape[0], 3)
+        self.assertTrue(np.shares_memory(first.home_xy, data.home_xy))
+        self.assertTrue(np.shares_memory(second.ball_xyz, data.ball_xyz))
+
+    def test_run(self):
+        pos_data, ball, match, teams = impire_parser.run(
+                TestCompactPosition.match_file, TestCompactPosition.pos_file)
+        pos_data_c, ball_c, match_c, teams_c = impire_parser.run(
+                TestCompactPosition.match_file, TestCompactPosition.pos_file,
+                compact=True)
+        self.assertEqual(match, match_c)
+        for half, half_c in zip(ball, ball_c):
+            self.assertTrue(np.all(half.astype(np.float32) == half_c))
+        for role in ['home', 'guest']:
+            for sec in ['1st', '2nd']:
+                self.assertEqual(len(pos_data[role][sec]), len(pos_data_c[role][sec]))
+                for player, player_c in zip(pos_data[role][sec], pos_data_c[role][sec]):
+                    self.assertEqual(player[0], player_c[0])
+                    self.assertEqual(player[2], player_c[2])
+                    self.assertTrue(np.all(player[1].astype(np.float32) == player_c[1]))
+
+
+class TestTransformPosition(unittest.TestCase):
+    """Unit test class for the fused coordinate and frame transform.
+    """
+    def setUp(self):
+        self.pos_data, self.ball, self.match, teams = impire_parser.run(
+                path_to_tstfile('vistrack-matchfacts-123456.xml'),
+                path_to_tstfile('123456.pos'))
+
+    def reference(self):
+        import copy
+        pos_data, ball = impire_parser.rescale_xy_positions(
+                copy.deepcopy(self.pos_data), copy.deepcopy(self.ball),
+                **self.match['stadium'])
+        return impire_parser.increase_frame_counter(pos_data, ball)
+
+    def assert_equal_data(self, res, ref):
+        for half, half_ref in zip(res[1], ref[1]):
+            self.assertTrue(np.array_equal(half, half_ref))
+        for role in ['home', 'guest']:
+            for sec in ['1st', '2nd']:
+                for player, player_ref in zip(res[0][role][sec], ref[0][role][sec]):
+                    self.assertEqual(player[0], player_ref[0])
+                    self.assertTrue(np.array_equal(player[1], player_ref[1]))
+
+    def test_copy(self):
+        ref = self.reference()
+        ball = [half.copy() for half in self.ball]
+        player = self.pos_data['home']['1st'][0][1].copy()
+        res = impire_parser.transform_position_data(self.pos_data, self.ball,
+                **self.match['stadium'])
+        self.assert_equal_data(res, ref)
+        # input is untouched
+        self.assertTrue(np.array_equal(self.ball[0], ball[0]))
+        self.assertTrue(np.array_equal(self.pos_data['home']['1st'][0][1], player))
+
+    def test_in_place(self):
+        ref = self.reference()
+        ball_1 = self.ball[0]
+        pos_data, ball = impire_parser.transform_position_data(self.pos_data,
+                self.ball, copy=False, **self.match['stadium'])
+        self.assertTrue(pos_data is self.pos_data)
+        self.assertTrue(ball[0] is ball_1)
+        self.assert_equal_data((pos_data, ball), ref)
+        self.assertEqual(ball[1][0,0], 100000 + 37042)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+test_instrumentation: unittests for the progress and timing reports
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import os
+import unittest
+import footballpy.instrumentation as instrumentation
+import footballpy.fs.loader.dfl as dfl_parser
+
+
+def path_to_tstfile(folder, fname):
+    """
+    """
+    return os.path.abspath(os.path.join(__file__, '../../testfiles/dfl/', folder, fname))
+
+class TestInstrumentation(unittest.TestCase):
+    """Unit test class for the callback registry.
+    """
+
+    def setUp(self):
+        self.recorder = instrumentation.register(instrumentation.MetricsRecorder())
+
+    def tearDown(self):
+        instrumentation.clear()
+
+    def test_emit(self):
+        instrumentation.emit('stage', frames=10)
+        self.assertEqual(self.recorder.events, [{'stage': 'stage', 'frames': 10}])
+
+    def test_silent_default(self):
+        instrumentation.clear()
+        self.assertFalse(instrumentation.is_active())
+        instrumentation.emit('stage', frames=10)
+        self.assertEqual(self.recorder.events, [])
+
+    def test_timed(self):
+        with instrumentation.timed('stage', bytes=100) as metrics:
+            metrics['frames'] = 25
+        event = self.recorder.events[0]
+        self.assertEqual(event['bytes'], 100)
+        self.assertTrue(event['seconds'] >= 0.0)
+        self.assertTrue('frames_per_sec' in event)
+
+    def test_timed_error(self):
+        with self.assertRaises(KeyError):
+            with instrumentation.timed('stage'):
+                raise KeyError('missing')
+        self.assertEqual(self.recorder.events[0]['error'], 'KeyError')
+
+    def test_summary(self):
+        instrumentation.emit('stage', frames=10, peak_bytes=5)
+        instrumentation.emit('stage', frames=15, peak_bytes=3)
+        summary = self.recorder.summary()
+        self.assertEqual(summary['stage']['count'], 2)
+        self.assertEqual(summary['stage']['frames'], 25)
+        self.assertEqual(summary['stage']['peak_bytes'], 5)
+
+    def test_position_parser(self):
+        mip = dfl_parser.MatchInformationParser()
+        mip.run(path_to_tstfile('MatchInformation', 'test.xml'))
+        teams, match = mip.getTeamInformation()
+        mpp = dfl_parser.FastMatchPositionParser(match, teams)
+        fname = path_to_tstfile('ObservedPositionalData', 'test.xml')
+        mpp.run(fname)
+        framesets = self.recorder.stage_events('dfl.frameset')
+        event = self.recorder.stage_events('dfl.position_data')[0]
+        self.assertEqual(len(framesets), event['framesets'])
+        self.assertEqual(sum(e['frames'] for e in framesets), event['frames'])
+        self.assertEqual(event['bytes'], os.path.getsize(fname))
+        self.assertEqual(event['parser'], 'FastMatchPositionParser')
+        self.assertTrue(event['peak_bytes'] > 0)
+        self.assertEqual(len(self.recorder.stage_events('dfl.match_information')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
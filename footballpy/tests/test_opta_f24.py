@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+test_opta_f24: unittests for the Opta F24 event parser
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import os
+import unittest
+import numpy as np
+from lxml import etree
+import footballpy.fs.loader.opta_f24 as f24
+
+
+def path_to_tstfile(fname):
+    """
+    """
+    return os.path.abspath(os.path.join(__file__, '../../testfiles/opta/', fname))
+
+
+class TestEventStream(unittest.TestCase):
+    """Unit test class for the single pass event parser.
+    """
+
+    def setUp(self):
+        self.fname = path_to_tstfile('f24-test.xml')
+
+    def test_game_info(self):
+        game_info = f24.read_game_info(self.fname)
+        self.assertEqual(game_info['id'], '861478')
+        self.assertEqual(game_info['home_team_id'], '157')
+
+    def test_qualifiers(self):
+        root = etree.parse(self.fname).getroot()
+        el = f24.get_events(root, 1)[1]
+        q = f24.get_qualifiers(el)
+        self.assertEqual(q, {6: None, 2: None, 140: '94.0', 141: '52.3'})
+
+    def test_xpath_parsers(self):
+        events = list(f24.iter_events(self.fname))
+        self.assertEqual(len(events), 9)
+        root = etree.parse(self.fname).getroot()
+        for type_id, parser in f24.__event_parsers__.items():
+            for el in f24.get_events(root, type_id):
+                ref = parser(el)
+                res = [e for e in events if e['evt_id'] == ref['evt_id'] and
+                        e['type_id'] == type_id]
+                self.assertEqual(len(res), 1)
+                res = dict(res[0])
+                del res['type_id']
+                self.assertEqual(res, ref)
+
+    def test_type_selection(self):
+        events = list(f24.iter_events(self.fname, type_ids = (18, 19)))
+        self.assertEqual([e['evt_type_qualified'] for e in events],
+                ['player_off', 'player_on'])
+        self.assertEqual(events[1]['detailed_position'], 'winger')
+        self.assertEqual(events[0]['detailed_position'], 'NA')
+
+
+class TestEventTable(unittest.TestCase):
+    """Unit test class for the columnar event table.
+    """
+
+    def setUp(self):
+        self.table = f24.get_event_table(path_to_tstfile('f24-test.xml'))
+
+    def test_dtypes(self):
+        self.assertEqual(len(self.table), 9)
+        self.assertEqual(self.table['evt_id'].dtype, np.int64)
+        self.assertEqual(self.table['x'].dtype, np.float32)
+        self.assertEqual(self.table['corner'].dtype, bool)
+        self.assertEqual(str(self.table['evt_type'].dtype), 'category')
+        self.assertEqual(self.table['timestamp'].dtype, np.dtype('datetime64[ns]'))
+
+    def test_values(self):
+        passes = self.table[self.table['type_id'] == 1]
+        self.assertEqual(list(passes['evt_type']), ['pass', 'pass'])
+        self.assertTrue(np.allclose(passes['x'], [50.1, 99.4]))
+        self.assertTrue(np.allclose(passes['x1'], [38.6, 94.0]))
+        self.assertEqual(list(passes['corner']), [False, True])
+        self.assertEqual(list(passes['outcome']), [1, 0])
+        goal = self.table[self.table['type_id'] == 16].iloc[0]
+        self.assertTrue(goal['open_play'])
+        self.assertEqual(goal['assist_id'], '5')
+        self.assertEqual(self.table['evt_type'].iloc[0], 'other')
+        self.assertTrue(np.isnan(self.table['x'].iloc[-1]))
+        self.assertEqual(str(self.table['timestamp'].iloc[1]),
+                '2016-08-19 20:30:32.456000')
+        self.assertEqual(str(self.table['timestamp'].iloc[2]),
+                '2016-08-19 20:35:43')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+test_opta_store: unittests for the columnar F24 event store
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import footballpy.fs.loader.opta_f24 as f24
+import footballpy.fs.loader.opta_store as opta_store
+
+
+def path_to_tstfile(fname):
+    """
+    """
+    return os.path.abspath(os.path.join(__file__, '../../testfiles/opta/', fname))
+
+
+class TestEventStore(unittest.TestCase):
+    """Unit test class for building and loading event stores.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        with open(path_to_tstfile('f24-test.xml')) as fid:
+            content = fid.read()
+        self.fnames = []
+        for game_id in ['861478', '861479']:
+            fname = os.path.join(self.tmp_dir, 'f24-22-2016-%s-eventdetails.xml' % game_id)
+            with open(fname, 'w') as fid:
+                fid.write(content.replace('Game id="861478"', 'Game id="%s"' % game_id))
+            self.fnames.append(fname)
+        self.store_dir = os.path.join(self.tmp_dir, 'store')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def check_store(self):
+        table = opta_store.load_event_store(self.store_dir)
+        self.assertEqual(len(table), 18)
+        self.assertEqual(list(table['game_id'].unique()), ['861478', '861479'])
+        ref = f24.get_event_table(self.fnames[1])
+        res = table[table['game_id'] == '861479'].drop(columns='game_id')
+        pd.testing.assert_frame_equal(res.reset_index(drop=True), ref,
+                check_categorical=False)
+
+    def test_season_files(self):
+        seasons = opta_store.find_season_files(self.tmp_dir)
+        self.assertEqual(seasons, {('22', '2016'): self.fnames})
+
+    def test_serial(self):
+        no_events = opta_store.build_event_store(self.fnames, self.store_dir,
+                processes = 1)
+        self.assertEqual(no_events, 18)
+        self.check_store()
+
+    def test_parallel(self):
+        opta_store.build_event_store(self.fnames, self.store_dir, processes = 2)
+        self.check_store()
+
+    def test_raw_columns(self):
+        opta_store.build_event_store(self.fnames, self.store_dir, processes = 1,
+                type_ids = [1])
+        arrays, meta = opta_store.read_event_columns(self.store_dir,
+                columns = ['player_id', 'x'])
+        self.assertEqual(sorted(arrays), ['player_id', 'x'])
+        self.assertTrue(isinstance(arrays['x'], np.memmap))
+        self.assertEqual(arrays['player_id'].dtype, np.int32)
+        players = [meta['dictionaries']['player_id'][c] for c in arrays['player_id']]
+        self.assertEqual(players, ['1001', '1002', '1001', '1002'])
+        self.assertEqual([g['id'] for g in meta['games']], ['861478', '861479'])
+        with self.assertRaises(KeyError):
+            opta_store.read_event_columns(self.store_dir, columns = ['foo'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+test_papi: unittests for the position data frame builder
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+import footballpy.fs.loader.papi as papi
+
+
+def player(pid, frames, offset = 0.0):
+    frames = np.asarray(frames, dtype=float)
+    return (pid, np.column_stack((frames, frames + offset, -frames)), 'X')
+
+
+def ball(frames):
+    frames = np.asarray(frames, dtype=float)
+    res = np.zeros((len(frames), 6))
+    res[:,0] = frames
+    res[:,1] = frames / 10.0
+    res[:,4] = 1
+    res[:,5] = 2
+    return res
+
+
+class TestBuildPositionFrame(unittest.TestCase):
+    """Unit test class for build_position_frame.
+    """
+
+    def setUp(self):
+        self.pos_data = {
+                'home': {'1st': [player('a', range(10000, 10005))],
+                    '2nd': [player('a', range(100000, 100003)),
+                        player('b', range(100001, 100003))]},
+                'guest': {'1st': [player('c', range(10002, 10005))],
+                    '2nd': [player('c', range(100000, 100003))]}}
+        self.ball = [ball(range(10000, 10005)), ball(range(100000, 100003))]
+
+    def test_reference(self):
+        pos_data = {'home': self.pos_data['home'], 'guest': {'1st': [], '2nd': []}}
+        pos_data['home']['2nd'] = pos_data['home']['2nd'][:1]
+        ref = pd.concat([papi.collect_pos_data_into_dataframe(pos_data),
+            papi.collect_ball_data_into_dataframe(self.ball)], axis=1)
+        res = papi.pos_data_to_df(pos_data, self.ball, dtype=None)
+        pd.testing.assert_frame_equal(res, ref)
+
+    def test_layout(self):
+        res = papi.pos_data_to_df(self.pos_data, self.ball)
+        self.assertEqual(list(res.columns), ['a_x', 'a_y', 'b_x', 'b_y', 'c_x',
+            'c_y', 'half', 'ball_x', 'ball_y', 'possession', 'game_state'])
+        self.assertEqual(list(res.index), list(range(10000, 10005)) +
+                list(range(100000, 100003)))
+        self.assertEqual(res['a_x'].dtype, np.float32)
+        self.assertEqual(res['possession'].dtype, np.int64)
+        self.assertEqual(list(res['half']), [1] * 5 + [2] * 3)
+        self.assertTrue(np.isnan(res.loc[10001, 'c_x']))
+        self.assertEqual(res.loc[10003, 'c_y'], -10003.0)
+        self.assertTrue(np.isnan(res.loc[100000, 'b_x']))
+        self.assertEqual(res.loc[100002, 'b_x'], 100002.0)
+
+    def test_substitution(self):
+        self.pos_data['home']['2nd'].append(player('a', range(100002, 100004), 0.5))
+        res = papi.pos_data_to_df(self.pos_data, self.ball)
+        self.assertEqual(list(res.columns[:2]), ['a_x', 'a_y'])
+        self.assertEqual(res.loc[100003, 'a_x'], 100003.5)
+        # the ball does not cover frame 100003
+        self.assertEqual(res['possession'].dtype, np.float64)
+        self.assertTrue(np.isnan(res.loc[100003, 'possession']))
+
+    def test_unsorted_frames(self):
+        # first and last frame span a consecutive range
+        self.pos_data['guest']['1st'] = [player('c', [10001, 10003, 10002, 10004])]
+        res = papi.pos_data_to_df(self.pos_data, self.ball)
+        self.assertEqual(list(res.loc[10001:10004, 'c_x']),
+                [10001.0, 10002.0, 10003.0, 10004.0])
+        self.assertEqual(list(res.loc[10001:10004, 'c_y']),
+                [-10001.0, -10002.0, -10003.0, -10004.0])
+
+    def test_multi_index(self):
+        res = papi.pos_data_to_df(self.pos_data, self.ball, multi_index=True)
+        self.assertEqual(res.columns[0], ('a', 'x'))
+        self.assertEqual(list(res['ball'].columns), ['x', 'y', 'possession',
+            'game_state'])
+        self.assertEqual(res[('c', 'y')].loc[10003], -10003.0)
+
+    def test_empty(self):
+        res = papi.pos_data_to_df({'home': {'1st': [], '2nd': []}}, [0, 0])
+        self.assertEqual(res.shape, (0, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,7 @@ test_formation_quantifier: unittests for the formation_quantifier functions
 """
 
 import os
+import tempfile
 import unittest
 import footballpy.fs.loader.single_frame_parser as sp
 import numpy as np
@@ -61,3 +62,70 @@ class TestGetDataFiles(unittest.TestCase):
         (res_files, res_frames) = sp.get_data_files(test_folder)
         self.assertEqual(len(res_files), 2)
 
+
+__game_stats__ = """<?xml version="1.0" encoding="UTF-8"?>
+<Game>
+  <Team sType="Home" iTeamId="t1"><Lineup>
+    <Player iId="10001" sFirstName="A" sLastName="B" iJerseyNo="1" sPos="TW" />
+  </Lineup></Team>
+  <Team sType="Away" iTeamId="t2"><Lineup>
+    <Player iId="10012" sFirstName="C" sLastName="D" iJerseyNo="7" sPos="STZ" />
+  </Lineup></Team>
+</Game>
+"""
+
+
+class TestPositionFiles(unittest.TestCase):
+    """Unit tests for the ingestion of the position files.
+    """
+
+    def setUp(self):
+        self.folder = os.path.abspath(os.path.join(__file__, '../../testfiles/single/'))
+        self.teams = {
+                'home': [{'id': str(10000 + i), 'position': 'H'} for i in range(1,12)],
+                'guest': [{'id': str(10000 + i), 'position': 'G'} for i in range(12,23)]}
+
+    def test_process_frame(self):
+        frame, half, players, ball = sp.process_frame('10008,1,1,2020-12-12T14:30:48.680+02:00,1,22;#p1,-18.49,5.60,9.91;o44472,9.95,-34.24,5.18;p21,33.50,4.45,6.05;#10.01,11.02,12.12,17.04,0,2;')
+        self.assertEqual((frame, half), (10008, 1))
+        self.assertEqual(players, {'p1': (-18.49, 5.60), 'p21': (33.50, 4.45)})
+        self.assertEqual(ball, (10.01, 11.02, 12.12, 2.0, 0.0))
+
+    def test_read_position_files(self):
+        pos_data, ball = sp.read_position_files(self.folder, self.teams)
+        self.assertEqual(len(pos_data['home']['1st']), 11)
+        self.assertEqual(len(pos_data['guest']['1st']), 11)
+        self.assertEqual(pos_data['home']['2nd'], [])
+        pid, data, position = pos_data['home']['1st'][0]
+        self.assertEqual((pid, position), ('10001', 'H'))
+        self.assertEqual(data.shape, (50, 3))
+        self.assertTrue(np.all(data[0] == (10371, -26.85, 2.02)))
+        self.assertTrue(np.all(np.diff(data[:,0]) == 1))
+        self.assertEqual(ball[0].shape, (50, 6))
+        self.assertTrue(np.all(ball[0][0] == (10371, -2.75, 26.22, 1.00, 2, 0)))
+        self.assertEqual(ball[1].shape, (0, 6))
+
+    def test_split_characters(self):
+        with open(os.path.join(self.folder,
+                'PutPositionalDataRequest1000117_1000141.xml')) as fid:
+            content = fid.read()
+        data = content[content.index('CDATA'):content.index('</Positions>')]
+        parser = sp.PositionFileParser()
+        parser.startElement('Positions', {})
+        for i in range(0, len(data), 37):
+            parser.characters(data[i:i+37])
+        parser.endElement('Positions')
+        self.assertEqual(parser.frames, 25)
+        self.assertEqual(parser.players[('p10001', 1)].data().shape, (25, 3))
+
+    def test_game_stats(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.xml', delete=False) as fid:
+            fid.write(__game_stats__)
+        try:
+            pos_data, ball, match, teams = sp.run(fid.name, self.folder)
+        finally:
+            os.remove(fid.name)
+        self.assertEqual((match['home'], match['guest']), ('t1', 't2'))
+        self.assertEqual([p[0] for p in pos_data['home']['1st']], ['10001'])
+        self.assertEqual([p[2] for p in pos_data['guest']['1st']], ['STZ'])
+        self.assertEqual(ball[0].shape, (50, 6))
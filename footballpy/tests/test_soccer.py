@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+test_soccer: unittests for the positionen-* file writers
+
+@author: rein
+@license: MIT
+@version 0.1
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import footballpy.fs.SOCCER as soccer
+
+
+def savetxt_rows(data):
+    buf = io.BytesIO()
+    np.savetxt(buf, data, fmt='%5.2f', delimiter='  ', newline='  \r\n')
+    return buf.getvalue()
+
+
+class TestFormatRows(unittest.TestCase):
+
+    def test_random_values(self):
+        rng = np.random.default_rng(3)
+        data = (rng.standard_normal((200, 7)) * 30).astype(np.float32)
+        self.assertEqual(soccer.format_rows(data), savetxt_rows(data))
+
+    def test_special_values(self):
+        data = np.array([[np.nan, np.inf, -np.inf, -0.0, 0.0],
+            [0.125, 0.375, -2.675, 1e20, -123456789.5],
+            [9.995, -9.995, 99.999, -0.001, 0.005]])
+        self.assertEqual(soccer.format_rows(data), savetxt_rows(data))
+
+    def test_single_column(self):
+        data = np.array([[1.0], [-10.0], [100.0]])
+        self.assertEqual(soccer.format_rows(data), savetxt_rows(data))
+
+    def test_empty(self):
+        self.assertEqual(soccer.format_rows(np.zeros((0, 3))), b'')
+
+
+class TestDecimate(unittest.TestCase):
+
+    def test_subsample(self):
+        data = np.arange(20.0).reshape((10, 2))
+        np.testing.assert_array_equal(soccer.decimate(data, 4), data[::4])
+
+    def test_mean(self):
+        data = np.arange(10.0).reshape((5, 2))
+        data[1,0] = np.nan
+        data[2:4,1] = np.nan
+        res = soccer.decimate(data, 2, 'mean')
+        np.testing.assert_array_equal(res, [[0.0, 2.0], [5.0, np.nan], [8.0, 9.0]])
+
+    def test_unknown_method(self):
+        self.assertRaises(ValueError, soccer.decimate, np.zeros((4, 2)), 2, 'median')
+
+
+class TestWriteDataToFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        rng = np.random.default_rng(7)
+        self.data = {ptype: [rng.standard_normal((60, no_cols)) * 20,
+            rng.standard_normal((55, no_cols)) * 20]
+            for ptype, no_cols in [('home', 22), ('guest', 22), ('ball', 5)]}
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp_dir)
+
+    def read(self, fname):
+        with open(fname, 'rb') as f:
+            return f.read()
+
+    def test_text_equals_savetxt(self):
+        fnames = soccer.write_data_to_file(self.data, 'm1')
+        self.assertEqual(fnames, ['m1-positionen-%s-HT%d' % (ptype, ht)
+            for ptype in ['home','guest','ball'] for ht in [1,2]])
+        contents = [self.read(f) for f in fnames]
+        reference = soccer.write_data_to_file(self.data, 'm2', fmt='savetxt',
+                workers=1)
+        self.assertEqual(contents, [self.read(f) for f in reference])
+        self.assertTrue(contents[0].startswith(b'3\r\n22\r\n'))
+
+    def test_binary_roundtrip(self):
+        fnames = soccer.write_data_to_file(self.data, fmt='binary', step=1,
+                method='mean')
+        self.assertEqual(fnames[5], 'positionen-ball-HT2.bin')
+        for mmap in [True, False]:
+            res = soccer.read_binary_file(fnames[2], mmap=mmap)
+            np.testing.assert_array_equal(res, self.data['guest'][0])
+
+    def test_not_binary(self):
+        fname = soccer.write_text_file(np.zeros((2, 2)), 'text')
+        self.assertRaises(ValueError, soccer.read_binary_file, fname)
+
+    def test_callable_format(self):
+        written = {}
+        def writer(data, fname):
+            written[fname] = data
+            return fname
+        soccer.write_data_to_file(self.data, step=10, method='mean', fmt=writer)
+        self.assertEqual(len(written), 6)
+        self.assertEqual(written['positionen-home-HT2'].shape, (6, 22))
+        np.testing.assert_allclose(written['positionen-ball-HT1'][0],
+                self.data['ball'][0][:10].mean(axis=0))
+
+
+
+class TestParseRows(unittest.TestCase):
+
+    def test_roundtrip(self):
+        rng = np.random.default_rng(5)
+        data = np.round(rng.standard_normal((300, 6)) * 1e3, 2)
+        data[0,0] = -0.0
+        res = soccer.parse_rows(soccer.format_rows(data), 6)
+        np.testing.assert_array_equal(res, data)
+        self.assertTrue(np.signbit(res[0,0]))
+
+    def test_special_values(self):
+        data = np.array([[np.nan, -np.inf, 1e20], [-0.004, 12.5, -3.0]])
+        buf = soccer.format_rows(data)
+        np.testing.assert_array_equal(soccer.parse_rows(buf, 3),
+                np.array(buf.split(), dtype=float).reshape((2, 3)))
+
+    def test_dtype(self):
+        res = soccer.parse_rows(b' 1.25   -2.50  \r\n', 2, np.float32)
+        self.assertEqual(res.dtype, np.float32)
+        np.testing.assert_array_equal(res, [[1.25, -2.5]])
+
+
+class TestReadData(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(11)
+        self.data = {ptype: [np.round(rng.random((40, no_cols)) * 10, 2),
+            np.round(rng.random((35, no_cols)) * 10, 2)]
+            for ptype, no_cols in [('home', 22), ('guest', 22), ('ball', 2)]}
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        try:
+            soccer.write_data_to_file(self.data, 'm1', step=1)
+            soccer.write_data_to_file(self.data, 'm2', step=1, fmt='binary')
+            soccer.write_data_to_file(self.data, step=1, workers=1)
+        finally:
+            os.chdir(cwd)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assertDataEqual(self, data):
+        for ptype in ['home','guest','ball']:
+            for ht in [0,1]:
+                np.testing.assert_array_equal(data[ptype][ht], self.data[ptype][ht])
+
+    def test_read_data_from_file(self):
+        for matchname in ['m1', 'm2', '']:
+            self.assertDataEqual(soccer.read_data_from_file(matchname, self.tmp_dir))
+
+    def test_find_matches(self):
+        self.assertEqual(soccer.find_matches(self.tmp_dir), ['', 'm1', 'm2'])
+
+    def test_read_directory(self):
+        for processes in [1, 2]:
+            res = soccer.read_directory(self.tmp_dir, processes=processes)
+            self.assertEqual(sorted(res), ['', 'm1', 'm2'])
+            for data in res.values():
+                self.assertDataEqual(data)
+
+    def test_wrong_header(self):
+        fname = os.path.join(self.tmp_dir, 'broken')
+        with open(fname, 'wb') as f:
+            f.write(b'3\r\n2\r\n 1.00   2.00  \r\n')
+        self.assertRaises(ValueError, soccer.read_text_file, fname)
+
+
+if __name__ == '__main__':
+    unittest.main()